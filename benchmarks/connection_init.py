@@ -0,0 +1,119 @@
+"""
+Measure the time from opening a connection to the result of its first query.
+
+Usage (with a CockroachDB node listening on localhost:26257):
+
+    python benchmarks/connection_init.py [--iterations N] [--time-zone TZ]
+        [--assume-role ROLE]
+
+The "sequential" strategy runs each connection setup statement separately
+(as the PostgreSQL backend does), the "batched" strategy is the backend's
+default of sending them in a single round trip. The connection sets a
+TIME_ZONE that differs from the server's (UTC), assumes a role, makes
+transactions read-only, and sets an application_name, so that four
+statements run on each connection. (The telemetry query only runs on the
+first connection of a process.) Latency between the client and the node
+magnifies the difference.
+"""
+import argparse
+import os
+import statistics
+import time
+
+import django
+from django.conf import settings
+
+
+def configure(time_zone, assume_role):
+    settings.configure(
+        DATABASES={
+            'default': {
+                'ENGINE': 'django_cockroachdb',
+                'NAME': os.environ.get('COCKROACH_NAME', 'defaultdb'),
+                'USER': os.environ.get('COCKROACH_USER', 'root'),
+                'PASSWORD': '',
+                'HOST': os.environ.get('COCKROACH_HOST', 'localhost'),
+                'PORT': os.environ.get('COCKROACH_PORT', 26257),
+                'CONN_MAX_AGE': 0,
+                'OPTIONS': {
+                    'assume_role': assume_role,
+                    'default_transaction_read_only': True,
+                    'instrumentation': {'application_name': 'connection_init'},
+                },
+            },
+        },
+        TIME_ZONE=time_zone,
+        USE_TZ=False,
+        DISABLE_COCKROACHDB_TELEMETRY=True,
+    )
+    django.setup()
+
+
+def sequential_configure_connection(self, connection):
+    from django.db.backends.postgresql.psycopg_any import mogrify
+
+    statements = self._connection_setup_statements(connection)
+    with connection.cursor() as cursor:
+        for sql, params in statements:
+            cursor.execute(mogrify(sql, params, connection))
+    return bool(statements)
+
+
+def setup_statements():
+    """Return the setup statements of a new connection."""
+    from django.db import connection
+
+    connection.ensure_connection()
+    with connection.connection.cursor() as cursor:
+        # The time zone is already set on the connection.
+        cursor.execute('RESET TIME ZONE')
+    statements = connection._connection_setup_statements(connection.connection)
+    connection.close()
+    return statements
+
+
+def run(iterations):
+    from django.db import connection
+
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+        timings.append(time.perf_counter() - start)
+        connection.close()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--time-zone', default='America/New_York')
+    # The user must be a member of the role (or an admin).
+    parser.add_argument('--assume-role', default='root')
+    args = parser.parse_args()
+    configure(args.time_zone, args.assume_role)
+
+    from django_cockroachdb.base import DatabaseWrapper
+
+    # Warm up (e.g. the cached server version).
+    run(5)
+    print('%d setup statements per connection' % len(setup_statements()))
+    batched_configure_connection = DatabaseWrapper._configure_connection
+    for name, configure_connection in (
+        ('sequential', sequential_configure_connection),
+        ('batched', batched_configure_connection),
+    ):
+        DatabaseWrapper._configure_connection = configure_connection
+        timings = run(args.iterations)
+        print('%-10s p50=%.2fms p90=%.2fms mean=%.2fms' % (
+            name,
+            statistics.median(timings) * 1000,
+            statistics.quantiles(timings, n=10)[-1] * 1000,
+            statistics.mean(timings) * 1000,
+        ))
+
+
+if __name__ == '__main__':
+    main()
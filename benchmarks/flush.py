@@ -0,0 +1,134 @@
+"""
+Measure the time to flush tables between tests with each flush strategy.
+
+Usage (with a CockroachDB node listening on localhost:26257):
+
+    python benchmarks/flush.py [--iterations N] [--tables N] [--written N] [--rows N]
+
+Each iteration inserts --rows rows into --written of the --tables tables (a
+chain of tables with foreign keys to the previous table) and then flushes all
+of the tables, as TransactionTestCase does after each test. The "truncate"
+strategy is the backend's default, "delete" and "auto" are
+OPTIONS['flush'] strategies without skipping unwritten tables, and
+"auto+skip" is OPTIONS['flush'] = True.
+"""
+import argparse
+import os
+import statistics
+import time
+
+import django
+from django.conf import settings
+from django.core.management.color import no_style
+
+STRATEGIES = {
+    'truncate': None,
+    'delete': {'strategy': 'delete', 'skip_unwritten_tables': False},
+    'auto': {'strategy': 'auto', 'skip_unwritten_tables': False},
+    'auto+skip': True,
+}
+
+
+def configure():
+    settings.configure(
+        DATABASES={
+            'default': {
+                'ENGINE': 'django_cockroachdb',
+                'NAME': os.environ.get('COCKROACH_NAME', 'defaultdb'),
+                'USER': os.environ.get('COCKROACH_USER', 'root'),
+                'PASSWORD': '',
+                'HOST': os.environ.get('COCKROACH_HOST', 'localhost'),
+                'PORT': os.environ.get('COCKROACH_PORT', 26257),
+            },
+        },
+        USE_TZ=False,
+        DISABLE_COCKROACHDB_TELEMETRY=True,
+    )
+    django.setup()
+
+
+def create_tables(count):
+    from django.db import connection
+
+    tables = ['bench_flush_%d' % index for index in range(count)]
+    with connection.cursor() as cursor:
+        for index, table in enumerate(tables):
+            cursor.execute('DROP TABLE IF EXISTS %s CASCADE' % table)
+            references = ' REFERENCES %s' % tables[index - 1] if index else ''
+            cursor.execute('CREATE TABLE %s (id INT PRIMARY KEY, parent_id INT%s)' % (table, references))
+    return tables
+
+
+def drop_tables(tables):
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        for table in reversed(tables):
+            cursor.execute('DROP TABLE IF EXISTS %s CASCADE' % table)
+
+
+def write(tables, rows):
+    from django.db import connection
+
+    from django_cockroachdb.operations import mark_table_written
+
+    with connection.cursor() as cursor:
+        for table in tables:
+            # Refer to the rows (with the same ids) of the previous table.
+            parent_id = 'i' if table != 'bench_flush_0' else 'NULL'
+            cursor.execute(
+                'INSERT INTO %s SELECT i, %s FROM generate_series(1, %%s) AS i' % (table, parent_id),
+                [rows],
+            )
+            # As the ORM does for each INSERT.
+            mark_table_written(connection.alias, table)
+
+
+def run(tables, written, rows, iterations):
+    from django.db import connection
+
+    timings = []
+    for _ in range(iterations):
+        write(written, rows)
+        start = time.perf_counter()
+        sql_list = connection.ops.sql_flush(no_style(), tables)
+        connection.ops.execute_sql_flush(sql_list)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--tables', type=int, default=30)
+    parser.add_argument('--written', type=int, default=3)
+    parser.add_argument('--rows', type=int, default=10)
+    args = parser.parse_args()
+    configure()
+
+    from django.db import connection
+
+    from django_cockroachdb.operations import CLEAN_TABLES
+
+    tables = create_tables(args.tables)
+    # The first tables so that foreign keys refer to written rows.
+    written = tables[:args.written]
+    try:
+        for name, options in STRATEGIES.items():
+            connection.settings_dict['OPTIONS']['flush'] = options
+            CLEAN_TABLES.clear()
+            # Warm up (and, for auto+skip, learn which tables are empty).
+            run(tables, written, args.rows, 1)
+            timings = run(tables, written, args.rows, args.iterations)
+            print('%-10s p50=%.2fms p90=%.2fms mean=%.2fms' % (
+                name,
+                statistics.median(timings) * 1000,
+                statistics.quantiles(timings, n=10)[-1] * 1000,
+                statistics.mean(timings) * 1000,
+            ))
+    finally:
+        drop_tables(tables)
+
+
+if __name__ == '__main__':
+    main()
@@ -45,6 +45,8 @@ cd _django_repo/tests/
 # Bring in the settings needed to run the tests with cockroach.
 cp ../../django-test-suite/cockroach_settings.py .
 cp ../../django-test-suite/cockroach_gis_settings.py .
+# Bring in django-cockroachdb's own tests.
+cp -r ../../tests/cockroachdb .
 
 # Run the tests!
 python3 ../../django-test-suite/runtests.py
@@ -14,20 +14,34 @@ try:
 except ImportError:
     raise ImproperlyConfigured("Error loading psycopg or psycopg2 module")
 
+from django.db.backends.base.base import NO_DB_ALIAS
 from django.db.backends.postgresql.base import (
     DatabaseWrapper as PostgresDatabaseWrapper,
 )
+from django.db.backends.postgresql.psycopg_any import is_psycopg3, mogrify
 
 from . import __version__ as django_cockroachdb_version
 from .client import DatabaseClient
 from .creation import DatabaseCreation
 from .features import DatabaseFeatures
+from .fields import UNIQUE_ROWID_DEFAULT, UNORDERED_UNIQUE_ROWID_DEFAULT
+from .instrumentation import StatementRecorder, get_instrumentation_options
 from .introspection import DatabaseIntrospection
 from .operations import DatabaseOperations
+from .prepared import PreparedStatementCache, get_prepared_statements_options
 from .schema import DatabaseSchemaEditor
+from .tagging import StatementTagger, get_tagging_options
 
 RAN_TELEMETRY_QUERY = False
 
+# Server version strings keyed by (HOST, PORT, NAME) so that each process
+# determines a database's version once rather than once per thread.
+SERVER_INFO_CACHE = {}
+
+# Match the numerical portion of the version numbers. For example,
+# v20.1.0-alpha.20191118-1842-g60d40b8 matches (20, 1, 0).
+VERSION_RE = re.compile(r'v(\d{1,2})\.(\d{1,2})\.(\d{1,2})')
+
 
 class DatabaseWrapper(PostgresDatabaseWrapper):
     vendor = 'cockroachdb'
@@ -42,10 +56,10 @@ class DatabaseWrapper(PostgresDatabaseWrapper):
     )
     data_types_suffix = dict(
         PostgresDatabaseWrapper.data_types_suffix,
-        BigAutoField='DEFAULT unique_rowid()',
+        BigAutoField=UNIQUE_ROWID_DEFAULT,
         # Unsupported: https://github.com/cockroachdb/django-cockroachdb/issues/84
         SmallAutoField='',
-        AutoField='DEFAULT unique_rowid()',
+        AutoField=UNIQUE_ROWID_DEFAULT,
     )
 
     SchemaEditorClass = DatabaseSchemaEditor
@@ -55,23 +69,168 @@ class DatabaseWrapper(PostgresDatabaseWrapper):
     ops_class = DatabaseOperations
     client_class = DatabaseClient
 
+    # OPTIONS that configure django-cockroachdb rather than psycopg.
+    cockroachdb_options = {
+        'as_of_system_time', 'batch_schema_changes', 'bulk_batch_max_bytes',
+        'cache_introspection', 'cockroachdb_version',
+        'default_transaction_read_only', 'default_transaction_use_follower_reads',
+        'flush', 'instrumentation', 'nodes', 'prepared_statements',
+        'statement_tags', 'transaction_retry', 'unordered_auto_fields',
+    }
+
+    # The number of times run_transaction() has retried the current
+    # transaction.
+    transaction_retries = 0
+    # The StatementRecorder if OPTIONS['instrumentation'] is set.
+    statement_recorder = None
+    # The StatementTagger if OPTIONS['statement_tags'] is set.
+    statement_tagger = None
+    # The PreparedStatementCache if OPTIONS['prepared_statements'] is set.
+    prepared_statements = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.settings_dict['OPTIONS'].get('unordered_auto_fields'):
+            self.data_types_suffix = dict(
+                self.data_types_suffix,
+                BigAutoField=UNORDERED_UNIQUE_ROWID_DEFAULT,
+                AutoField=UNORDERED_UNIQUE_ROWID_DEFAULT,
+            )
+        if (instrumentation := get_instrumentation_options(self)) is not None:
+            self.statement_recorder = StatementRecorder(self, **instrumentation)
+            self.execute_wrappers.append(self.statement_recorder)
+        if (tagging := get_tagging_options(self)) is not None:
+            self.statement_tagger = StatementTagger(self, **tagging)
+            self.execute_wrappers.append(self.statement_tagger)
+        if (prepared_statements := get_prepared_statements_options(self)) is not None:
+            self.prepared_statements = PreparedStatementCache(**prepared_statements)
+
+    @property
+    def pool(self):
+        nodes = self.settings_dict['OPTIONS'].get('nodes')
+        if self.alias == NO_DB_ALIAS or not nodes:
+            return super().pool
+
+        if self.alias not in self._connection_pools:
+            if self.settings_dict.get('CONN_MAX_AGE', 0) != 0:
+                raise ImproperlyConfigured("Pooling doesn't support persistent connections.")
+            # OPTIONS['nodes'] implies pooling.
+            pool_options = self.settings_dict['OPTIONS'].get('pool') or {}
+            if pool_options is True:
+                pool_options = {}
+            from psycopg_pool import ConnectionPool
+
+            from .pool import NodePool
+
+            connect_kwargs = self.get_connection_params()
+            # Ensure we run in autocommit, Django properly sets it later on.
+            connect_kwargs['autocommit'] = True
+            enable_checks = self.settings_dict['CONN_HEALTH_CHECKS']
+            pool = NodePool(
+                nodes,
+                kwargs=connect_kwargs,
+                configure=self._configure_connection,
+                check=ConnectionPool.check_connection if enable_checks else None,
+                **pool_options,
+            )
+            self._connection_pools.setdefault(self.alias, pool)
+
+        return self._connection_pools[self.alias]
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        for option in self.cockroachdb_options:
+            conn_params.pop(option, None)
+        if self.settings_dict['OPTIONS'].get('nodes') and not is_psycopg3:
+            raise ImproperlyConfigured("Connecting to multiple nodes requires psycopg >= 3")
+        if self.prepared_statements:
+            if not is_psycopg3 or self.settings_dict['OPTIONS'].get('server_side_binding') is not True:
+                raise ImproperlyConfigured(
+                    "OPTIONS['prepared_statements'] requires psycopg >= 3 and "
+                    "OPTIONS['server_side_binding'] = True"
+                )
+            from .prepared import PreparingCursor
+
+            conn_params['cursor_factory'] = PreparingCursor
+        return conn_params
+
     def init_connection_state(self):
         super().init_connection_state()
-        global RAN_TELEMETRY_QUERY
         if (
+            'cockroachdb_version' not in self.settings_dict['OPTIONS'] and
+            self._server_info_cache_key not in SERVER_INFO_CACHE
+        ):
+            SERVER_INFO_CACHE[self._server_info_cache_key] = self._get_server_info()
+        if self.statement_tagger:
+            self.statement_tagger.connection_opened()
+
+    def _configure_connection(self, connection):
+        # This function is called from init_connection_state and from the
+        # psycopg pool itself after a connection is opened. Unlike the
+        # PostgreSQL backend, which runs each setup statement separately, run
+        # them (and the telemetry query) in a single round trip.
+        global RAN_TELEMETRY_QUERY
+        if self.prepared_statements:
+            # psycopg prepares statements executed this number of times
+            # (Django disables prepared statements by default)...
+            connection.prepare_threshold = self.prepared_statements.threshold
+            # ... and deallocates the least recently used prepared statement
+            # beyond this number.
+            connection.prepared_max = self.prepared_statements.max_size
+        statements = self._connection_setup_statements(connection)
+        run_telemetry = (
             # Run the telemetry query once, not for every connection.
             not RAN_TELEMETRY_QUERY and
             # Don't run telemetry if the user disables it...
             not getattr(settings, 'DISABLE_COCKROACHDB_TELEMETRY', False) and
             # ... or when running Django's test suite.
             not os.environ.get('RUNNING_DJANGOS_TEST_SUITE') == 'true'
-        ):
-            with self.connection.cursor() as cursor:
-                cursor.execute(
-                    "SELECT crdb_internal.increment_feature_counter(%s)",
-                    ["django-cockroachdb %s" % django_cockroachdb_version]
-                )
-                RAN_TELEMETRY_QUERY = True
+        )
+        if run_telemetry:
+            statements.append((
+                'SELECT crdb_internal.increment_feature_counter(%s)',
+                ['django-cockroachdb %s' % django_cockroachdb_version],
+            ))
+        if not statements:
+            return False
+        with connection.cursor() as cursor:
+            # Parameters are interpolated on the client since multiple
+            # statements can't be sent with server-side parameters.
+            cursor.execute('; '.join(
+                mogrify(sql, params, connection) for sql, params in statements
+            ))
+        if run_telemetry:
+            RAN_TELEMETRY_QUERY = True
+        return True
+
+    def create_cursor(self, name=None):
+        cursor = super().create_cursor(name)
+        if self.prepared_statements and not name:
+            cursor.prepared_statements = self.prepared_statements
+        return cursor
+
+    def _connection_setup_statements(self, connection):
+        """
+        Return a list of (sql, params) tuples for the statements that configure
+        a newly opened connection.
+        """
+        statements = []
+        timezone_name = self.timezone_name
+        if timezone_name and connection.info.parameter_status('TimeZone') != timezone_name:
+            statements.append((self.ops.set_time_zone_sql(), [timezone_name]))
+        # Set the role on the connection. This is useful if the credential used
+        # to login is not the same as the role that owns database resources.
+        if new_role := self.settings_dict['OPTIONS'].get('assume_role'):
+            statements.append(('SET ROLE %s', [new_role]))
+        # Make transactions read-only, e.g. for a database alias that
+        # StalenessRouter sends reads to, and (for the latter) read from the
+        # nearest replica as of follower_read_timestamp().
+        for option in ('default_transaction_read_only', 'default_transaction_use_follower_reads'):
+            if self.settings_dict['OPTIONS'].get(option):
+                statements.append(('SET %s = on' % option, []))
+        if self.statement_recorder and self.statement_recorder.application_name:
+            statements.append(('SET application_name = %s', [self.statement_recorder.application_name]))
+        return statements
 
     def check_constraints(self, table_names=None):
         """
@@ -86,8 +245,19 @@ class DatabaseWrapper(PostgresDatabaseWrapper):
         # method is a no-op.
         pass
 
+    def close(self):
+        super().close()
+        # The schema may change before the next connection is opened.
+        self.introspection.clear_cache()
+
     def chunked_cursor(self):
-        return self.cursor()
+        # CockroachDB only supports server-side cursors (DECLARE) inside an
+        # explicit transaction since WITH HOLD cursors aren't supported. In
+        # autocommit mode, fall back to a regular cursor which fetches the
+        # entire result set.
+        if self.get_autocommit():
+            return self.cursor()
+        return super().chunked_cursor()
 
     @contextmanager
     def _nodb_cursor(self):
@@ -97,24 +267,51 @@ class DatabaseWrapper(PostgresDatabaseWrapper):
         with super(PostgresDatabaseWrapper, self)._nodb_cursor() as cursor:
             yield cursor
 
+    @property
+    def _server_info_cache_key(self):
+        return (self.settings_dict['HOST'], self.settings_dict['PORT'], self.settings_dict['NAME'])
+
+    def _get_server_info(self):
+        # CockroachDB reports its version in the crdb_version parameter when
+        # the connection is opened, avoiding a query.
+        server_info = self.connection.info.parameter_status('crdb_version')
+        if server_info is None:
+            with self.connection.cursor() as cursor:
+                cursor.execute('SELECT VERSION()')
+                server_info = cursor.fetchone()[0]
+        return server_info
+
     @cached_property
     def cockroachdb_server_info(self):
         # Something like 'CockroachDB CCL v20.1.0-alpha.20191118-1842-g60d40b8
         # (x86_64-unknown-linux-gnu, built 2020/02/03 23:09:23, go1.13.5)'.
-        with self.temporary_connection() as cursor:
-            cursor.execute('SELECT VERSION()')
-            return cursor.fetchone()[0]
+        key = self._server_info_cache_key
+        if key not in SERVER_INFO_CACHE:
+            # Opening a connection populates the cache in
+            # init_connection_state() unless the connection is already open.
+            with self.temporary_connection():
+                if key not in SERVER_INFO_CACHE:
+                    SERVER_INFO_CACHE[key] = self._get_server_info()
+        return SERVER_INFO_CACHE[key]
 
     @cached_property
     def cockroachdb_version(self):
-        # Match the numerical portion of the version numbers. For example,
-        # v20.1.0-alpha.20191118-1842-g60d40b8 returns (20, 1, 0).
-        match = re.search(r'v(\d{1,2})\.(\d{1,2})\.(\d{1,2})', self.cockroachdb_server_info)
-        if not match:
-            raise Exception(
-                'Unable to determine CockroachDB version from version '
-                'string %r.' % self.cockroachdb_server_info
-            )
+        # A version pinned in settings, e.g. '25.2.0', avoids determining the
+        # version from the server.
+        if pinned_version := self.settings_dict['OPTIONS'].get('cockroachdb_version'):
+            match = VERSION_RE.search('v' + pinned_version.removeprefix('v'))
+            if not match:
+                raise ImproperlyConfigured(
+                    "Unable to determine CockroachDB version from "
+                    "OPTIONS['cockroachdb_version'] = %r." % pinned_version
+                )
+        else:
+            match = VERSION_RE.search(self.cockroachdb_server_info)
+            if not match:
+                raise Exception(
+                    'Unable to determine CockroachDB version from version '
+                    'string %r.' % self.cockroachdb_server_info
+                )
         return tuple(int(x) for x in match.groups())
 
     def get_database_version(self):
@@ -0,0 +1,99 @@
+from django.db.backends.postgresql.compiler import (
+    SQLAggregateCompiler as BaseSQLAggregateCompiler,
+    SQLCompiler as BaseSQLCompiler, SQLDeleteCompiler,
+    SQLInsertCompiler as BaseSQLInsertCompiler, SQLUpdateCompiler,
+)
+from django.db.models.constants import OnConflict
+
+from .operations import UPSERT, mark_table_written
+
+__all__ = [
+    'SQLAggregateCompiler',
+    'SQLCompiler',
+    'SQLDeleteCompiler',
+    'SQLInsertCompiler',
+    'SQLUpdateCompiler',
+]
+
+
+class AsOfSystemTimeMixin:
+    # Whether the query is a part of a combined query (union(), etc.), whose
+    # clause is added to the combined query instead.
+    combinator_part = False
+
+    def as_of_system_time_sql(self, query):
+        """
+        Return the AS OF SYSTEM TIME clause for a SELECT of `query` (set by
+        QuerySet.as_of_system_time()), or None.
+        """
+        # The clause is only allowed on the outermost SELECT and can't be
+        # combined with locking reads.
+        if self.query.subquery or self.combinator_part or query.select_for_update:
+            return None
+        value = self.connection.ops.resolve_as_of_system_time(getattr(query, 'as_of_system_time', None))
+        if value is None:
+            return None
+        return self.connection.ops.as_of_system_time_sql(value)
+
+
+class SQLCompiler(AsOfSystemTimeMixin, BaseSQLCompiler):
+    def get_from_clause(self):
+        result, params = super().get_from_clause()
+        if result and (as_of_system_time := self.as_of_system_time_sql(self.query)):
+            result.append(as_of_system_time)
+        return result, params
+
+    def get_combinator_sql(self, combinator, all):
+        result, params = super().get_combinator_sql(combinator, all)
+        if as_of_system_time := self.as_of_system_time_sql(self.query):
+            # CockroachDB only allows the clause in the FROM clause of the
+            # top-level SELECT. (A combined query is a clone of its first
+            # query, so it has that query's value.)
+            result = ['SELECT * FROM (%s) AS combined %s' % (' '.join(result), as_of_system_time)]
+        return result, params
+
+    def _get_combinator_part_sql(self, compiler):
+        compiler.combinator_part = True
+        return super()._get_combinator_part_sql(compiler)
+
+
+class SQLAggregateCompiler(AsOfSystemTimeMixin, BaseSQLAggregateCompiler):
+    def as_sql(self):
+        sql, params = super().as_sql()
+        # The inner query is compiled as a subquery so the clause is added to
+        # the outer query instead.
+        if as_of_system_time := self.as_of_system_time_sql(self.query.inner_query):
+            sql = '%s %s' % (sql, as_of_system_time)
+        return sql, params
+
+
+class SQLInsertCompiler(BaseSQLInsertCompiler):
+    def can_upsert(self):
+        """
+        Return True if INSERT ... ON CONFLICT DO UPDATE can be replaced by
+        UPSERT, which skips the read of the conflicting row: the conflict
+        target must be the primary key and every other inserted column must be
+        updated.
+        """
+        if self.query.on_conflict != OnConflict.UPDATE:
+            return False
+        pk_columns = {field.column for field in self.query.get_meta().pk_fields}
+        if {field.column for field in self.query.unique_fields} != pk_columns:
+            return False
+        inserted_columns = {field.column for field in self.query.fields} - pk_columns
+        return {field.column for field in self.query.update_fields} == inserted_columns
+
+    def as_sql(self):
+        if not self.can_upsert():
+            return super().as_sql()
+        on_conflict = self.query.on_conflict
+        self.query.on_conflict = UPSERT
+        try:
+            return super().as_sql()
+        finally:
+            self.query.on_conflict = on_conflict
+
+    def execute_sql(self, returning_fields=None):
+        # Keep track of the tables that OPTIONS['flush'] can't skip.
+        mark_table_written(self.connection.alias, self.query.get_meta().db_table)
+        return super().execute_sql(returning_fields)
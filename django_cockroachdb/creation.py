@@ -1,3 +1,6 @@
+import sys
+
+from django.db import NotSupportedError
 from django.db.backends.postgresql.creation import (
     DatabaseCreation as PostgresDatabaseCreation,
 )
@@ -6,7 +9,111 @@ from django.db.backends.postgresql.creation import (
 class DatabaseCreation(PostgresDatabaseCreation):
 
     def _clone_test_db(self, suffix, verbosity, keepdb=False):
-        raise NotImplementedError(
-            "CockroachDB doesn't support cloning databases. "
-            "Disable the option to run tests in parallel processes."
+        source_database_name = self.connection.settings_dict['NAME']
+        target_database_name = self.get_test_db_clone_settings(suffix)['NAME']
+        backup_uri = self.connection.settings_dict['TEST'].get('CLONE_BACKUP_URI')
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT 1 FROM [SHOW DATABASES] WHERE database_name = %s',
+                [target_database_name],
+            )
+            if cursor.fetchone():
+                if keepdb:
+                    return
+                if verbosity >= 1:
+                    self.log('Destroying old test database for alias %s...' % (
+                        self._get_database_display_str(verbosity, target_database_name),
+                    ))
+                cursor.execute('DROP DATABASE %s CASCADE' % self._quote_name(target_database_name))
+            try:
+                if backup_uri:
+                    self._restore_test_db(cursor, source_database_name, target_database_name, backup_uri)
+                else:
+                    self._copy_test_db(cursor, source_database_name, target_database_name)
+            except Exception as e:
+                self.log('Got an error cloning the test database: %s' % e)
+                sys.exit(2)
+
+    def _restore_test_db(self, cursor, source_database_name, target_database_name, backup_uri):
+        """
+        Restore a backup of the source database (taken before the first clone)
+        as the target database. `backup_uri` is a backup collection location
+        such as 'nodelocal://1/django-tests'.
+        """
+        collection = '%s/%s' % (backup_uri.rstrip('/'), source_database_name)
+        if not getattr(self, '_backed_up_test_db', False):
+            cursor.execute('BACKUP DATABASE %s INTO %%s' % self._quote_name(source_database_name), [collection])
+            self._backed_up_test_db = True
+        cursor.execute(
+            'RESTORE DATABASE %s FROM LATEST IN %%s WITH new_db_name = %%s' % self._quote_name(source_database_name),
+            [collection, target_database_name],
+        )
+
+    def _copy_test_db(self, cursor, source_database_name, target_database_name):
+        """
+        Create the target database from the source database's type and table
+        definitions and copy the source's data into it. Foreign keys are added
+        after the data is copied. Views aren't supported.
+        """
+        cursor.execute(
+            """
+            SELECT schema_name, descriptor_name, descriptor_type, create_nofks, alter_statements, validate_statements
+            FROM crdb_internal.create_statements
+            WHERE database_name = %s AND NOT is_virtual AND NOT is_temporary
+            ORDER BY descriptor_id
+            """,
+            [source_database_name],
+        )
+        descriptors = cursor.fetchall()
+        # A view's definition refers to the source database's tables.
+        if views := [name for _, name, descriptor_type, *_ in descriptors if descriptor_type == 'view']:
+            raise NotSupportedError(
+                "Cloning a database with views (%s) requires TEST['CLONE_BACKUP_URI']." % ', '.join(views)
+            )
+        # User-defined types (e.g. enums) aren't in create_statements.
+        cursor.execute(
+            """
+            SELECT schema_name, create_statement
+            FROM crdb_internal.create_type_statements
+            WHERE database_name = %s
+            ORDER BY descriptor_id
+            """,
+            [source_database_name],
+        )
+        types = cursor.fetchall()
+        # The columns that can be inserted into (not hidden or computed).
+        cursor.execute(
+            """
+            SELECT table_schema, table_name, array_agg(column_name ORDER BY ordinal_position)
+            FROM information_schema.columns
+            WHERE is_hidden = 'NO'
+                AND is_generated = 'NEVER'
+                AND table_schema NOT IN ('crdb_internal', 'information_schema', 'pg_catalog', 'pg_extension')
+            GROUP BY table_schema, table_name
+            """
         )
+        table_columns = {(schema, table): columns for schema, table, columns in cursor.fetchall()}
+        quote_name = self.connection.ops.quote_name
+        cursor.execute('CREATE DATABASE %s' % self._quote_name(target_database_name))
+        # The table definitions aren't qualified by the database name.
+        cursor.execute('SET database = %s' % self._quote_name(target_database_name))
+        try:
+            for schema in sorted({schema for schema, *_ in (*types, *descriptors)} - {'public'}):
+                cursor.execute('CREATE SCHEMA %s' % quote_name(schema))
+            for _, create_statement in types:
+                cursor.execute(create_statement)
+            for _, _, _, create_statement, *_ in descriptors:
+                cursor.execute(create_statement)
+            for schema, name, descriptor_type, *_ in descriptors:
+                if descriptor_type != 'table' or not (columns := table_columns.get((schema, name))):
+                    continue
+                columns = ', '.join(quote_name(column) for column in columns)
+                cursor.execute('INSERT INTO %s.%s.%s (%s) SELECT %s FROM %s.%s.%s' % (
+                    self._quote_name(target_database_name), quote_name(schema), quote_name(name), columns,
+                    columns, self._quote_name(source_database_name), quote_name(schema), quote_name(name),
+                ))
+            for *_, alter_statements, validate_statements in descriptors:
+                for statement in (*alter_statements, *validate_statements):
+                    cursor.execute(statement)
+        finally:
+            cursor.execute('SET database = %s' % self._quote_name(source_database_name))
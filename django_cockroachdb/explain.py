@@ -0,0 +1,192 @@
+import re
+
+# Go-style durations as printed by CockroachDB, e.g. '12µs', '1.5ms', '1m2.5s'.
+DURATION_UNITS = {
+    'ns': 1e-9,
+    'µs': 1e-6,
+    'us': 1e-6,
+    'ms': 1e-3,
+    's': 1,
+    'm': 60,
+    'h': 3600,
+}
+DURATION_RE = re.compile(r'(\d+(?:\.\d+)?)(ns|µs|us|ms|s|m|h)')
+SIZE_UNITS = {
+    'B': 1,
+    'KiB': 1024,
+    'MiB': 1024 ** 2,
+    'GiB': 1024 ** 3,
+    'TiB': 1024 ** 4,
+}
+SIZE_RE = re.compile(r'(\d+(?:\.\d+)?) ?(B|KiB|MiB|GiB|TiB)\b')
+COUNT_RE = re.compile(r'\d[\d,]*')
+# The characters that draw the plan tree.
+TREE_CHARACTERS = '│├└─ '
+
+
+def parse_duration(value):
+    """Return the number of seconds in a duration like '1.5ms', or None."""
+    if value is None:
+        return None
+    matches = DURATION_RE.findall(value)
+    if not matches:
+        return None
+    return sum(float(number) * DURATION_UNITS[unit] for number, unit in matches)
+
+
+def parse_size(value):
+    """Return the number of bytes in a size like '1.2 KiB', or None."""
+    if value is None or not (match := SIZE_RE.search(value)):
+        return None
+    number, unit = match.groups()
+    return int(float(number) * SIZE_UNITS[unit])
+
+
+def parse_count(value):
+    """Return the leading count in a value like '1,234 (...)', or None."""
+    if value is None or not (match := COUNT_RE.match(value)):
+        return None
+    return int(match[0].replace(',', ''))
+
+
+class PlanNode:
+    """An operator (e.g. 'scan' or 'hash join') in an EXPLAIN plan."""
+
+    def __init__(self, name, depth=0):
+        self.name = name
+        self.depth = depth
+        # The "key: value" lines below the operator, e.g.
+        # {'table': 'polls_choice@polls_choice_pkey', 'spans': 'FULL SCAN'}.
+        self.attributes = {}
+        self.children = []
+
+    def __repr__(self):
+        return '<%s: %s>' % (self.__class__.__name__, self.name)
+
+    def walk(self):
+        """Yield this node and its descendants, depth first."""
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def find(self, name):
+        """Return the nodes in this subtree named `name`."""
+        return [node for node in self.walk() if node.name == name]
+
+    @property
+    def actual_row_count(self):
+        return parse_count(self.attributes.get('actual row count'))
+
+    @property
+    def estimated_row_count(self):
+        return parse_count(self.attributes.get('estimated row count'))
+
+    @property
+    def kv_rows_read(self):
+        return parse_count(self.attributes.get('KV rows decoded', self.attributes.get('KV rows read')))
+
+    @property
+    def kv_bytes_read(self):
+        return parse_size(self.attributes.get('KV bytes read'))
+
+    @property
+    def kv_time(self):
+        return parse_duration(self.attributes.get('KV time'))
+
+    @property
+    def contention_time(self):
+        return parse_duration(self.attributes.get('KV contention time'))
+
+    @property
+    def execution_time(self):
+        return parse_duration(self.attributes.get('execution time'))
+
+    @property
+    def full_scan(self):
+        return self.attributes.get('spans') == 'FULL SCAN'
+
+
+class Plan:
+    """
+    A parsed EXPLAIN or EXPLAIN ANALYZE plan. `attributes` holds the
+    statement-level "key: value" lines (e.g. 'execution time') and `root`
+    the top operator of the plan tree.
+    """
+
+    def __init__(self, attributes, root, text):
+        self.attributes = attributes
+        self.root = root
+        self.text = text
+
+    def __repr__(self):
+        return '<%s: %s>' % (self.__class__.__name__, self.root.name if self.root else None)
+
+    def __str__(self):
+        return self.text
+
+    def walk(self):
+        return self.root.walk() if self.root else iter(())
+
+    def find(self, name):
+        return self.root.find(name) if self.root else []
+
+    @property
+    def planning_time(self):
+        return parse_duration(self.attributes.get('planning time'))
+
+    @property
+    def execution_time(self):
+        return parse_duration(self.attributes.get('execution time'))
+
+    @property
+    def rows_read(self):
+        return parse_count(self.attributes.get('rows decoded from KV', self.attributes.get('rows read from KV')))
+
+    @property
+    def bytes_read(self):
+        return parse_size(self.attributes.get('rows decoded from KV', self.attributes.get('rows read from KV')))
+
+    @property
+    def contention_time(self):
+        return parse_duration(self.attributes.get('cumulative time spent due to contention'))
+
+    @property
+    def full_scans(self):
+        return [node for node in self.walk() if node.full_scan]
+
+
+def parse_plan(text):
+    """Parse the text output of EXPLAIN or EXPLAIN ANALYZE into a Plan."""
+    attributes = {}
+    root = None
+    # The most recent node at each depth.
+    stack = []
+    for line in text.splitlines():
+        bullet = line.find('•')
+        if bullet != -1:
+            node = PlanNode(line[bullet + 1:].strip(), depth=bullet)
+            while stack and stack[-1].depth >= node.depth:
+                stack.pop()
+            if stack:
+                stack[-1].children.append(node)
+            else:
+                root = node
+            stack.append(node)
+            continue
+        key, sep, value = line.lstrip(TREE_CHARACTERS).partition(':')
+        if not sep or not key:
+            continue
+        target = stack[-1].attributes if stack else attributes
+        # Keep the first value, e.g. of a statement-level attribute that's
+        # repeated in a subquery's plan.
+        target.setdefault(key.strip(), value.strip())
+    return Plan(attributes, root, text)
+
+
+def explain_analyze(queryset, debug=False, **options):
+    """
+    Execute `queryset` with EXPLAIN ANALYZE and return the parsed Plan. With
+    `debug`, EXPLAIN ANALYZE (DEBUG) also generates a statement bundle; the
+    returned text then includes the bundle's location rather than a plan.
+    """
+    return parse_plan(queryset.explain(analyze=True, debug=debug, **options))
@@ -7,9 +7,12 @@ from django.utils.functional import cached_property
 class DatabaseFeatures(PostgresDatabaseFeatures):
     minimum_database_version = (24, 1)
 
-    # Cloning databases doesn't speed up tests.
+    # Cloning databases doesn't speed up tests, so it's opt-in.
     # https://github.com/cockroachdb/django-cockroachdb/issues/206
-    can_clone_databases = False
+    @cached_property
+    def can_clone_databases(self):
+        test_settings = self.connection.settings_dict['TEST']
+        return bool(test_settings.get('CLONE_BY_COPYING') or test_settings.get('CLONE_BACKUP_URI'))
 
     # Not supported: https://github.com/cockroachdb/cockroach/issues/31632
     can_defer_constraint_checks = False
@@ -37,6 +40,9 @@ class DatabaseFeatures(PostgresDatabaseFeatures):
     # ('JSON', 'TEXT', 'XML', and 'YAML').
     supported_explain_formats = set()
 
+    # CREATE INDEX ... STORING (the schema editor's translation of INCLUDE).
+    supports_covering_indexes = True
+
     # Not supported: https://github.com/cockroachdb/cockroach/issues/41645
     supports_regex_backreferencing = False
 
@@ -0,0 +1,78 @@
+from django.db.models import (
+    AutoField, BigAutoField, CharField, Field, UUIDField,
+)
+from django.db.models.expressions import RawSQL
+from django.utils.functional import cached_property
+
+__all__ = ['CockroachUUIDAutoField', 'RegionField', 'UnorderedBigAutoField']
+
+# unique_rowid() values are roughly ordered by time so inserts concentrate on
+# the range with the highest keys. unordered_unique_rowid() (bit-reversed) and
+# gen_random_uuid() values spread inserts across ranges:
+# https://www.cockroachlabs.com/docs/stable/performance-best-practices-overview#unique-id-best-practices
+UNIQUE_ROWID_DEFAULT = 'DEFAULT unique_rowid()'
+UNORDERED_UNIQUE_ROWID_DEFAULT = 'DEFAULT unordered_unique_rowid()'
+GEN_RANDOM_UUID_DEFAULT = 'DEFAULT gen_random_uuid()'
+# The region of the node that a row is inserted through, as for the crdb_region
+# column that CockroachDB adds to REGIONAL BY ROW tables.
+REGION_DEFAULT = 'default_to_database_primary_region(gateway_region())::crdb_internal_region'
+
+
+class UnorderedBigAutoField(BigAutoField):
+    """A BigAutoField that defaults to unordered_unique_rowid()."""
+
+    def db_type_suffix(self, connection):
+        return UNORDERED_UNIQUE_ROWID_DEFAULT
+
+
+class CockroachUUIDAutoField(UUIDField, AutoField):
+    """
+    A UUID primary key that the database generates with gen_random_uuid().
+    Unlike UUIDField(default=uuid.uuid4), the value is generated by the
+    database and returned by INSERT ... RETURNING.
+
+    It's an AutoField, so that QuerySet.bulk_create() omits it for objects
+    without a primary key and it can be used as DEFAULT_AUTO_FIELD, but it
+    behaves as a UUIDField rather than as an IntegerField.
+    """
+
+    def db_type_suffix(self, connection):
+        return GEN_RANDOM_UUID_DEFAULT
+
+    def rel_db_type(self, connection):
+        return UUIDField().db_type(connection=connection)
+
+    @cached_property
+    def validators(self):
+        # Skip IntegerField's validators of the range of integers.
+        return [*self.default_validators, *self._validators]
+
+    def get_prep_value(self, value):
+        # IntegerField.get_prep_value() converts the value to an integer.
+        return self.to_python(Field.get_prep_value(self, value))
+
+    def _check_max_length_warning(self):
+        # UUIDField sets max_length, which IntegerField warns about.
+        return []
+
+
+class RegionField(CharField):
+    """
+    A column of a multi-region database's regions (crdb_internal_region) for
+    RegionalByRow(field=...), which defaults to the region of the node that
+    the row is inserted through.
+    """
+    description = 'CockroachDB region'
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('db_default', RawSQL(REGION_DEFAULT, ()))
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if kwargs.get('db_default') == RawSQL(REGION_DEFAULT, ()):
+            del kwargs['db_default']
+        return name, path, args, kwargs
+
+    def db_type(self, connection):
+        return 'crdb_internal_region'
@@ -0,0 +1,102 @@
+from django.core import checks
+from django.db.models import Index
+from django.utils.functional import cached_property
+
+__all__ = ['HashShardedIndex']
+
+
+class HashShardedIndex(Index):
+    """
+    An index whose keys are prefixed by a hash of its columns, spreading
+    sequential keys (e.g. timestamps) across `bucket_count` ranges rather than
+    writing to a single range:
+    https://www.cockroachlabs.com/docs/stable/hash-sharded-indexes
+
+    With `primary_key=True`, the table's primary key is hash-sharded rather
+    than a secondary index being created. Its fields must be the model's
+    primary key fields.
+    """
+    suffix = 'hash'
+
+    def __init__(self, *expressions, bucket_count=None, primary_key=False, **kwargs):
+        super().__init__(*expressions, **kwargs)
+        if bucket_count is not None and (not isinstance(bucket_count, int) or bucket_count < 2):
+            raise ValueError('HashShardedIndex.bucket_count must be an integer greater than 1.')
+        if primary_key and (self.expressions or self.condition or self.include or self.opclasses):
+            raise ValueError(
+                'A primary key HashShardedIndex must use fields and cannot have '
+                'a condition, include, or opclasses.'
+            )
+        self.bucket_count = bucket_count
+        self.primary_key = primary_key
+
+    @cached_property
+    def max_name_length(self):
+        # Allow for the suffix being longer than Index.suffix.
+        return Index.max_name_length - len(Index.suffix) + len(self.suffix)
+
+    def deconstruct(self):
+        path, args, kwargs = super().deconstruct()
+        if self.bucket_count is not None:
+            kwargs['bucket_count'] = self.bucket_count
+        if self.primary_key:
+            kwargs['primary_key'] = True
+        return path, args, kwargs
+
+    def check(self, model, connection):
+        errors = super().check(model, connection)
+        if self.primary_key and not self._is_primary_key(model):
+            errors.append(
+                checks.Error(
+                    "The primary key HashShardedIndex '%s' must use the primary "
+                    "key fields: %s." % (self.name, ', '.join(self._primary_key_field_names(model))),
+                    obj=model,
+                    id='django_cockroachdb.E001',
+                )
+            )
+        return errors
+
+    def get_with_params(self):
+        if self.bucket_count is None:
+            return []
+        return ['bucket_count = %d' % self.bucket_count]
+
+    def _fields(self, model):
+        return [model._meta.get_field(field_name) for field_name, _ in self.fields_orders]
+
+    def _primary_key_field_names(self, model):
+        return [field.name for field in model._meta.pk_fields]
+
+    def _is_primary_key(self, model):
+        return [field.name for field in self._fields(model)] == self._primary_key_field_names(model)
+
+    def _check_primary_key(self, model):
+        # ALTER PRIMARY KEY on other columns would change the table's primary
+        # key.
+        if not self._is_primary_key(model):
+            raise ValueError(
+                "The primary key HashShardedIndex '%s' must use the primary key "
+                "fields of %s." % (self.name, model._meta.label)
+            )
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        with_params = self.get_with_params()
+        if self.primary_key:
+            self._check_primary_key(model)
+            extra = ' USING HASH'
+            if with_params:
+                extra += ' WITH (%s)' % ', '.join(with_params)
+            return schema_editor._alter_primary_key_sql(model, self._fields(model), extra=extra)
+        statement = super().create_sql(
+            model, schema_editor, using=using, sql=schema_editor.sql_create_hash_sharded_index, **kwargs
+        )
+        if with_params:
+            statement.parts['extra'] = ' WITH (%s)%s' % (', '.join(with_params), statement.parts['extra'])
+        return statement
+
+    def remove_sql(self, model, schema_editor, **kwargs):
+        if self.primary_key:
+            self._check_primary_key(model)
+            # Restore an unsharded primary key.
+            return schema_editor._alter_primary_key_sql(model, model._meta.pk_fields)
+        return super().remove_sql(model, schema_editor, **kwargs)
@@ -0,0 +1,241 @@
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import namedtuple
+from functools import lru_cache
+from itertools import accumulate
+
+from django.db.utils import OperationalError
+
+from .transaction import is_serialization_failure
+
+logger = logging.getLogger('django.db.backends')
+
+# The defaults for DATABASES['OPTIONS']['instrumentation'].
+DEFAULT_INSTRUMENTATION_OPTIONS = {
+    # The Registry that aggregates the statistics of each statement
+    # fingerprint (REGISTRY by default).
+    'registry': None,
+    # A callable that's passed a StatementEvent after each statement.
+    'callback': None,
+    # The connection's application_name, which also labels its statistics so
+    # they can be matched with crdb_internal.node_statement_statistics.
+    'application_name': None,
+}
+
+# The upper bounds of the histogram buckets.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ROWS_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+RETRIES_BUCKETS = (0, 1, 2, 3, 5, 10)
+
+# The information about an executed statement that's passed to the callback.
+# `retries` is the number of times run_transaction() had retried the
+# transaction that the statement ran in, `rows` is None if unknown, and
+# `error` is the exception the statement raised, if any.
+StatementEvent = namedtuple(
+    'StatementEvent', 'alias application_name fingerprint duration rows retries error',
+)
+
+COMMENT_RE = re.compile(r'/\*.*?\*/|--[^\n]*', re.DOTALL)
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'(?<![\w."$])-?\b\d+(?:\.\d+)?(?:e[+-]?\d+)?\b', re.IGNORECASE)
+PLACEHOLDER_RE = re.compile(r'%s|%\(\w+\)s|\$\d+')
+LIST_RE = re.compile(r'\(\s*_(?:\s*,\s*_)+\s*\)')
+ROWS_RE = re.compile(r'(\(\s*_(?:\s*,\s*_)*\s*\))(?:\s*,\s*\(\s*_(?:\s*,\s*_)*\s*\))+')
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """
+    Return `sql` with its constants and placeholders replaced by _ and lists
+    (and VALUES rows) of them shortened with __more__, as in the statement
+    fingerprints of CockroachDB's DB Console, so that executions of a
+    statement with different values (or numbers of values) have the same
+    fingerprint. Comments (e.g. from OPTIONS['statement_tags']) are removed.
+    """
+    sql = STRING_RE.sub('_', sql)
+    sql = COMMENT_RE.sub('', sql)
+    sql = PLACEHOLDER_RE.sub('_', sql)
+    sql = NUMBER_RE.sub('_', sql)
+    sql = ROWS_RE.sub(r'\1, (__more__)', sql)
+    sql = LIST_RE.sub('(_, __more__)', sql)
+    return WHITESPACE_RE.sub(' ', sql).strip()
+
+
+class Histogram:
+    """
+    The distribution of observed values over buckets with the given upper
+    bounds (and a final unbounded bucket), plus their count and sum.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative_counts(self):
+        """Return [(upper bound, number of values <= upper bound), ...]."""
+        return list(zip((*self.buckets, float('inf')), accumulate(self.counts)))
+
+
+class StatementStats:
+    """The statistics of a statement fingerprint."""
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.rows = Histogram(ROWS_BUCKETS)
+        self.retries = Histogram(RETRIES_BUCKETS)
+        self.errors = 0
+        self.serialization_failures = 0
+
+    def observe(self, event):
+        self.latency.observe(event.duration)
+        if event.rows is not None:
+            self.rows.observe(event.rows)
+        self.retries.observe(event.retries)
+        if event.error is not None:
+            self.errors += 1
+            if isinstance(event.error, OperationalError) and is_serialization_failure(event.error):
+                self.serialization_failures += 1
+
+
+def _label_value(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+class Registry:
+    """
+    Statement statistics keyed by (alias, application_name, fingerprint),
+    which can be exported in the Prometheus text format.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, event):
+        key = (event.alias, event.application_name, event.fingerprint)
+        with self._lock:
+            if (stats := self._stats.get(key)) is None:
+                stats = self._stats[key] = StatementStats()
+            stats.observe(event)
+
+    def stats(self):
+        """Return {(alias, application_name, fingerprint): StatementStats}."""
+        with self._lock:
+            return dict(self._stats)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def prometheus_text(self, prefix='django_cockroachdb_statement'):
+        """Return the statistics in the Prometheus text exposition format."""
+        histograms = [
+            ('latency_seconds', 'The duration of statements.', 'latency'),
+            ('rows', 'The number of rows returned or affected by statements.', 'rows'),
+            ('retries', 'The number of transaction retries before statements ran.', 'retries'),
+        ]
+        counters = [
+            ('errors_total', 'The number of statements that raised an error.', 'errors'),
+            (
+                'serialization_failures_total',
+                'The number of statements that failed with a serialization failure.',
+                'serialization_failures',
+            ),
+        ]
+        stats = sorted(self.stats().items(), key=lambda item: tuple(str(value) for value in item[0]))
+        lines = []
+        for name, help_text, attr in histograms:
+            name = '%s_%s' % (prefix, name)
+            lines += ['# HELP %s %s' % (name, help_text), '# TYPE %s histogram' % name]
+            for key, statement_stats in stats:
+                labels = self._labels(key)
+                histogram = getattr(statement_stats, attr)
+                for bound, count in histogram.cumulative_counts():
+                    bound = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append('%s_bucket{%s,le="%s"} %d' % (name, labels, bound, count))
+                lines.append('%s_sum{%s} %s' % (name, labels, histogram.sum))
+                lines.append('%s_count{%s} %d' % (name, labels, histogram.count))
+        for name, help_text, attr in counters:
+            name = '%s_%s' % (prefix, name)
+            lines += ['# HELP %s %s' % (name, help_text), '# TYPE %s counter' % name]
+            for key, statement_stats in stats:
+                lines.append('%s{%s} %d' % (name, self._labels(key), getattr(statement_stats, attr)))
+        return '\n'.join(lines) + '\n'
+
+    def _labels(self, key):
+        alias, application_name, fingerprint = key
+        return 'database="%s",application_name="%s",fingerprint="%s"' % (
+            _label_value(alias), _label_value(application_name or ''), _label_value(fingerprint),
+        )
+
+
+# The registry of databases that don't set OPTIONS['instrumentation']['registry'].
+REGISTRY = Registry()
+
+
+def get_instrumentation_options(connection):
+    """
+    Return the OPTIONS['instrumentation'] settings merged with
+    DEFAULT_INSTRUMENTATION_OPTIONS, or None if the option isn't set.
+    """
+    options = connection.settings_dict['OPTIONS'].get('instrumentation')
+    if not options:
+        return None
+    if options is True:
+        options = {}
+    return {**DEFAULT_INSTRUMENTATION_OPTIONS, **options}
+
+
+class StatementRecorder:
+    """
+    An execute wrapper (installed by DatabaseWrapper if
+    OPTIONS['instrumentation'] is set) that times each statement and records
+    a StatementEvent.
+    """
+
+    def __init__(self, connection, registry=None, callback=None, application_name=None):
+        self.connection = connection
+        self.registry = REGISTRY if registry is None else registry
+        self.callback = callback
+        self.application_name = application_name
+
+    def __call__(self, execute, sql, params, many, context):
+        retries = self.connection.transaction_retries
+        error = None
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        except Exception as exc:
+            error = exc
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            rowcount = getattr(context['cursor'], 'rowcount', -1)
+            event = StatementEvent(
+                self.connection.alias,
+                self.application_name,
+                fingerprint(sql if isinstance(sql, str) else str(sql)),
+                duration,
+                rowcount if rowcount >= 0 and error is None else None,
+                retries,
+                error,
+            )
+            self.registry.record(event)
+            if self.callback is not None:
+                # An error in the callback mustn't replace the statement's
+                # result or exception.
+                try:
+                    self.callback(event)
+                except Exception:
+                    logger.exception('The instrumentation callback raised an exception.')
@@ -1,6 +1,97 @@
+import copy
+import re
+from collections import defaultdict
+from contextlib import contextmanager
+
 from django.db.backends.postgresql.introspection import (
-    DatabaseIntrospection as PostgresDatabaseIntrospection, TableInfo,
+    DatabaseIntrospection as PostgresDatabaseIntrospection, FieldInfo,
+    TableInfo,
 )
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+from .indexes import HashShardedIndex
+
+if is_psycopg3:
+    import psycopg
+
+# The hidden column that a hash-sharded index is prefixed with, e.g.
+# crdb_internal_created_at_shard_16.
+SHARD_COLUMN_RE = re.compile(r'^crdb_internal_.+_shard_\d+$')
+NUMERIC_TYPE = 1700
+
+
+def type_sizes(type_code, type_length, type_modifier):
+    """
+    Return the (display_size, internal_size, precision, scale) of a column,
+    from pg_type.typlen and pg_attribute.atttypmod, as
+    PostgresDatabaseIntrospection.get_table_description() derives them from
+    the database driver's cursor.description.
+    """
+    if is_psycopg3:
+        internal_size = type_length if type_length >= 0 else None
+        info = psycopg.postgres.types.get(type_code)
+        if info is not None and hasattr(info, 'get_display_size'):
+            display_size = info.get_display_size(type_modifier)
+            precision = info.get_precision(type_modifier)
+            scale = info.get_scale(type_modifier)
+        else:
+            display_size = precision = scale = None
+    else:
+        # As psycopg2's _make_column() computes them.
+        display_size = precision = scale = None
+        modifier = type_modifier - 4 if type_modifier > 0 else type_modifier
+        if type_length == -1:
+            internal_size = modifier >> 16 if type_code == NUMERIC_TYPE else modifier
+        else:
+            internal_size = type_length
+        if type_code == NUMERIC_TYPE:
+            precision = (modifier >> 16) & 0xFFFF
+            scale = modifier & 0xFFFF
+    return (
+        internal_size if display_size is None else display_size,
+        internal_size,
+        precision,
+        scale,
+    )
+
+
+class BulkConstraintsCursor:
+    """
+    A cursor for PostgresDatabaseIntrospection.get_constraints() that runs
+    each of its queries once for all `tables`, as a LATERAL subquery in which
+    the table name parameter (which get_constraints() passes last) refers to
+    each table in turn. Then, for each query, fetchall() returns the rows of
+    the table set in `table_name`.
+    """
+
+    def __init__(self, cursor, tables):
+        self.cursor = cursor
+        self.tables = tables
+        self.table_name = None
+        # The index of the query that get_constraints() runs next.
+        self.query_index = 0
+        # The rows of each query, {table_name: rows}.
+        self.results = []
+
+    def execute(self, sql, params):
+        if self.query_index == len(self.results):
+            *params, _ = params
+            *parts, last_part = sql.strip().removesuffix(';').split('%s')
+            self.cursor.execute(
+                'SELECT t.relname, q.* FROM unnest(%%s::STRING[]) AS t(relname), LATERAL (%s) AS q' % (
+                    '%s'.join(parts) + 't.relname' + last_part
+                ),
+                [self.tables, *params],
+            )
+            rows = defaultdict(list)
+            for table_name, *row in self.cursor.fetchall():
+                rows[table_name].append(tuple(row))
+            self.results.append(rows)
+        self.rows = self.results[self.query_index].get(self.table_name, [])
+        self.query_index += 1
+
+    def fetchall(self):
+        return self.rows
 
 
 class DatabaseIntrospection(PostgresDatabaseIntrospection):
@@ -8,10 +99,59 @@ class DatabaseIntrospection(PostgresDatabaseIntrospection):
     data_types_reverse[1184] = 'DateTimeField'  # TIMESTAMPTZ
     index_default_access_method = 'prefix'
 
+    def __init__(self, connection):
+        super().__init__(connection)
+        # Bulk introspection results, see cached().
+        self._cache = {}
+        self._cache_depth = 0
+
+    @contextmanager
+    def cached(self):
+        """
+        Within this block, introspect every table at once (in a few catalog
+        queries) the first time any table is introspected, and reuse the
+        results until the schema editor changes the schema.
+        """
+        self._cache_depth += 1
+        try:
+            yield
+        finally:
+            self._cache_depth -= 1
+            if not self._cache_depth:
+                self.clear_cache()
+
+    def clear_cache(self):
+        self._cache = {}
+
+    @property
+    def is_caching(self):
+        # With OPTIONS['cache_introspection'], the results are reused until the
+        # connection is closed (DatabaseWrapper.close() clears them).
+        return bool(self._cache_depth or self.connection.settings_dict['OPTIONS'].get('cache_introspection'))
+
+    def _from_cache(self, cursor, key, fetch):
+        if key not in self._cache:
+            self._cache[key] = fetch(cursor)
+        return self._cache[key]
+
+    def _is_cached_table(self, cursor, table_name):
+        """
+        Return True if the results are cached and include `table_name`, i.e.
+        the table existed when they were fetched.
+        """
+        return self.is_caching and table_name in self._from_cache(
+            cursor, 'descriptions', self._get_table_descriptions,
+        )
+
     def get_table_list(self, cursor):
+        """Return a list of table and view names in the current database."""
+        if self.is_caching:
+            return list(self._from_cache(cursor, 'tables', self._get_table_list))
+        return self._get_table_list(cursor)
+
+    def _get_table_list(self, cursor):
         # pg_catalog.obj_description is removed from this query to speed it up:
         # https://github.com/cockroachdb/cockroach/issues/95068
-        """Return a list of table and view names in the current database."""
         cursor.execute(
             """
             SELECT
@@ -34,3 +174,211 @@ class DatabaseIntrospection(PostgresDatabaseIntrospection):
             for row in cursor.fetchall()
             if row[0] not in self.ignored_tables
         ]
+
+    def get_table_description(self, cursor, table_name):
+        if self._is_cached_table(cursor, table_name):
+            return list(self._cache['descriptions'][table_name])
+        return super().get_table_description(cursor, table_name)
+
+    def _get_table_descriptions(self, cursor):
+        """
+        Return {table_name: [FieldInfo, ...]} for every table, deriving the
+        column sizes from pg_attribute rather than querying each table as
+        get_table_description() does.
+        """
+        cursor.execute(
+            """
+            SELECT
+                c.relname,
+                a.attname,
+                a.atttypid,
+                t.typlen,
+                a.atttypmod,
+                NOT (a.attnotnull OR (t.typtype = 'd' AND t.typnotnull)),
+                pg_get_expr(ad.adbin, ad.adrelid),
+                CASE WHEN collname = 'default' THEN NULL ELSE collname END,
+                a.attidentity != '',
+                col_description(a.attrelid, a.attnum)
+            FROM pg_attribute a
+            LEFT JOIN pg_attrdef ad ON a.attrelid = ad.adrelid AND a.attnum = ad.adnum
+            LEFT JOIN pg_collation co ON a.attcollation = co.oid
+            JOIN pg_type t ON a.atttypid = t.oid
+            JOIN pg_class c ON a.attrelid = c.oid
+            JOIN pg_namespace n ON c.relnamespace = n.oid
+            -- Omit hidden columns (e.g. rowid) like SELECT * does.
+            JOIN information_schema.columns ic
+                ON ic.table_schema = n.nspname
+                AND ic.table_name = c.relname
+                AND ic.column_name = a.attname
+            WHERE c.relkind IN ('f', 'm', 'p', 'r', 'v')
+                AND a.attnum > 0
+                AND NOT a.attisdropped
+                AND ic.is_hidden = 'NO'
+                AND n.nspname NOT IN ('pg_catalog', 'pg_toast')
+                AND pg_catalog.pg_table_is_visible(c.oid)
+            ORDER BY c.relname, a.attnum
+        """
+        )
+        descriptions = defaultdict(list)
+        for (
+            table_name, name, type_code, type_length, type_modifier,
+            null_ok, default, collation, is_autofield, comment,
+        ) in cursor.fetchall():
+            descriptions[table_name].append(FieldInfo(
+                name,
+                type_code,
+                *type_sizes(type_code, type_length, type_modifier),
+                null_ok,
+                default,
+                collation,
+                is_autofield,
+                comment,
+            ))
+        return dict(descriptions)
+
+    def get_relations(self, cursor, table_name):
+        if self._is_cached_table(cursor, table_name):
+            relations = self._from_cache(cursor, 'relations', self._get_relations)
+            return dict(relations.get(table_name, {}))
+        return super().get_relations(cursor, table_name)
+
+    def _get_relations(self, cursor):
+        """Return {table_name: get_relations(table_name)} for every table."""
+        cursor.execute(
+            """
+            SELECT c1.relname, a1.attname, c2.relname, a2.attname
+            FROM pg_constraint con
+            LEFT JOIN pg_class c1 ON con.conrelid = c1.oid
+            LEFT JOIN pg_class c2 ON con.confrelid = c2.oid
+            LEFT JOIN
+                pg_attribute a1 ON c1.oid = a1.attrelid AND a1.attnum = con.conkey[1]
+            LEFT JOIN
+                pg_attribute a2 ON c2.oid = a2.attrelid AND a2.attnum = con.confkey[1]
+            WHERE
+                con.contype = 'f' AND
+                c1.relnamespace = c2.relnamespace AND
+                pg_catalog.pg_table_is_visible(c1.oid)
+        """
+        )
+        relations = defaultdict(dict)
+        for table_name, column, other_table, other_column in cursor.fetchall():
+            relations[table_name][column] = (other_column, other_table)
+        return dict(relations)
+
+    def get_table_locality(self, cursor, table_name):
+        """
+        Return the locality of a table in a multi-region database (e.g.
+        'GLOBAL' or 'REGIONAL BY ROW'), or None if the database isn't
+        multi-region.
+        """
+        if self._is_cached_table(cursor, table_name):
+            return self._from_cache(cursor, 'localities', self._get_table_localities).get(table_name)
+        return self._get_table_localities(cursor, table_name).get(table_name)
+
+    def _get_table_localities(self, cursor, table_name=None):
+        """
+        Return {table_name: get_table_locality(table_name)} for `table_name`
+        or, if it's None, for every table.
+        """
+        cursor.execute(
+            """
+            SELECT table_name, locality
+            FROM [SHOW TABLES]
+            WHERE schema_name = current_schema() AND locality IS NOT NULL %s
+            """ % ('AND table_name = %s' if table_name else ''),
+            [table_name] if table_name else [],
+        )
+        return dict(cursor.fetchall())
+
+    def get_constraints(self, cursor, table_name):
+        if self._is_cached_table(cursor, table_name):
+            constraints = self._from_cache(cursor, 'constraints', self._get_constraints)
+            return copy.deepcopy(constraints.get(table_name, {}))
+        constraints = {table_name: super().get_constraints(cursor, table_name)}
+        self._add_cockroachdb_constraint_details(cursor, table_name, constraints)
+        return constraints[table_name]
+
+    def _get_constraints(self, cursor):
+        """Return {table_name: get_constraints(table_name)} for every table."""
+        # Run the queries of PostgresDatabaseIntrospection.get_constraints()
+        # once for every table (see BulkConstraintsCursor) and then build each
+        # table's constraints from its rows.
+        tables = list(self._from_cache(cursor, 'descriptions', self._get_table_descriptions))
+        bulk_cursor = BulkConstraintsCursor(cursor, tables)
+        constraints = {}
+        for table_name in tables:
+            bulk_cursor.table_name, bulk_cursor.query_index = table_name, 0
+            constraints[table_name] = super().get_constraints(bulk_cursor, table_name)
+        self._add_cockroachdb_constraint_details(cursor, None, constraints)
+        return constraints
+
+    def _add_cockroachdb_constraint_details(self, cursor, table_name, constraints):
+        """
+        Update {table_name: get_constraints(table_name)} for `table_name` or,
+        if it's None, for every table with details that PostgreSQL doesn't
+        have.
+        """
+        for table_constraints in constraints.values():
+            for constraint in table_constraints.values():
+                if constraint.get('type') == 'inverted':
+                    # django.contrib.postgres.indexes.GinIndex.suffix.
+                    constraint['type'] = 'gin'
+        self._add_stored_columns(cursor, table_name, constraints)
+        self._add_hash_sharding(cursor, table_name, constraints)
+
+    def _add_stored_columns(self, cursor, table_name, constraints):
+        """
+        Add the STORING columns of each index to its 'columns' (like the
+        INCLUDE columns of a PostgreSQL index) and list them in 'include'.
+        """
+        cursor.execute(
+            """
+            SELECT table_name, index_name, array_agg(column_name ORDER BY seq_in_index)
+            FROM information_schema.statistics
+            WHERE table_schema = current_schema()
+                AND storing = 'YES'
+                AND implicit = 'NO'
+                %s
+            GROUP BY table_name, index_name
+            """ % ('AND table_name = %s' if table_name else ''),
+            [table_name] if table_name else [],
+        )
+        for table_constraints in constraints.values():
+            for constraint in table_constraints.values():
+                constraint['include'] = []
+        for table, index, stored_columns in cursor.fetchall():
+            constraint = constraints[table].get(index)
+            # A primary index stores every column.
+            if constraint is None or constraint['primary_key']:
+                continue
+            constraint['columns'] += [column for column in stored_columns if column not in constraint['columns']]
+            constraint['include'] = stored_columns
+
+    def _add_hash_sharding(self, cursor, table_name, constraints):
+        cursor.execute(
+            """
+            SELECT ti.descriptor_name, ti.index_name, ti.shard_bucket_count
+            FROM crdb_internal.table_indexes ti
+            JOIN crdb_internal.tables t ON t.table_id = ti.descriptor_id
+            WHERE ti.is_sharded
+                AND t.database_name = current_database()
+                AND t.schema_name = current_schema()
+                %s
+            """ % ('AND ti.descriptor_name = %s' if table_name else ''),
+            [table_name] if table_name else [],
+        )
+        for table, index, bucket_count in cursor.fetchall():
+            if index not in constraints[table]:
+                continue
+            # Describe hash-sharded indexes as HashShardedIndex would create
+            # them: without the shard column.
+            constraint = constraints[table][index]
+            columns = constraint['columns']
+            shard_positions = [i for i, column in enumerate(columns) if SHARD_COLUMN_RE.match(column)]
+            constraint['columns'] = [column for i, column in enumerate(columns) if i not in shard_positions]
+            if 'orders' in constraint:
+                constraint['orders'] = [
+                    order for i, order in enumerate(constraint['orders']) if i not in shard_positions
+                ]
+            constraint['type'] = HashShardedIndex.suffix
+            constraint['options'] = ['bucket_count=%d' % bucket_count]
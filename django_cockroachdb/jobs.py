@@ -0,0 +1,51 @@
+from collections import namedtuple
+
+# The job types of schema changes run by the legacy and declarative schema
+# changers.
+SCHEMA_CHANGE_JOB_TYPES = ('SCHEMA CHANGE', 'NEW SCHEMA CHANGE')
+
+JobProgress = namedtuple('JobProgress', 'job_id description fraction_completed elapsed')
+
+
+def estimate_remaining(fraction_completed, elapsed):
+    """
+    Return the estimated number of seconds until a job that's
+    `fraction_completed` (0 to 1) done after `elapsed` seconds completes, or
+    None if it hasn't made any progress.
+    """
+    if not fraction_completed:
+        return None
+    return elapsed * (1 - fraction_completed) / fraction_completed
+
+
+def server_now(cursor):
+    """
+    Return the server's current time in UTC (to compare with a job's created,
+    a TIMESTAMP in UTC).
+    """
+    cursor.execute("SELECT now() AT TIME ZONE 'UTC'")
+    return cursor.fetchone()[0]
+
+
+def running_schema_changes(cursor, since):
+    """
+    Return a JobProgress for each running schema change job created since
+    `since` (a time from server_now()).
+    """
+    cursor.execute(
+        """
+        SELECT
+            job_id,
+            description,
+            COALESCE(fraction_completed, 0),
+            extract(epoch FROM (now() AT TIME ZONE 'UTC') - created)
+        FROM [SHOW JOBS]
+        WHERE job_type = ANY(%s) AND status = 'running' AND created >= %s
+        ORDER BY created
+        """,
+        [list(SCHEMA_CHANGE_JOB_TYPES), since],
+    )
+    return [
+        JobProgress(job_id, description, float(fraction), float(elapsed))
+        for job_id, description, fraction, elapsed in cursor.fetchall()
+    ]
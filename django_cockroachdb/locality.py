@@ -0,0 +1,104 @@
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import BaseConstraint
+
+__all__ = ['Global', 'RegionalByRow', 'RegionalByTable']
+
+# The locality of a table in a multi-region database that doesn't set one.
+DEFAULT_LOCALITY = 'REGIONAL BY TABLE IN PRIMARY REGION'
+
+
+class Locality(BaseConstraint):
+    """
+    The locality of a table in a multi-region database:
+    https://www.cockroachlabs.com/docs/stable/table-localities
+
+    Declared in Meta.constraints (a table has at most one) so that the
+    migration autodetector adds, changes, and removes it with AddConstraint
+    and RemoveConstraint. Removing it restores the default locality.
+    """
+
+    def __init__(self, *, name):
+        super().__init__(name=name)
+
+    def locality_sql(self, model, schema_editor):
+        raise NotImplementedError('Subclasses of Locality must provide a locality_sql() method.')
+
+    def constraint_sql(self, model, schema_editor):
+        # DatabaseSchemaEditor.table_sql() adds the LOCALITY clause to CREATE
+        # TABLE.
+        return None
+
+    def create_sql(self, model, schema_editor):
+        return schema_editor._alter_table_locality_sql(model, self.locality_sql(model, schema_editor))
+
+    def remove_sql(self, model, schema_editor):
+        return schema_editor._alter_table_locality_sql(model, DEFAULT_LOCALITY)
+
+    def validate(self, model, instance, exclude=None, using=DEFAULT_DB_ALIAS):
+        pass
+
+    def __eq__(self, other):
+        if isinstance(other, self.__class__):
+            return self.deconstruct() == other.deconstruct()
+        return super().__eq__(other)
+
+    def __repr__(self):
+        _, _, kwargs = self.deconstruct()
+        return '<%s: %s>' % (self.__class__.__qualname__, ' '.join('%s=%r' % item for item in kwargs.items()))
+
+
+class Global(Locality):
+    """
+    Replicate the table to every region for fast reads from any region at
+    the cost of slower writes.
+    """
+
+    def locality_sql(self, model, schema_editor):
+        return 'GLOBAL'
+
+
+class RegionalByTable(Locality):
+    """
+    Place the table's leaseholders in `region` (the database's primary region
+    by default) for fast reads and writes from that region.
+    """
+
+    def __init__(self, *, name, region=None):
+        super().__init__(name=name)
+        self.region = region
+
+    def locality_sql(self, model, schema_editor):
+        if self.region is None:
+            return DEFAULT_LOCALITY
+        return 'REGIONAL BY TABLE IN %s' % schema_editor.quote_name(self.region)
+
+    def deconstruct(self):
+        path, args, kwargs = super().deconstruct()
+        if self.region is not None:
+            kwargs['region'] = self.region
+        return path, args, kwargs
+
+
+class RegionalByRow(Locality):
+    """
+    Place each row's leaseholder in the region stored in its region column
+    for fast reads and writes of a row from its region. The column is the
+    `field` (a django_cockroachdb.fields.RegionField) or, by default, a hidden
+    crdb_region column that CockroachDB adds.
+    """
+
+    def __init__(self, *, name, field=None):
+        super().__init__(name=name)
+        self.field = field
+
+    def locality_sql(self, model, schema_editor):
+        if self.field is None:
+            return 'REGIONAL BY ROW'
+        column = model._meta.get_field(self.field).column
+        return 'REGIONAL BY ROW AS %s' % schema_editor.quote_name(column)
+
+    def deconstruct(self):
+        path, args, kwargs = super().deconstruct()
+        if self.field is not None:
+            kwargs['field'] = self.field
+        return path, args, kwargs
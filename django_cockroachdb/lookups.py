@@ -2,7 +2,31 @@ from django.db.models.fields.json import HasKeyLookup, KeyTransform
 from django.db.models.lookups import PostgresOperatorLookup
 
 
+def is_int(key):
+    try:
+        int(key)
+    except ValueError:
+        return False
+    return True
+
+
+def key_transform(self, compiler, connection):
+    # Chain -> operators for nested keys rather than using #> (as PostgreSQL
+    # does) since CockroachDB can use an inverted index to filter on ->
+    # expressions but not on #>. A numeric key of a nested path may be an
+    # array index or an object key, which only #> matches both of.
+    lhs, params, key_transforms = self.preprocess_lhs(compiler, connection)
+    if len(key_transforms) == 1 or any(is_int(key) for key in key_transforms):
+        return self.as_postgresql(compiler, connection)
+    params = list(params)
+    for index, key in enumerate(key_transforms):
+        operator = self.postgres_operator if index == len(key_transforms) - 1 else KeyTransform.postgres_operator
+        lhs = '(%s %s %%s)' % (lhs, operator)
+        params.append(key)
+    return lhs, tuple(params)
+
+
 def patch_lookups():
     HasKeyLookup.as_cockroachdb = HasKeyLookup.as_postgresql
-    KeyTransform.as_cockroachdb = KeyTransform.as_postgresql
+    KeyTransform.as_cockroachdb = key_transform
     PostgresOperatorLookup.as_cockroachdb = PostgresOperatorLookup.as_postgresql
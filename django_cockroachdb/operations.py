@@ -1,14 +1,59 @@
+import re
 import time
+from graphlib import CycleError, TopologicalSorter
+from itertools import chain, islice
 from zoneinfo import ZoneInfo
 
+from django.core.exceptions import ImproperlyConfigured
 from django.db.backends.postgresql.operations import (
     DatabaseOperations as PostgresDatabaseOperations,
 )
-from django.db.backends.postgresql.psycopg_any import errors, is_psycopg3
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+from django.db.models import CompositePrimaryKey, Model
 from django.db.utils import OperationalError
 
+from .transaction import is_serialization_failure, retry_delays
+
+# The AS OF SYSTEM TIME value that reads from the nearest replica:
+# https://www.cockroachlabs.com/docs/stable/follower-reads
+FOLLOWER_READ_TIMESTAMP = 'follower_read_timestamp()'
+# The QuerySet.as_of_system_time() value that reads as of the database's
+# OPTIONS['as_of_system_time'].
+_DATABASE_DEFAULT = object()
+
+# An InsertQuery.on_conflict value (set by SQLInsertCompiler) for inserts that
+# can use UPSERT rather than INSERT ... ON CONFLICT DO UPDATE.
+UPSERT = 'upsert'
+
+# The defaults for DATABASES['OPTIONS']['flush'].
+DEFAULT_FLUSH_OPTIONS = {
+    # 'auto' (DELETE from tables with at most delete_max_rows rows and
+    # TRUNCATE the others), 'delete', or 'truncate'.
+    'strategy': 'auto',
+    'delete_max_rows': 1000,
+    # Whether to skip tables that haven't been inserted into since they were
+    # last flushed.
+    'skip_unwritten_tables': True,
+}
+
+# The tables known to be empty because they were flushed and haven't been
+# inserted into (through the ORM) since, keyed by database alias.
+CLEAN_TABLES = {}
+
+# The statements of sql_flush() and the quoted tables they empty.
+FLUSH_STATEMENT_RE = re.compile(r'^(?:TRUNCATE|DELETE FROM) (.+?)(?: CASCADE)?;$')
+QUOTED_NAME_RE = re.compile(r'"([^"]*)"')
+
+
+def mark_table_written(alias, table):
+    """Record that rows were inserted into `table` of the `alias` database."""
+    clean_tables = CLEAN_TABLES.get(alias)
+    if clean_tables is not None:
+        clean_tables.discard(table)
+
 
 class DatabaseOperations(PostgresDatabaseOperations):
+    compiler_module = 'django_cockroachdb.compiler'
     integer_field_ranges = {
         'SmallIntegerField': (-32768, 32767),
         'IntegerField': (-9223372036854775808, 9223372036854775807),
@@ -33,7 +78,50 @@ class DatabaseOperations(PostgresDatabaseOperations):
             "PositiveBigIntegerField": numeric.Int8,
         }
 
-    explain_options = frozenset(['DISTSQL', 'OPT', 'TYPES', 'VEC', 'VERBOSE'])
+    explain_options = frozenset(['DEBUG', 'DISTSQL', 'OPT', 'TYPES', 'VEC', 'VERBOSE'])
+
+    # The default for OPTIONS['bulk_batch_max_bytes'], the approximate maximum
+    # size of the values in a bulk INSERT, UPDATE, or DELETE statement. Larger
+    # statements risk exceeding CockroachDB's transaction and Raft command
+    # (kv.raft.command.max_size) size limits.
+    bulk_batch_max_bytes = 4 * 1024 * 1024
+    # The maximum number of placeholders in a statement (with server-side
+    # binding), limited by the pgwire protocol.
+    max_bind_params = 65535
+
+    def bulk_batch_size(self, fields, objs):
+        fields = list(chain.from_iterable(
+            field.fields if isinstance(field, CompositePrimaryKey) else [field]
+            for field in fields
+        ))
+        if not fields or not objs:
+            return len(objs)
+        max_bytes = self.connection.settings_dict['OPTIONS'].get('bulk_batch_max_bytes', self.bulk_batch_max_bytes)
+        batch_size = max_bytes // self._estimate_row_size(fields, objs)
+        if self.connection.features.uses_server_side_binding:
+            batch_size = min(batch_size, self.max_bind_params // len(fields))
+        return max(batch_size, 1)
+
+    def _estimate_row_size(self, fields, objs, sample_size=100):
+        """
+        Estimate the number of bytes that the values of `fields` take in a
+        statement's SQL, based on the first `sample_size` objs.
+        """
+        sample = list(islice(objs, sample_size))
+        size = 0
+        for obj in sample:
+            for field in fields:
+                if not isinstance(obj, Model):
+                    value = obj
+                elif isinstance(obj, field.model):
+                    value = getattr(obj, field.attname, None)
+                else:
+                    # A related object, e.g. when deleting rows that refer to
+                    # obj.
+                    value = obj.pk
+                # Allow a few bytes for quotes, casts, and separators.
+                size += len(str(value)) + 4
+        return max(size // len(sample), 1)
 
     def deferrable_sql(self):
         # Deferrable constraints aren't supported:
@@ -58,39 +146,210 @@ class DatabaseOperations(PostgresDatabaseOperations):
     def sequence_reset_sql(self, style, model_list):
         return []
 
+    def as_of_system_time_sql(self, value):
+        """
+        Return the AS OF SYSTEM TIME clause for `value`: a timestamp, an
+        interval like '-10s', or FOLLOWER_READ_TIMESTAMP. Timestamps and
+        intervals are inlined as literals because the clause must be a constant
+        expression.
+        """
+        if value != FOLLOWER_READ_TIMESTAMP:
+            value = self.compose_sql('%s', [value])
+        return 'AS OF SYSTEM TIME %s' % value
+
+    def resolve_as_of_system_time(self, value):
+        """
+        Return `value`, or the database's OPTIONS['as_of_system_time'] if
+        `value` is _DATABASE_DEFAULT.
+        """
+        if value is _DATABASE_DEFAULT:
+            if (value := self.connection.settings_dict['OPTIONS'].get('as_of_system_time')) is None:
+                raise ImproperlyConfigured(
+                    "QuerySet.as_of_system_time() requires a value unless the "
+                    "%r database sets OPTIONS['as_of_system_time']." % self.connection.alias
+                )
+        return value
+
+    def set_transaction_as_of_system_time_sql(self, value):
+        return 'SET TRANSACTION %s' % self.as_of_system_time_sql(value)
+
+    def insert_statement(self, on_conflict=None):
+        if on_conflict == UPSERT:
+            return 'UPSERT INTO'
+        return super().insert_statement(on_conflict)
+
+    def on_conflict_suffix_sql(self, fields, on_conflict, update_fields, unique_fields):
+        if on_conflict == UPSERT:
+            return ''
+        return super().on_conflict_suffix_sql(fields, on_conflict, update_fields, unique_fields)
+
     def explain_query_prefix(self, format=None, **options):
         extra = []
+        analyze = False
         # Normalize options.
         if options:
             options = {
                 name.upper(): value
                 for name, value in options.items()
             }
-            for valid_option in self.explain_options:
+            # EXPLAIN ANALYZE executes the query. Its options, e.g. DEBUG,
+            # follow ANALYZE.
+            analyze = options.pop('ANALYZE', False)
+            for valid_option in sorted(self.explain_options):
                 value = options.pop(valid_option, None)
                 if value:
                     extra.append(valid_option)
+        if 'DEBUG' in extra and not analyze:
+            raise ValueError('The DEBUG option of EXPLAIN requires ANALYZE.')
         prefix = super().explain_query_prefix(format, **options)
+        if analyze:
+            prefix += ' ANALYZE'
         if extra:
             prefix += ' (%s)' % ', '.join(extra)
         return prefix
 
     def execute_sql_flush(self, sql_list):
         # Retry TRUNCATE if it fails with a serialization error.
-        num_retries = 10
-        initial_retry_delay = 0.5  # The initial retry delay, in seconds.
-        backoff_ = 1.5  # For each retry, the last delay is multiplied by this.
-        next_retry_delay = initial_retry_delay
-        for retry in range(1, num_retries + 1):
+        delays = retry_delays(
+            max_attempts=10,
+            initial_delay=0.5,  # The initial retry delay, in seconds.
+            multiplier=1.5,  # For each retry, the last delay is multiplied by this.
+            max_delay=float('inf'),
+            jitter=False,
+        )
+        for delay in delays:
             try:
-                return super().execute_sql_flush(sql_list)
+                super().execute_sql_flush(sql_list)
+                break
             except OperationalError as exc:
-                if (not isinstance(exc.__cause__, errors.SerializationFailure) or
-                        retry >= num_retries):
+                if not is_serialization_failure(exc):
                     raise
-                time.sleep(next_retry_delay)
-                next_retry_delay *= backoff_
+            time.sleep(delay)
+        else:
+            super().execute_sql_flush(sql_list)
+        if self.flush_options() is not None:
+            # Record the tables emptied by sql_list as clean. The tables that
+            # sql_flush() skipped are already clean.
+            CLEAN_TABLES.setdefault(self.connection.alias, set()).update(self._flushed_tables(sql_list))
+
+    def _flushed_tables(self, sql_list):
+        """Return the tables emptied by the statements of sql_flush()."""
+        tables = []
+        for sql in sql_list:
+            if match := FLUSH_STATEMENT_RE.match(sql):
+                tables += QUOTED_NAME_RE.findall(match[1])
+        return tables
+
+    def flush_options(self):
+        """
+        Return the OPTIONS['flush'] settings merged with DEFAULT_FLUSH_OPTIONS,
+        or None if the option isn't set.
+        """
+        options = self.connection.settings_dict['OPTIONS'].get('flush')
+        if not options:
+            return None
+        if options is True:
+            options = {}
+        return {**DEFAULT_FLUSH_OPTIONS, **options}
 
     def sql_flush(self, style, tables, *, reset_sequences=False, allow_cascade=False):
-        # CockroachDB doesn't support resetting sequences.
-        return super().sql_flush(style, tables, reset_sequences=False, allow_cascade=allow_cascade)
+        options = self.flush_options()
+        if options is None:
+            # CockroachDB doesn't support resetting sequences.
+            return super().sql_flush(style, tables, reset_sequences=False, allow_cascade=allow_cascade)
+        all_tables = tables = list(tables)
+        if options['skip_unwritten_tables']:
+            clean_tables = CLEAN_TABLES.get(self.connection.alias, set())
+            tables = [table for table in tables if table not in clean_tables]
+        if not tables:
+            return []
+        truncate, delete = self._plan_flush(tables, all_tables, options)
+        sql = super().sql_flush(style, truncate, reset_sequences=False, allow_cascade=allow_cascade)
+        # TRUNCATE runs first so that the rows of truncated tables don't block
+        # deleting the rows they refer to.
+        return sql + [
+            '%s %s;' % (style.SQL_KEYWORD('DELETE FROM'), style.SQL_FIELD(self.quote_name(table)))
+            for table in delete
+        ]
+
+    def _plan_flush(self, tables, all_tables, options):
+        """
+        Divide `tables` into a list of tables to TRUNCATE (a schema change,
+        which is slow regardless of the table's size) and a list of tables to
+        DELETE from, ordered so that each table is deleted from before the
+        tables it refers to. `all_tables` are the tables being flushed
+        (including the skipped, empty ones).
+        """
+        references = self._foreign_key_references()
+        # The tables that refer to each table.
+        referenced_by = {}
+        for table, referenced_tables in references.items():
+            for referenced_table in referenced_tables:
+                if referenced_table != table:
+                    referenced_by.setdefault(referenced_table, set()).add(table)
+        truncate = set()
+        if options['strategy'] == 'truncate':
+            truncate.update(tables)
+        elif options['strategy'] == 'auto':
+            max_rows = options['delete_max_rows']
+            truncate.update(
+                table for table, count in self._count_rows(tables, max_rows).items() if count > max_rows
+            )
+        flushed_tables = set(all_tables)
+        while True:
+            # A table can only be truncated along with the tables that refer
+            # to it.
+            pending = list(truncate)
+            while pending:
+                for table in referenced_by.get(pending.pop(), ()):
+                    if table in flushed_tables and table not in truncate:
+                        truncate.add(table)
+                        pending.append(table)
+            delete = [table for table in tables if table not in truncate]
+            sorter = TopologicalSorter({
+                table: {
+                    referenced_table for referenced_table in references.get(table, ())
+                    if referenced_table != table and referenced_table in delete
+                }
+                for table in delete
+            })
+            try:
+                # Tables are deleted from before the tables they refer to.
+                delete = list(sorter.static_order())[::-1]
+            except CycleError as exc:
+                # Rows of tables that refer to each other can't be deleted one
+                # table at a time.
+                truncate.update(exc.args[1])
+            else:
+                # Include the skipped tables that must be truncated along with
+                # the tables they refer to.
+                return [table for table in all_tables if table in truncate], delete
+
+    def _foreign_key_references(self):
+        """Return the tables that each table's foreign keys refer to."""
+        with self.connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT c1.relname, c2.relname
+                FROM pg_constraint con
+                JOIN pg_class c1 ON con.conrelid = c1.oid
+                JOIN pg_class c2 ON con.confrelid = c2.oid
+                WHERE con.contype = 'f' AND pg_catalog.pg_table_is_visible(c1.oid)
+            """)
+            references = {}
+            for table, referenced_table in cursor.fetchall():
+                references.setdefault(table, set()).add(referenced_table)
+            return references
+
+    def _count_rows(self, tables, max_rows):
+        """
+        Return the number of rows in each of `tables`, counting at most
+        `max_rows` + 1 rows of each.
+        """
+        with self.connection.cursor() as cursor:
+            cursor.execute(' UNION ALL '.join(
+                'SELECT %d, count(*) FROM (SELECT 1 FROM %s LIMIT %d) AS t' % (
+                    index, self.quote_name(table), max_rows + 1,
+                )
+                for index, table in enumerate(tables)
+            ))
+            return {tables[index]: count for index, count in cursor.fetchall()}
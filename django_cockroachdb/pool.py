@@ -0,0 +1,131 @@
+import itertools
+import threading
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    from psycopg_pool import ConnectionPool, PoolTimeout
+except ImportError as err:
+    raise ImproperlyConfigured(
+        "Error loading psycopg_pool module.\nDid you install psycopg[pool]?"
+    ) from err
+
+from psycopg import OperationalError
+
+LOAD_BALANCING_STRATEGIES = ('round_robin', 'least_connections')
+
+
+def parse_node(node, default_port):
+    """
+    Split a 'host', 'host:port', '[ipv6]', or '[ipv6]:port' string into
+    (host, port). An IPv6 address without brackets is a host without a port.
+    """
+    if node.startswith('['):
+        host, sep, port = node[1:].partition(']')
+        if not sep or (port and not (port.startswith(':') and port[1:].isdigit())):
+            raise ImproperlyConfigured('Invalid node %r.' % node)
+        return host, port[1:] or default_port
+    host, sep, port = node.partition(':')
+    if sep and port.isdigit():
+        return host, port
+    return node, default_port
+
+
+class NodePool:
+    """
+    A connection pool that spreads connections across several CockroachDB
+    nodes. It holds a psycopg_pool.ConnectionPool for each node and
+    implements the subset of its API that DatabaseWrapper uses.
+
+    A node that fails to provide a connection within `node_timeout` seconds
+    (e.g. because it's draining or down) is skipped for `unhealthy_node_timeout`
+    seconds before it's tried again.
+    """
+
+    def __init__(
+        self, nodes, kwargs, load_balancing='round_robin', node_timeout=5,
+        unhealthy_node_timeout=30, **pool_options,
+    ):
+        if not nodes:
+            raise ImproperlyConfigured("OPTIONS['nodes'] must list at least one node.")
+        if load_balancing not in LOAD_BALANCING_STRATEGIES:
+            raise ImproperlyConfigured(
+                'Invalid load_balancing %r. Use one of %s.' % (
+                    load_balancing, ', '.join(LOAD_BALANCING_STRATEGIES),
+                )
+            )
+        self.load_balancing = load_balancing
+        self.node_timeout = node_timeout
+        self.unhealthy_node_timeout = unhealthy_node_timeout
+        self.pools = []
+        for node in nodes:
+            host, port = parse_node(node, kwargs.get('port'))
+            self.pools.append(ConnectionPool(
+                kwargs={**kwargs, 'host': host, 'port': port},
+                name=node,
+                open=False,
+                **pool_options,
+            ))
+        # Map each unhealthy pool to the time.monotonic() when it may be tried
+        # again.
+        self._unhealthy_until = {}
+        self._round_robin = itertools.cycle(range(len(self.pools)))
+        self._lock = threading.Lock()
+
+    def open(self):
+        for pool in self.pools:
+            pool.open()
+
+    def close(self):
+        for pool in self.pools:
+            pool.close()
+
+    def check(self):
+        """Discard broken idle connections from each node's pool."""
+        for pool in self.pools:
+            pool.check()
+
+    def get_stats(self):
+        return {pool.name: pool.get_stats() for pool in self.pools}
+
+    def _ordered_pools(self):
+        """
+        Return the pools in the order that they should be tried: healthy pools
+        first, ordered according to the load balancing strategy, followed by
+        unhealthy pools in case every node was marked unhealthy.
+        """
+        with self._lock:
+            if self.load_balancing == 'round_robin':
+                start = next(self._round_robin)
+                pools = self.pools[start:] + self.pools[:start]
+            else:
+                pools = sorted(self.pools, key=self._connections_in_use)
+            now = time.monotonic()
+            healthy = [pool for pool in pools if self._unhealthy_until.get(pool, 0) <= now]
+        return healthy + [pool for pool in pools if pool not in healthy]
+
+    @staticmethod
+    def _connections_in_use(pool):
+        stats = pool.get_stats()
+        return stats['pool_size'] - stats['pool_available']
+
+    def getconn(self):
+        error = None
+        for pool in self._ordered_pools():
+            try:
+                # The connection's _pool attribute is set to the node's pool
+                # so that DatabaseWrapper returns it to the correct pool.
+                connection = pool.getconn(timeout=self.node_timeout)
+            except (OperationalError, PoolTimeout) as exc:
+                error = exc
+                with self._lock:
+                    self._unhealthy_until[pool] = time.monotonic() + self.unhealthy_node_timeout
+                continue
+            with self._lock:
+                self._unhealthy_until.pop(pool, None)
+            return connection
+        raise error
+
+    def putconn(self, connection):
+        connection._pool.putconn(connection)
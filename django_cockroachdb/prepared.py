@@ -0,0 +1,150 @@
+import re
+from weakref import WeakKeyDictionary
+
+from django.db.backends.postgresql.psycopg_any import errors, is_psycopg3
+
+if is_psycopg3:
+    from psycopg._preparing import Prepare
+    from psycopg.pq import TransactionStatus
+
+# The defaults for DATABASES['OPTIONS']['prepared_statements'].
+DEFAULT_PREPARED_STATEMENTS_OPTIONS = {
+    # The number of statements kept prepared on each connection. The least
+    # recently used statement is deallocated when another is prepared.
+    'max_size': 100,
+    # The number of times a statement is executed before it's prepared.
+    'threshold': 1,
+    # A callable that's passed a statement's SQL and returns whether it may
+    # be prepared (by default, SELECT, INSERT, UPDATE, DELETE, and UPSERT
+    # statements).
+    'prepare': None,
+}
+
+PREPARABLE_SQL_RE = re.compile(r'\s*(SELECT|INSERT|UPDATE|DELETE|UPSERT|WITH)\b', re.IGNORECASE)
+
+# The error of executing a prepared statement whose result columns were
+# changed by a schema change.
+RESULT_TYPE_CHANGED = 'cached plan must not change result type'
+
+
+def is_preparable(sql):
+    return PREPARABLE_SQL_RE.match(sql) is not None
+
+
+def get_prepared_statements_options(connection):
+    """
+    Return the OPTIONS['prepared_statements'] settings merged with
+    DEFAULT_PREPARED_STATEMENTS_OPTIONS, or None if the option isn't set.
+    """
+    options = connection.settings_dict['OPTIONS'].get('prepared_statements')
+    if not options:
+        return None
+    if options is True:
+        options = {}
+    return {**DEFAULT_PREPARED_STATEMENTS_OPTIONS, **options}
+
+
+class PreparedStatementCache:
+    """
+    Decide which statements may be prepared, and count how psycopg runs them.
+    psycopg prepares a statement on a connection once it has been executed
+    `threshold` times and deallocates the least recently used one beyond
+    `max_size` (the connection's prepare_threshold and prepared_max, set by
+    DatabaseWrapper).
+    """
+
+    def __init__(self, max_size=100, threshold=1, prepare=None):
+        self.max_size = max_size
+        self.threshold = threshold
+        self.prepare = prepare or is_preparable
+        # The connections whose prepared statements must be deallocated.
+        self._invalidated = WeakKeyDictionary()
+        # Executions of prepared statements.
+        self.hits = 0
+        # Executions of preparable statements that weren't prepared yet.
+        self.misses = 0
+        # Statements deallocated to keep max_size statements.
+        self.evictions = 0
+        # Prepared statements invalidated by a schema change.
+        self.invalidations = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
+    def execute(self, cursor, execute, query, params, **kwargs):
+        """
+        Run execute(query, params, prepare=..., **kwargs) where `execute` is
+        `cursor`'s psycopg execute().
+        """
+        if not isinstance(query, str) or not self.prepare(query):
+            return execute(query, params, prepare=False, **kwargs)
+        connection = cursor.connection
+        if connection in self._invalidated and connection.info.transaction_status != TransactionStatus.INERROR:
+            del self._invalidated[connection]
+            self._deallocate(connection)
+        try:
+            # psycopg decides whether to prepare the statement.
+            return execute(query, params, prepare=None, **kwargs)
+        except errors.FeatureNotSupported as exc:
+            if RESULT_TYPE_CHANGED not in str(exc):
+                raise
+            self.invalidations += 1
+            if connection.info.transaction_status == TransactionStatus.INERROR:
+                # Deallocate before the connection's next statement after
+                # the transaction is rolled back.
+                self._invalidated[connection] = True
+                raise
+        # Prepare the statement again (outside of a failed transaction).
+        self._deallocate(connection)
+        return execute(query, params, prepare=True, **kwargs)
+
+    def record(self, prepared, connection):
+        """
+        Count an execution of a preparable statement on `connection` given
+        psycopg's `prepared` decision (a psycopg._preparing.Prepare).
+        """
+        if prepared is Prepare.YES:
+            self.hits += 1
+            return
+        self.misses += 1
+        # Preparing a statement when max_size are prepared deallocates one.
+        if prepared is Prepare.SHOULD and len(connection._prepared._names) >= connection.prepared_max:
+            self.evictions += 1
+
+    def _deallocate(self, connection):
+        # psycopg forgets its prepared statements after DEALLOCATE ALL.
+        connection.execute('DEALLOCATE ALL', prepare=False)
+
+
+if is_psycopg3:
+    from django.db.backends.postgresql.base import ServerBindingCursor
+
+    class PreparingCursor(ServerBindingCursor):
+        """
+        A cursor with server-side binding whose statements are prepared
+        according to a PreparedStatementCache (set by
+        DatabaseWrapper.create_cursor()).
+        """
+        prepared_statements = None
+
+        def execute(self, query, params=None, *, prepare=None, **kwargs):
+            if prepare is None:
+                if self.prepared_statements is not None:
+                    return self.prepared_statements.execute(self, super().execute, query, params, **kwargs)
+                # Statements of cursors not created by Django (e.g. the
+                # connection setup statements) aren't prepared.
+                prepare = False
+            return super().execute(query, params, prepare=prepare, **kwargs)
+
+        def _get_prepared(self, pgq, prepare=None):
+            # psycopg calls this to look up whether a statement is prepared
+            # (or should be prepared) before executing it.
+            prepared, name = super()._get_prepared(pgq, prepare)
+            if self.prepared_statements is not None and prepare is not False:
+                self.prepared_statements.record(prepared, self.connection)
+            return prepared, name
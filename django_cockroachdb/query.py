@@ -0,0 +1,245 @@
+from itertools import batched, chain
+
+from django.db import NotSupportedError, connections, router
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+from django.db.models import Manager, Model
+from django.db.models.query import ModelIterable, QuerySet
+from django.db.transaction import TransactionManagementError
+
+from .explain import explain_analyze
+from .operations import (
+    _DATABASE_DEFAULT, FOLLOWER_READ_TIMESTAMP, mark_table_written,
+)
+from .transaction import run_transaction
+
+
+def iterate_by_pk(queryset, batch_size=1000, as_of_system_time=None):
+    """
+    Iterate over the model instances of `queryset` in primary key order,
+    fetching `batch_size` rows at a time with keyset pagination
+    (WHERE pk > <last pk> ORDER BY pk LIMIT <batch_size>).
+
+    Each batch is fetched in its own short transaction which is retried on
+    serialization failures, so walking a large table doesn't hold a long
+    transaction open. If `as_of_system_time` is given (e.g. '-10s'), each
+    batch reads historical data as of that time, avoiding contention with
+    concurrent writes.
+    """
+    if batch_size <= 0:
+        raise ValueError('Batch size must be strictly positive.')
+    if queryset.query.is_sliced:
+        raise TypeError('Cannot use iterate_by_pk() once a slice has been taken.')
+    if not issubclass(queryset._iterable_class, ModelIterable):
+        raise TypeError('iterate_by_pk() requires a QuerySet of model instances.')
+    if as_of_system_time is None:
+        as_of_system_time = getattr(queryset.query, 'as_of_system_time', None)
+    connection = connections[queryset.db]
+    as_of_system_time = connection.ops.resolve_as_of_system_time(as_of_system_time)
+    if as_of_system_time is not None and connection.in_atomic_block:
+        raise TransactionManagementError(
+            'iterate_by_pk() with as_of_system_time cannot be used inside a '
+            'transaction.'
+        )
+    queryset = queryset.order_by('pk')
+    # The batches run in explicit transactions, so the timestamp is set on
+    # the transaction rather than on each query.
+    queryset.query.as_of_system_time = None
+
+    def fetch_batch(batch_queryset):
+        if as_of_system_time is not None:
+            with connection.cursor() as cursor:
+                cursor.execute(connection.ops.set_transaction_as_of_system_time_sql(as_of_system_time))
+        return list(batch_queryset[:batch_size])
+
+    batch_queryset = queryset
+    while True:
+        batch = run_transaction(lambda: fetch_batch(batch_queryset), using=queryset.db)
+        yield from batch
+        if len(batch) < batch_size:
+            break
+        batch_queryset = queryset.filter(pk__gt=batch[-1].pk)
+
+
+def bulk_upsert(queryset, objs, batch_size=None):
+    """
+    Insert `objs` into the database or, for objects whose primary key already
+    exists, overwrite every column of the existing row. This compiles to
+    CockroachDB's UPSERT statement which, unlike INSERT ... ON CONFLICT DO
+    UPDATE, doesn't read the existing rows.
+    """
+    opts = queryset.model._meta
+    return queryset.bulk_create(
+        objs,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=[field.name for field in opts.pk_fields],
+        update_fields=[
+            field.name for field in opts.concrete_fields
+            if field not in opts.pk_fields and not field.generated
+        ],
+    )
+
+
+def _batches(queryset, objs, fields, batch_size):
+    if not objs:
+        return []
+    max_batch_size = connections[queryset.db].ops.bulk_batch_size(fields, objs)
+    batch_size = min(batch_size, max_batch_size) if batch_size else max_batch_size
+    return [objs[i:i + batch_size] for i in range(0, len(objs), batch_size)]
+
+
+def bulk_create_in_batches(queryset, objs, batch_size=None, **kwargs):
+    """
+    Like QuerySet.bulk_create() except that each batch is inserted in its
+    own transaction (retried on serialization failures) rather than all objs
+    in one large transaction. If a batch fails, the batches before it remain
+    committed.
+    """
+    objs = list(objs)
+    opts = queryset.model._meta
+    fields = [field for field in opts.concrete_fields if not field.generated]
+    created = []
+    for batch in _batches(queryset, objs, fields, batch_size):
+        created += run_transaction(
+            lambda: queryset.bulk_create(batch, **kwargs), using=queryset.db,
+        )
+    return created
+
+
+def bulk_update_in_batches(queryset, objs, fields, batch_size=None):
+    """
+    Like QuerySet.bulk_update() except that each batch is updated in its own
+    transaction (retried on serialization failures). Return the number of
+    rows matched.
+    """
+    objs = list(objs)
+    opts = queryset.model._meta
+    batch_fields = [opts.pk, opts.pk] + [opts.get_field(name) for name in fields]
+    return sum(
+        run_transaction(
+            lambda: queryset.bulk_update(batch, fields), using=queryset.db,
+        )
+        for batch in _batches(queryset, objs, batch_fields, batch_size)
+    )
+
+
+def copy_insert(model, rows, fields=None, batch_size=10000, using=None):
+    """
+    Insert `rows` (e.g. a generator) into `model`'s table with COPY ... FROM
+    STDIN, which avoids parsing and binding the parameters of INSERT
+    statements. Each row is a model instance or a sequence of the values of
+    `fields` (field names; by default the concrete fields other than
+    generated, auto, and db_default fields). Like bulk_create(), the auto
+    fields of instances that set them (e.g. an explicit primary key) are
+    inserted, in which case every instance must set them. Values are
+    converted with each field's get_db_prep_save().
+
+    Each batch of `batch_size` rows is copied in its own transaction (retried
+    on serialization failures) so that a large load doesn't exceed
+    CockroachDB's transaction size limits. If a batch fails, the batches
+    before it remain committed. Return the number of rows inserted.
+    """
+    if not is_psycopg3:
+        raise NotSupportedError('copy_insert() requires psycopg >= 3.')
+    if batch_size <= 0:
+        raise ValueError('Batch size must be strictly positive.')
+    using = using or router.db_for_write(model)
+    connection = connections[using]
+    opts = model._meta
+    auto_fields = []
+    if fields is None:
+        rows = iter(rows)
+        first_row = next(rows, None)
+        if first_row is None:
+            return 0
+        rows = chain([first_row], rows)
+        fields = [
+            field for field in opts.concrete_fields
+            if not field.generated and not field.has_db_default()
+        ]
+        auto_fields = [field for field in fields if field.db_returning]
+        if not (isinstance(first_row, Model) and _sets_fields(first_row, auto_fields)):
+            fields = [field for field in fields if field not in auto_fields]
+    else:
+        fields = [opts.get_field(name) for name in fields]
+    insert_auto_fields = bool(auto_fields) and auto_fields[0] in fields
+    quote_name = connection.ops.quote_name
+    sql = 'COPY %s (%s) FROM STDIN' % (
+        quote_name(opts.db_table), ', '.join(quote_name(field.column) for field in fields),
+    )
+
+    def prepare(row):
+        if isinstance(row, Model):
+            if auto_fields and _sets_fields(row, auto_fields) != insert_auto_fields:
+                raise ValueError(
+                    'copy_insert() requires either every instance or no instance '
+                    'to set %s.' % ', '.join(field.name for field in auto_fields)
+                )
+            row = [field.pre_save(row, add=True) for field in fields]
+        return [field.get_db_prep_save(value, connection) for field, value in zip(fields, row, strict=True)]
+
+    def copy_batch(batch):
+        mark_table_written(using, opts.db_table)
+        with connection.cursor() as cursor, cursor.copy(sql) as copy:
+            for row in batch:
+                copy.write_row(row)
+
+    count = 0
+    for batch in batched(rows, batch_size):
+        # Prepare the batch once so that it can be copied again if the
+        # transaction is retried.
+        batch = [prepare(row) for row in batch]
+        run_transaction(lambda: copy_batch(batch), using=using)
+        count += len(batch)
+    return count
+
+
+def _sets_fields(obj, fields):
+    return all(getattr(obj, field.attname) is not None for field in fields)
+
+
+class CockroachQuerySetMixin:
+    """QuerySet methods for CockroachDB-specific features."""
+
+    def as_of_system_time(self, value=_DATABASE_DEFAULT):
+        """
+        Return a new QuerySet that reads data as of `value`, a timestamp or an
+        interval like '-10s' (by default, the database's
+        OPTIONS['as_of_system_time']). None removes the clause.
+        """
+        clone = self._chain()
+        clone.query.as_of_system_time = value
+        return clone
+
+    def follower_read(self):
+        """
+        Return a new QuerySet that may be served by the nearest replica using
+        slightly stale data.
+        """
+        return self.as_of_system_time(FOLLOWER_READ_TIMESTAMP)
+
+    def iterate_by_pk(self, batch_size=1000, as_of_system_time=None):
+        return iterate_by_pk(self, batch_size, as_of_system_time)
+
+    def bulk_upsert(self, objs, batch_size=None):
+        return bulk_upsert(self, objs, batch_size)
+
+    def explain_analyze(self, debug=False, **options):
+        return explain_analyze(self, debug, **options)
+
+    def bulk_create_in_batches(self, objs, batch_size=None, **kwargs):
+        return bulk_create_in_batches(self, objs, batch_size, **kwargs)
+
+    def bulk_update_in_batches(self, objs, fields, batch_size=None):
+        return bulk_update_in_batches(self, objs, fields, batch_size)
+
+    def copy_insert(self, rows, fields=None, batch_size=10000):
+        self._for_write = True
+        return copy_insert(self.model, rows, fields, batch_size, using=self.db)
+
+
+class CockroachQuerySet(CockroachQuerySetMixin, QuerySet):
+    pass
+
+
+CockroachManager = Manager.from_queryset(CockroachQuerySet, 'CockroachManager')
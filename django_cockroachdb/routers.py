@@ -0,0 +1,78 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+__all__ = ['ReadYourWritesMiddleware', 'StalenessRouter', 'read_your_writes']
+
+# The time.monotonic() of the current scope's last write, if any.
+_last_write = ContextVar('last_write', default=None)
+
+
+@contextmanager
+def read_your_writes():
+    """
+    Start a new scope (e.g. a request or a task) for StalenessRouter's
+    pinning of reads to the primary database after a write.
+    """
+    token = _last_write.set(None)
+    try:
+        yield
+    finally:
+        _last_write.reset(token)
+
+
+class ReadYourWritesMiddleware:
+    """Scope StalenessRouter's pinning of reads after a write to each request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with read_your_writes():
+            return self.get_response(request)
+
+
+class StalenessRouter:
+    """
+    Send writes to the `primary` database and reads to the `stale` database,
+    which reads slightly stale data, e.g. because it sets
+    OPTIONS['default_transaction_use_follower_reads'].
+
+    Reads go to the primary database instead:
+    - for `pin_seconds` after a write in the same read_your_writes() scope
+      (e.g. a request with ReadYourWritesMiddleware), so that they see it;
+    - while the primary database is in a transaction.
+    """
+
+    def __init__(self, stale, primary=DEFAULT_DB_ALIAS, pin_seconds=5):
+        self.stale = stale
+        self.primary = primary
+        self.pin_seconds = pin_seconds
+
+    def is_pinned(self):
+        """Return True if reads go to the primary database after a write."""
+        last_write = _last_write.get()
+        return last_write is not None and time.monotonic() - last_write < self.pin_seconds
+
+    def db_for_read(self, model, **hints):
+        if self.is_pinned() or connections[self.primary].in_atomic_block:
+            return self.primary
+        return self.stale
+
+    def db_for_write(self, model, **hints):
+        _last_write.set(time.monotonic())
+        return self.primary
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same data.
+        databases = {self.primary, self.stale}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db == self.stale:
+            return False
+        return None
@@ -1,10 +1,82 @@
+import logging
+import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.db import connections, transaction
 from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+from django.db.backends.ddl_references import (
+    Columns, IndexColumns, Statement, Table,
+)
 from django.db.backends.postgresql.schema import (
     DatabaseSchemaEditor as PostgresDatabaseSchemaEditor,
 )
 from django.db.backends.utils import strip_quotes
 from django.db.models import ForeignKey
 
+from .jobs import estimate_remaining, running_schema_changes, server_now
+from .locality import Locality
+
+logger = logging.getLogger('django.db.backends.schema')
+
+# The defaults for DATABASES['OPTIONS']['batch_schema_changes'].
+DEFAULT_BATCH_OPTIONS = {
+    # The number of tables whose schema changes run at the same time.
+    'max_workers': 4,
+    # How often, in seconds, to log the progress of schema change jobs.
+    'poll_interval': 10,
+    # An optional callable that's passed a list of jobs.JobProgress every
+    # poll_interval.
+    'progress_callback': None,
+}
+# A table name or a quoted identifier (which may contain spaces).
+NAME_PATTERN = r'(?:"[^"]*"|[^\s"(])+'
+# Statements that add a column, constraint, or index to a table and that can
+# run together with others for the same table.
+ADD_SQL_RE = re.compile(
+    r'^(?:ALTER TABLE (?P<table>%(name)s) ADD (?:COLUMN|CONSTRAINT) '
+    r'|CREATE (?:UNIQUE |INVERTED )?INDEX %(name)s ON (?P<index_table>%(name)s) )' % {'name': NAME_PATTERN}
+)
+# Statements that change a column's default or nullability.
+ALTER_COLUMN_SQL_RE = re.compile(
+    r'^ALTER TABLE (?P<table>%(name)s) ALTER COLUMN %(name)s '
+    r'(?P<action>SET DEFAULT|DROP DEFAULT|SET NOT NULL|DROP NOT NULL)' % {'name': NAME_PATTERN}
+)
+ALTER_TABLE_SQL_RE = re.compile(r'^ALTER TABLE (?P<table>%s) (?P<clauses>.+)$' % NAME_PATTERN, re.DOTALL)
+
+
+def coalesce_alter_table(statements):
+    """
+    Combine consecutive ALTER TABLE statements for the same table in a list
+    of (sql, params) into one statement with multiple clauses so that
+    CockroachDB backfills the table once.
+    """
+    coalesced = []
+    previous_table = None
+    for sql, params in statements:
+        match = ALTER_TABLE_SQL_RE.match(sql)
+        table = match['table'] if match else None
+        if table is not None and table == previous_table:
+            previous_sql, previous_params = coalesced[-1]
+            clauses = match['clauses']
+            if previous_params is not None or params is not None:
+                # Escape % in SQL that wasn't going to be interpolated.
+                if previous_params is None:
+                    previous_sql = previous_sql.replace('%', '%%')
+                if params is None:
+                    clauses = clauses.replace('%', '%%')
+                params = [*(previous_params or ()), *(params or ())]
+            coalesced[-1] = ('%s, %s' % (previous_sql, clauses), params)
+        else:
+            coalesced.append((sql, params))
+        previous_table = table
+    return coalesced
+
+
+# The statements buffered for a table. post_statements (e.g. dropping the
+# default used to populate a new column) run after statements.
+SchemaChangeBatch = namedtuple('SchemaChangeBatch', 'statements post_statements')
+
 
 class DatabaseSchemaEditor(PostgresDatabaseSchemaEditor):
     # The PostgreSQL backend uses "SET CONSTRAINTS ... IMMEDIATE" before
@@ -24,6 +96,26 @@ class DatabaseSchemaEditor(PostgresDatabaseSchemaEditor):
     # statement. This isn't supported by CockroachDB.
     sql_update_with_default = "UPDATE %(table)s SET %(column)s = %(default)s WHERE %(column)s IS NULL"
 
+    # USING HASH follows the columns (unlike USING in sql_create_index).
+    sql_create_hash_sharded_index = (
+        "CREATE INDEX %(name)s ON %(table)s (%(columns)s) USING HASH%(include)s%(extra)s%(condition)s"
+    )
+    # GinIndex creates an inverted index. Its columns before the last one
+    # (the inverted column) are indexed as usual.
+    sql_create_inverted_index = (
+        "CREATE INVERTED INDEX %(name)s ON %(table)s (%(columns)s)%(include)s%(extra)s%(condition)s"
+    )
+    # The PostgreSQL opclasses that cockroachdb supports (for trigram inverted
+    # indexes). Others are omitted.
+    supported_opclasses = {'gin_trgm_ops'}
+
+    # A table always has a primary key which can be altered but not dropped.
+    sql_alter_primary_key = "ALTER TABLE %(table)s ALTER PRIMARY KEY USING COLUMNS (%(columns)s)%(extra)s"
+    sql_alter_table_locality = "ALTER TABLE %(table)s SET LOCALITY %(locality)s"
+
+    # The OPTIONS['batch_schema_changes'] options, set in __enter__().
+    batch_options = None
+
     def __enter__(self):
         super().__enter__()
         # As long as DatabaseFeatures.can_rollback_ddl = False, compose() may
@@ -31,8 +123,149 @@ class DatabaseSchemaEditor(PostgresDatabaseSchemaEditor):
         # https://github.com/django/django/pull/15687#discussion_r1038175823.
         # See also https://github.com/django/django/pull/15687#discussion_r1041503991.
         self.connection.ensure_connection()
+        # Map each table to a SchemaChangeBatch of statements that haven't run
+        # yet (with OPTIONS['batch_schema_changes']).
+        self.pending_schema_changes = {}
+        self.batch_options = self._get_batch_options()
+        if self.batch_options:
+            # Run pending schema changes before any other query (e.g.
+            # introspection or RunPython) which may depend on them.
+            self.connection.execute_wrappers.append(self._flush_before_query)
         return self
 
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            super().__exit__(exc_type, exc_value, traceback)
+            if exc_type is None:
+                self.flush_schema_changes()
+            elif self.pending_schema_changes:
+                # Run the schema changes before the error, which would have
+                # run without batching, but don't hide the error.
+                try:
+                    self.flush_schema_changes()
+                except Exception:
+                    logger.exception('Failed to run the pending schema changes after an error.')
+        finally:
+            if self.batch_options:
+                self.connection.execute_wrappers.remove(self._flush_before_query)
+
+    def _get_batch_options(self):
+        options = self.connection.settings_dict['OPTIONS'].get('batch_schema_changes')
+        if not options or self.collect_sql:
+            return None
+        if options is True:
+            options = {}
+        return {**DEFAULT_BATCH_OPTIONS, **options}
+
+    def execute(self, sql, params=()):
+        if not self.collect_sql:
+            # The schema is about to change.
+            self.connection.introspection.clear_cache()
+        if self.batch_options and not self.connection.in_atomic_block:
+            # Merge the parameters client-side, as the PostgreSQL backend
+            # does, since the statement may not run until later and then not
+            # through this method.
+            if params is not None:
+                sql, params = self.connection.ops.compose_sql(str(sql), params), None
+            sql = str(sql)
+            if self._add_pending_schema_change(sql):
+                return
+            self.flush_schema_changes()
+        super().execute(sql, params)
+
+    def _add_pending_schema_change(self, sql):
+        """
+        Add `sql` (with its parameters merged) to its table's pending schema
+        changes, if it can run with them, and return whether it was added.
+        """
+        if ' REFERENCES ' in sql:
+            # A foreign key may depend on pending changes to another table.
+            return False
+        if match := ADD_SQL_RE.match(sql):
+            table = match['table'] or match['index_table']
+            batch = self.pending_schema_changes.setdefault(table, SchemaChangeBatch([], []))
+            batch.statements.append((sql, None))
+            return True
+        # A type change can't be combined with other changes.
+        if not (match := ALTER_COLUMN_SQL_RE.match(sql)) or ' TYPE ' in sql:
+            return False
+        batch = self.pending_schema_changes.setdefault(match['table'], SchemaChangeBatch([], []))
+        if match['action'] == 'DROP DEFAULT' and batch.statements:
+            # Drop defaults (e.g. those used to populate new columns) after
+            # the pending changes.
+            batch.post_statements.append((sql, None))
+        elif batch.post_statements:
+            # Don't reorder this change and a dropped default.
+            return False
+        else:
+            batch.statements.append((sql, None))
+        return True
+
+    def _flush_before_query(self, execute, sql, params, many, context):
+        self.flush_schema_changes()
+        return execute(sql, params, many, context)
+
+    def flush_schema_changes(self):
+        """
+        Run the pending schema changes. Each table's ALTER TABLE statements are
+        combined into one, and its statements run in one transaction so that
+        CockroachDB plans them as one schema change job (with one backfill).
+        Up to max_workers tables are changed at a time. The progress of the
+        jobs is logged every poll_interval seconds.
+        """
+        if not self.pending_schema_changes:
+            return
+        batches, self.pending_schema_changes = self.pending_schema_changes, {}
+        with self.connection.cursor() as cursor:
+            since = server_now(cursor)
+        with ThreadPoolExecutor(max_workers=self.batch_options['max_workers']) as executor:
+            futures = [executor.submit(self._run_schema_change_batch, batch) for batch in batches.values()]
+            while wait(futures, timeout=self.batch_options['poll_interval']).not_done:
+                self._report_schema_change_progress(since)
+        for future in futures:
+            # Raise any error.
+            future.result()
+
+    def _run_schema_change_batch(self, batch):
+        # Runs in a worker thread which has its own connection.
+        alias = self.connection.alias
+        connection = connections[alias]
+        # The pending changes only add to the table, so CREATE INDEX
+        # statements can follow the ALTER TABLE statements, which are then
+        # combined into one.
+        statements = coalesce_alter_table(
+            sorted(batch.statements, key=lambda statement: not statement[0].startswith('ALTER TABLE'))
+        )
+        try:
+            if len(statements) > 1:
+                with transaction.atomic(using=alias), connection.cursor() as cursor:
+                    for sql, params in statements:
+                        cursor.execute(sql, params)
+            else:
+                with connection.cursor() as cursor:
+                    for sql, params in statements:
+                        cursor.execute(sql, params)
+            with connection.cursor() as cursor:
+                for sql, params in coalesce_alter_table(batch.post_statements):
+                    cursor.execute(sql, params)
+        finally:
+            connection.close()
+
+    def _report_schema_change_progress(self, since):
+        with self.connection.cursor() as cursor:
+            jobs = running_schema_changes(cursor, since)
+        for job in jobs:
+            remaining = estimate_remaining(job.fraction_completed, job.elapsed)
+            logger.info(
+                'Schema change job %s is %.0f%% complete (%s remaining): %s',
+                job.job_id,
+                job.fraction_completed * 100,
+                'unknown time' if remaining is None else '%ds' % remaining,
+                job.description,
+            )
+        if callback := self.batch_options['progress_callback']:
+            callback(jobs)
+
     def add_index(self, model, index, concurrently=False):
         if index.contains_expressions and not self.connection.features.supports_expression_indexes:
             return None
@@ -43,8 +276,59 @@ class DatabaseSchemaEditor(PostgresDatabaseSchemaEditor):
             return None
         super().remove_index(model, index, concurrently)
 
+    def rename_index(self, model, old_index, new_index):
+        # The name of a HashShardedIndex(primary_key=True) isn't used in the
+        # database.
+        if getattr(old_index, 'primary_key', False):
+            return None
+        super().rename_index(model, old_index, new_index)
+
+    def _alter_primary_key_sql(self, model, fields, extra=''):
+        table = model._meta.db_table
+        return Statement(
+            self.sql_alter_primary_key,
+            table=Table(table, self.quote_name),
+            columns=Columns(table, [field.column for field in fields], self.quote_name),
+            extra=extra,
+        )
+
+    def _alter_table_locality_sql(self, model, locality):
+        return Statement(
+            self.sql_alter_table_locality,
+            table=Table(model._meta.db_table, self.quote_name),
+            locality=locality,
+        )
+
+    def table_sql(self, model):
+        sql, params = super().table_sql(model)
+        # If there are params, BaseDatabaseSchemaEditor.table_sql() defers
+        # the constraints' create_sql(), which sets the locality.
+        if not params:
+            for constraint in model._meta.constraints:
+                if isinstance(constraint, Locality):
+                    sql += ' LOCALITY %s' % constraint.locality_sql(model, self)
+        return sql, params
+
+    def _index_include_sql(self, model, columns):
+        # Use STORING, which CockroachDB's SHOW CREATE also uses, rather than
+        # its INCLUDE alias.
+        if not columns or not self.connection.features.supports_covering_indexes:
+            return ''
+        return Statement(
+            ' STORING (%(columns)s)',
+            columns=Columns(model._meta.db_table, columns, self.quote_name),
+        )
+
+    def _create_index_sql(self, model, *, using='', sql=None, **kwargs):
+        if sql is None and using.strip().lower() == 'using gin':
+            sql = self.sql_create_inverted_index
+            using = ''
+        return super()._create_index_sql(model, using=using, sql=sql, **kwargs)
+
     def _index_columns(self, table, columns, col_suffixes, opclasses):
-        # cockroachdb doesn't support PostgreSQL opclasses.
+        opclasses = [opclass if opclass in self.supported_opclasses else '' for opclass in opclasses]
+        if any(opclasses):
+            return IndexColumns(table, columns, self.quote_name, col_suffixes=col_suffixes, opclasses=opclasses)
         return BaseDatabaseSchemaEditor._index_columns(self, table, columns, col_suffixes, opclasses)
 
     def _create_like_index_sql(self, model, field):
@@ -0,0 +1,160 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import quote
+
+from django.db.backends.postgresql.psycopg_any import mogrify
+
+__all__ = ['StatementTagsMiddleware', 'get_statement_tags', 'statement_tags']
+
+# The defaults for DATABASES['OPTIONS']['statement_tags'].
+DEFAULT_TAGGING_OPTIONS = {
+    # 'application_name' to include the tags in the session's
+    # application_name or 'comment' to append them to each statement as a
+    # sqlcommenter comment.
+    'mode': 'application_name',
+    # The tags that are reported. CockroachDB ignores comments in statement
+    # fingerprints but caches plans by SQL, so tags with many values (such as
+    # 'traceparent') make statements with a comment miss the plan cache.
+    'keys': ('view', 'route', 'task'),
+}
+
+_statement_tags = ContextVar('statement_tags', default=None)
+
+
+@contextmanager
+def statement_tags(**tags):
+    """
+    Tag the statements executed in this block (or, as a decorator, by the
+    decorated function) with `tags`, which are added to the enclosing block's
+    tags.
+    """
+    token = _statement_tags.set({**(_statement_tags.get() or {}), **tags})
+    try:
+        yield
+    finally:
+        _statement_tags.reset(token)
+
+
+def get_statement_tags():
+    """Return the current statement tags."""
+    return dict(_statement_tags.get() or {})
+
+
+class StatementTagsMiddleware:
+    """
+    Tag the statements of each request with its view name, URL route, and
+    W3C traceparent header (if any).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        tags = {}
+        if traceparent := request.headers.get('traceparent'):
+            tags['traceparent'] = traceparent
+        with statement_tags(**tags):
+            return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        # Update the tags set by __call__() (a new dict for each request)
+        # since the view isn't resolved until after it's called.
+        tags = _statement_tags.get()
+        if tags is not None and match is not None:
+            tags.update(view=match.view_name, route=match.route)
+
+
+def get_tagging_options(connection):
+    """
+    Return the OPTIONS['statement_tags'] settings merged with
+    DEFAULT_TAGGING_OPTIONS, or None if the option isn't set.
+    """
+    options = connection.settings_dict['OPTIONS'].get('statement_tags')
+    if not options:
+        return None
+    if options is True:
+        options = {}
+    return {**DEFAULT_TAGGING_OPTIONS, **options}
+
+
+class StatementTagger:
+    """
+    An execute wrapper (installed by DatabaseWrapper if
+    OPTIONS['statement_tags'] is set) that reports the current statement
+    tags to CockroachDB.
+    """
+
+    def __init__(self, connection, mode='application_name', keys=DEFAULT_TAGGING_OPTIONS['keys']):
+        if mode not in ('application_name', 'comment'):
+            raise ValueError("OPTIONS['statement_tags']['mode'] must be 'application_name' or 'comment'.")
+        self.connection = connection
+        self.mode = mode
+        self.keys = keys
+        # The application_name that connections are opened with.
+        self.application_name = connection.settings_dict['OPTIONS'].get('application_name') or ''
+        if connection.statement_recorder and connection.statement_recorder.application_name:
+            self.application_name = connection.statement_recorder.application_name
+        # The (connection, application_name) that was last set.
+        self._session = (None, None)
+        self._set_in_transaction = False
+
+    def __call__(self, execute, sql, params, many, context):
+        tags = _statement_tags.get() or {}
+        tags = {key: tags[key] for key in self.keys if tags.get(key)}
+        if self.mode == 'comment':
+            if tags and isinstance(sql, str):
+                sql = '%s %s' % (sql, self.comment_sql(tags, escape=params is not None))
+        else:
+            self.set_application_name(self.tagged_application_name(tags))
+        return execute(sql, params, many, context)
+
+    def comment_sql(self, tags, escape=False):
+        """
+        Return a sqlcommenter comment (https://google.github.io/sqlcommenter/)
+        of `tags`. If `escape`, % is doubled since the statement has parameters.
+        """
+        comment = '/*%s*/' % ','.join(
+            "%s='%s'" % (quote(key), quote(str(value)))
+            for key, value in sorted(tags.items())
+        )
+        return comment.replace('%', '%%') if escape else comment
+
+    def tagged_application_name(self, tags):
+        return ' '.join([
+            *([self.application_name] if self.application_name else []),
+            *('%s=%s' % item for item in tags.items()),
+        ])
+
+    def connection_opened(self):
+        """
+        Record the application_name of a connection that was just opened or
+        checked out of a pool.
+        """
+        connection = self.connection.connection
+        if self.connection.pool:
+            # A pooled connection keeps the application_name that it was
+            # tagged with when it was last checked out (perhaps by another
+            # thread), so it's set again before the first statement.
+            self._session = (connection, None)
+        else:
+            # A new connection has the configured application_name.
+            self._session = (connection, self.application_name)
+        self._set_in_transaction = False
+
+    def set_application_name(self, application_name):
+        connection = self.connection.connection
+        if self._session[0] is not connection:
+            # The connection's application_name is unknown.
+            self._session = (connection, None)
+        elif self._set_in_transaction and not self.connection.in_atomic_block:
+            # The application_name set in a transaction is reverted if the
+            # transaction was rolled back.
+            self._session = (connection, None)
+            self._set_in_transaction = False
+        if self._session[1] == application_name:
+            return
+        with self.connection.wrap_database_errors, connection.cursor() as cursor:
+            cursor.execute(mogrify('SET application_name = %s', [application_name], connection))
+        self._session = (connection, application_name)
+        self._set_in_transaction = self.connection.in_atomic_block
@@ -0,0 +1,110 @@
+import functools
+import random
+import time
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.backends.postgresql.psycopg_any import errors
+from django.db.utils import OperationalError
+
+# The defaults for DATABASES['OPTIONS']['transaction_retry'].
+DEFAULT_RETRY_OPTIONS = {
+    # The number of times a transaction is attempted before giving up.
+    'max_attempts': 10,
+    # The upper bound of the first retry delay, in seconds.
+    'initial_delay': 0.1,
+    # For each retry, the upper bound of the delay is multiplied by this.
+    'multiplier': 2,
+    # The upper bound of any retry delay, in seconds.
+    'max_delay': 5,
+}
+
+
+def is_serialization_failure(exc):
+    """
+    Return True if `exc` is a retryable "restart transaction" error
+    (SQLSTATE 40001).
+    """
+    return isinstance(exc, OperationalError) and isinstance(exc.__cause__, errors.SerializationFailure)
+
+
+def get_retry_options(connection, **overrides):
+    """
+    Return the retry options for `connection`, combining the defaults, the
+    'transaction_retry' dictionary in the database's OPTIONS, and `overrides`.
+    """
+    options = connection.settings_dict['OPTIONS'].get('transaction_retry') or {}
+    return {**DEFAULT_RETRY_OPTIONS, **options, **overrides}
+
+
+def retry_delays(max_attempts, initial_delay, multiplier, max_delay, jitter=True):
+    """
+    Yield the delay to wait before each of the `max_attempts - 1` retries.
+    With `jitter`, each delay is chosen uniformly between zero and the
+    exponentially growing upper bound ("full jitter") so that clients which
+    conflicted with each other don't retry in lockstep.
+    """
+    delay = initial_delay
+    for _ in range(max_attempts - 1):
+        yield random.uniform(0, delay) if jitter else delay
+        delay = min(delay * multiplier, max_delay)
+
+
+def run_transaction(func, using=None, savepoint=True, durable=False, **options):
+    """
+    Call `func()` inside transaction.atomic() and return its result, rerunning
+    the whole transaction (with exponential backoff) if CockroachDB aborts it
+    with a serialization failure.
+
+    Retries are only possible in the outermost atomic block since an aborted
+    transaction can't be partially replayed. If a transaction is already
+    active, `func()` runs once in a nested atomic block and any serialization
+    failure propagates to the outer transaction.
+    """
+    using = using or DEFAULT_DB_ALIAS
+    connection = connections[using]
+    if connection.in_atomic_block:
+        with transaction.atomic(using=using, savepoint=savepoint, durable=durable):
+            return func()
+    try:
+        for delay in retry_delays(**get_retry_options(connection, **options)):
+            try:
+                with transaction.atomic(using=using, savepoint=savepoint, durable=durable):
+                    return func()
+            except OperationalError as exc:
+                if not is_serialization_failure(exc):
+                    raise
+            time.sleep(delay)
+            # Reported by OPTIONS['instrumentation'].
+            connection.transaction_retries += 1
+        # The final attempt; let any error propagate.
+        with transaction.atomic(using=using, savepoint=savepoint, durable=durable):
+            return func()
+    finally:
+        connection.transaction_retries = 0
+
+
+def retry_atomic(using=None, savepoint=True, durable=False, **options):
+    """
+    Decorator version of run_transaction(). It can be used with or without
+    arguments, like transaction.atomic():
+
+        @retry_atomic
+        def transfer(): ...
+
+        @retry_atomic(using='other', max_attempts=5)
+        def transfer(): ...
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def inner(*args, **kwargs):
+            return run_transaction(
+                functools.partial(func, *args, **kwargs),
+                using=using, savepoint=savepoint, durable=durable, **options,
+            )
+        return inner
+
+    # Bare decorator: @retry_atomic
+    if callable(using):
+        func, using = using, None
+        return decorator(func)
+    return decorator
@@ -0,0 +1,39 @@
+from django.db import models
+
+from django_cockroachdb.fields import CockroachUUIDAutoField
+from django_cockroachdb.indexes import HashShardedIndex
+from django_cockroachdb.query import CockroachManager
+
+
+class Measurement(models.Model):
+    sensor = models.CharField(max_length=20)
+    value = models.IntegerField(default=0)
+
+    objects = CockroachManager()
+
+
+class UUIDEvent(models.Model):
+    id = CockroachUUIDAutoField(primary_key=True)
+    name = models.CharField(max_length=20)
+
+
+class Document(models.Model):
+    data = models.JSONField()
+
+
+class Sensor(models.Model):
+    name = models.CharField(max_length=30, unique=True)
+    calibration = models.DecimalField(max_digits=5, decimal_places=2, null=True)
+    installed = models.DateTimeField(null=True)
+
+
+class Reading(models.Model):
+    sensor = models.ForeignKey(Sensor, models.CASCADE)
+    taken = models.DateTimeField()
+    value = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sensor'], include=['value'], name='reading_sensor_idx'),
+            HashShardedIndex(fields=['taken'], name='reading_taken_hash'),
+        ]
@@ -0,0 +1,110 @@
+import contextlib
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TransactionTestCase
+
+from django_cockroachdb.base import SERVER_INFO_CACHE, DatabaseWrapper
+
+from .models import Measurement
+from .utils import FakeConnection
+
+SERVER_INFO = 'CockroachDB CCL v25.2.0-beta.1 (x86_64-pc-linux-gnu, built 2025/05/01 00:00:00, go1.23.7)'
+
+
+class ServerInfoTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(SERVER_INFO_CACHE, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_connection(self, crdb_version=None, results=(), **settings):
+        settings_dict = {**connection.settings_dict, **settings}
+        settings_dict['OPTIONS'] = {
+            key: value for key, value in settings_dict['OPTIONS'].items() if key != 'cockroachdb_version'
+        }
+        new_connection = DatabaseWrapper(settings_dict, alias=connection.alias)
+        new_connection.connection = FakeConnection(results)
+        new_connection.connection.info.parameter_status = {'crdb_version': crdb_version}.get
+        new_connection.temporary_connection = contextlib.nullcontext
+        return new_connection
+
+    def test_parameter_status(self):
+        new_connection = self.get_connection(crdb_version=SERVER_INFO)
+        self.assertEqual(new_connection.cockroachdb_server_info, SERVER_INFO)
+        self.assertEqual(new_connection.connection.executed, [])
+
+    def test_select_version_fallback(self):
+        new_connection = self.get_connection(results=[[(SERVER_INFO,)]])
+        self.assertEqual(new_connection.cockroachdb_server_info, SERVER_INFO)
+        self.assertEqual(new_connection.connection.executed, [('SELECT VERSION()', None)])
+
+    def test_cache_key(self):
+        self.get_connection(crdb_version=SERVER_INFO, HOST='a', PORT='1', NAME='x').cockroachdb_server_info
+        # A connection to the same database reuses the cached version.
+        same_database = self.get_connection(HOST='a', PORT='1', NAME='x')
+        self.assertEqual(same_database.cockroachdb_server_info, SERVER_INFO)
+        self.assertEqual(same_database.connection.executed, [])
+        for settings in [{'HOST': 'b'}, {'PORT': '2'}, {'NAME': 'y'}]:
+            with self.subTest(settings=settings):
+                other_database = self.get_connection(
+                    crdb_version='CockroachDB CCL v24.3.1', **{'HOST': 'a', 'PORT': '1', 'NAME': 'x', **settings},
+                )
+                self.assertEqual(other_database.cockroachdb_server_info, 'CockroachDB CCL v24.3.1')
+        self.assertEqual(len(SERVER_INFO_CACHE), 4)
+
+    def test_version(self):
+        new_connection = self.get_connection(crdb_version=SERVER_INFO)
+        self.assertEqual(new_connection.cockroachdb_version, (25, 2, 0))
+
+    def test_pinned_version(self):
+        for pinned_version in ['25.2.0', 'v25.2.0', 'v25.2.0-beta.1', '25.2.0-alpha.20250101']:
+            with self.subTest(pinned_version=pinned_version):
+                new_connection = self.get_connection()
+                new_connection.settings_dict['OPTIONS']['cockroachdb_version'] = pinned_version
+                self.assertEqual(new_connection.cockroachdb_version, (25, 2, 0))
+                self.assertEqual(SERVER_INFO_CACHE, {})
+
+    def test_invalid_pinned_version(self):
+        new_connection = self.get_connection()
+        new_connection.settings_dict['OPTIONS']['cockroachdb_version'] = 'latest'
+        msg = "Unable to determine CockroachDB version from OPTIONS['cockroachdb_version'] = 'latest'."
+        with self.assertRaisesMessage(ImproperlyConfigured, msg):
+            new_connection.cockroachdb_version
+
+
+class ChunkedCursorTests(SimpleTestCase):
+    def chunked_cursor(self, autocommit):
+        new_connection = DatabaseWrapper(connection.settings_dict, alias=connection.alias)
+        with (
+            mock.patch.object(new_connection, 'get_autocommit', return_value=autocommit),
+            mock.patch.object(new_connection, '_cursor') as _cursor,
+        ):
+            new_connection.chunked_cursor()
+        return _cursor
+
+    def test_named_cursor_in_transaction(self):
+        _cursor = self.chunked_cursor(autocommit=False)
+        _cursor.assert_called_once()
+        self.assertTrue(_cursor.call_args.kwargs['name'].startswith('_django_curs_'))
+
+    def test_regular_cursor_in_autocommit(self):
+        self.chunked_cursor(autocommit=True).assert_called_once_with()
+
+
+class ChunkedCursorDatabaseTests(TransactionTestCase):
+    available_apps = ['cockroachdb']
+
+    def setUp(self):
+        Measurement.objects.bulk_create(Measurement(sensor='a', value=i) for i in range(3))
+
+    def iterate(self):
+        return sorted(obj.value for obj in Measurement.objects.iterator(chunk_size=1))
+
+    def test_autocommit(self):
+        self.assertEqual(self.iterate(), [0, 1, 2])
+
+    def test_transaction(self):
+        with transaction.atomic():
+            self.assertEqual(self.iterate(), [0, 1, 2])
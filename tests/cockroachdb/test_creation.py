@@ -0,0 +1,114 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.db import NotSupportedError, connection
+from django.test import SimpleTestCase
+
+from django_cockroachdb.creation import DatabaseCreation
+from django_cockroachdb.features import DatabaseFeatures
+
+from .utils import FakeConnection
+
+
+class CloneTestDatabaseTests(SimpleTestCase):
+    def creation(self, results=(), **test_settings):
+        """Return a DatabaseCreation whose connection is a FakeConnection."""
+        fake = FakeConnection(results)
+        creation = DatabaseCreation(connection)
+        creation.connection = SimpleNamespace(
+            settings_dict={**connection.settings_dict, 'NAME': 'test_db', 'TEST': test_settings},
+            cursor=fake.cursor,
+            ops=connection.ops,
+        )
+        return creation, fake
+
+    def test_can_clone_databases_opt_in(self):
+        for test_settings, expected in [
+            ({}, False),
+            ({'CLONE_BY_COPYING': True}, True),
+            ({'CLONE_BACKUP_URI': 'nodelocal://1/tests'}, True),
+        ]:
+            with self.subTest(test_settings=test_settings):
+                with mock.patch.dict(connection.settings_dict, TEST=test_settings):
+                    self.assertIs(DatabaseFeatures(connection).can_clone_databases, expected)
+
+    def test_copy(self):
+        descriptors = [
+            ('public', 'author', 'table', 'CREATE TABLE public.author (id INT8 PRIMARY KEY)', [], []),
+            (
+                'other', 'book', 'table', 'CREATE TABLE other.book (id INT8 PRIMARY KEY, author_id INT8)',
+                ['ALTER TABLE other.book ADD CONSTRAINT fk FOREIGN KEY (author_id) REFERENCES public.author(id)'],
+                ['ALTER TABLE other.book VALIDATE CONSTRAINT fk'],
+            ),
+            ('public', 'book_seq', 'sequence', 'CREATE SEQUENCE public.book_seq', [], []),
+        ]
+        types = [('public', "CREATE TYPE public.mood AS ENUM ('sad', 'ok')")]
+        columns = [('public', 'author', ['id']), ('other', 'book', ['id', 'author_id'])]
+        creation, fake = self.creation()
+        cursor = FakeConnection([descriptors, types, columns]).cursor()
+        creation._copy_test_db(cursor, 'test_db', 'test_db_1')
+        self.assertEqual([sql for sql, params in cursor.connection.executed[3:]], [
+            'CREATE DATABASE "test_db_1"',
+            'SET database = "test_db_1"',
+            'CREATE SCHEMA "other"',
+            "CREATE TYPE public.mood AS ENUM ('sad', 'ok')",
+            'CREATE TABLE public.author (id INT8 PRIMARY KEY)',
+            'CREATE TABLE other.book (id INT8 PRIMARY KEY, author_id INT8)',
+            'CREATE SEQUENCE public.book_seq',
+            'INSERT INTO "test_db_1"."public"."author" ("id") SELECT "id" FROM "test_db"."public"."author"',
+            'INSERT INTO "test_db_1"."other"."book" ("id", "author_id") '
+            'SELECT "id", "author_id" FROM "test_db"."other"."book"',
+            'ALTER TABLE other.book ADD CONSTRAINT fk FOREIGN KEY (author_id) REFERENCES public.author(id)',
+            'ALTER TABLE other.book VALIDATE CONSTRAINT fk',
+            'SET database = "test_db"',
+        ])
+
+    def test_copy_views(self):
+        descriptors = [
+            ('public', 'author', 'table', 'CREATE TABLE public.author (id INT8 PRIMARY KEY)', [], []),
+            ('public', 'author_view', 'view', 'CREATE VIEW public.author_view ...', [], []),
+        ]
+        creation, fake = self.creation()
+        cursor = FakeConnection([descriptors]).cursor()
+        msg = "Cloning a database with views (author_view) requires TEST['CLONE_BACKUP_URI']."
+        with self.assertRaisesMessage(NotSupportedError, msg):
+            creation._copy_test_db(cursor, 'test_db', 'test_db_1')
+        self.assertEqual(len(cursor.connection.executed), 1)
+
+    def test_restore(self):
+        creation, fake = self.creation()
+        cursor = fake.cursor()
+        creation._restore_test_db(cursor, 'test_db', 'test_db_1', 'nodelocal://1/tests/')
+        creation._restore_test_db(cursor, 'test_db', 'test_db_2', 'nodelocal://1/tests/')
+        # The source database is backed up once.
+        self.assertEqual(fake.executed, [
+            ('BACKUP DATABASE "test_db" INTO %s', ['nodelocal://1/tests/test_db']),
+            (
+                'RESTORE DATABASE "test_db" FROM LATEST IN %s WITH new_db_name = %s',
+                ['nodelocal://1/tests/test_db', 'test_db_1'],
+            ),
+            (
+                'RESTORE DATABASE "test_db" FROM LATEST IN %s WITH new_db_name = %s',
+                ['nodelocal://1/tests/test_db', 'test_db_2'],
+            ),
+        ])
+
+    def test_clone_keepdb(self):
+        creation, fake = self.creation(results=[[(1,)]], CLONE_BACKUP_URI='nodelocal://1/tests')
+        with mock.patch.object(creation, '_restore_test_db') as restore:
+            creation._clone_test_db('1', verbosity=0, keepdb=True)
+        restore.assert_not_called()
+        self.assertEqual(len(fake.executed), 1)
+
+    def test_clone_replaces_existing_database(self):
+        creation, fake = self.creation(results=[[(1,)]], CLONE_BACKUP_URI='nodelocal://1/tests')
+        with mock.patch.object(creation, '_restore_test_db') as restore:
+            creation._clone_test_db('1', verbosity=0)
+        self.assertEqual(fake.executed[1], ('DROP DATABASE "test_db_1" CASCADE', None))
+        restore.assert_called_once_with(mock.ANY, 'test_db', 'test_db_1', 'nodelocal://1/tests')
+
+    def test_clone_by_copying(self):
+        creation, fake = self.creation(results=[[]], CLONE_BY_COPYING=True)
+        with mock.patch.object(creation, '_copy_test_db') as copy:
+            creation._clone_test_db('1', verbosity=0)
+        copy.assert_called_once_with(mock.ANY, 'test_db', 'test_db_1')
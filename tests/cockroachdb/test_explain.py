@@ -0,0 +1,167 @@
+from django.db import connection
+from django.test import SimpleTestCase
+
+from django_cockroachdb.explain import (
+    parse_count, parse_duration, parse_plan, parse_size,
+)
+
+# The output of EXPLAIN ANALYZE for a join of two tables on CockroachDB 25.2.
+EXPLAIN_ANALYZE = """\
+planning time: 1ms
+execution time: 3ms
+distribution: local
+vectorized: true
+rows decoded from KV: 3 (24 B, 2 gRPC calls)
+cumulative time spent in KV: 2ms
+cumulative time spent due to contention: 250µs
+maximum memory usage: 40 KiB
+network usage: 0 B (0 messages)
+regions: us-east1
+isolation level: serializable
+priority: normal
+quality of service: regular
+
+• hash join
+│ sql nodes: n1
+│ regions: us-east1
+│ actual row count: 2
+│ execution time: 1.5ms
+│ estimated max memory allocated: 30 KiB
+│ estimated row count: 2
+│ equality: (id) = (question_id)
+│
+├── • scan
+│     sql nodes: n1
+│     kv nodes: n1
+│     regions: us-east1
+│     actual row count: 1
+│     KV time: 1ms
+│     KV contention time: 250µs
+│     KV rows decoded: 1
+│     KV bytes read: 8 B
+│     KV gRPC calls: 1
+│     estimated max memory allocated: 10 KiB
+│     estimated row count: 1 (100% of the table; stats collected 2 minutes ago)
+│     table: polls_question@polls_question_pkey
+│     spans: FULL SCAN
+│
+└── • scan
+      sql nodes: n1
+      kv nodes: n1
+      regions: us-east1
+      actual row count: 2
+      KV time: 1ms
+      KV contention time: 0µs
+      KV rows decoded: 2
+      KV bytes read: 16 B
+      KV gRPC calls: 1
+      estimated max memory allocated: 10 KiB
+      estimated row count: 2 (50% of the table; stats collected 2 minutes ago)
+      table: polls_choice@polls_choice_question_id_idx
+      spans: [/1 - /1]
+"""
+
+# The output of EXPLAIN (without ANALYZE).
+EXPLAIN = """\
+distribution: local
+vectorized: true
+
+• scan
+  missing stats
+  table: polls_choice@polls_choice_pkey
+  spans: FULL SCAN
+"""
+
+
+class ParseTests(SimpleTestCase):
+    def test_parse_duration(self):
+        for value, expected in [
+            ('1ms', 0.001),
+            ('1.5s', 1.5),
+            ('250µs', 0.00025),
+            ('250us', 0.00025),
+            ('500ns', 5e-7),
+            ('1m2.5s', 62.5),
+            ('1h1m', 3660),
+        ]:
+            with self.subTest(value=value):
+                self.assertAlmostEqual(parse_duration(value), expected)
+        self.assertIsNone(parse_duration('unknown'))
+        self.assertIsNone(parse_duration(None))
+
+    def test_parse_size(self):
+        self.assertEqual(parse_size('8 B'), 8)
+        self.assertEqual(parse_size('1.5 KiB'), 1536)
+        self.assertEqual(parse_size('2 MiB'), 2 * 1024 ** 2)
+        self.assertEqual(parse_size('3 (24 B, 2 gRPC calls)'), 24)
+        self.assertIsNone(parse_size('3 rows'))
+        self.assertIsNone(parse_size(None))
+
+    def test_parse_count(self):
+        self.assertEqual(parse_count('1,234 (100% of the table)'), 1234)
+        self.assertEqual(parse_count('2'), 2)
+        self.assertIsNone(parse_count('unknown'))
+        self.assertIsNone(parse_count(None))
+
+
+class ParsePlanTests(SimpleTestCase):
+    def test_explain_analyze(self):
+        plan = parse_plan(EXPLAIN_ANALYZE)
+        self.assertEqual(str(plan), EXPLAIN_ANALYZE)
+        self.assertAlmostEqual(plan.planning_time, 0.001)
+        self.assertAlmostEqual(plan.execution_time, 0.003)
+        self.assertEqual(plan.rows_read, 3)
+        self.assertEqual(plan.bytes_read, 24)
+        self.assertAlmostEqual(plan.contention_time, 0.00025)
+        self.assertEqual(plan.attributes['isolation level'], 'serializable')
+        self.assertEqual([node.name for node in plan.walk()], ['hash join', 'scan', 'scan'])
+        join = plan.root
+        self.assertEqual(join.actual_row_count, 2)
+        self.assertAlmostEqual(join.execution_time, 0.0015)
+        self.assertEqual(join.attributes['equality'], '(id) = (question_id)')
+        question_scan, choice_scan = join.children
+        self.assertEqual(plan.find('scan'), [question_scan, choice_scan])
+        self.assertEqual(question_scan.attributes['table'], 'polls_question@polls_question_pkey')
+        self.assertEqual(question_scan.estimated_row_count, 1)
+        self.assertEqual(question_scan.kv_rows_read, 1)
+        self.assertEqual(question_scan.kv_bytes_read, 8)
+        self.assertAlmostEqual(question_scan.kv_time, 0.001)
+        self.assertAlmostEqual(question_scan.contention_time, 0.00025)
+        self.assertIs(question_scan.full_scan, True)
+        self.assertEqual(choice_scan.attributes['spans'], '[/1 - /1]')
+        self.assertEqual(choice_scan.kv_bytes_read, 16)
+        self.assertIs(choice_scan.full_scan, False)
+        self.assertEqual(plan.full_scans, [question_scan])
+
+    def test_explain(self):
+        plan = parse_plan(EXPLAIN)
+        self.assertEqual(plan.attributes, {'distribution': 'local', 'vectorized': 'true'})
+        self.assertEqual(plan.root.name, 'scan')
+        self.assertEqual(plan.root.attributes, {'table': 'polls_choice@polls_choice_pkey', 'spans': 'FULL SCAN'})
+        self.assertIsNone(plan.root.actual_row_count)
+        self.assertIsNone(plan.execution_time)
+        self.assertEqual(len(plan.full_scans), 1)
+
+    def test_empty(self):
+        plan = parse_plan('')
+        self.assertIsNone(plan.root)
+        self.assertEqual(list(plan.walk()), [])
+        self.assertEqual(plan.find('scan'), [])
+
+
+class ExplainQueryPrefixTests(SimpleTestCase):
+    def test_options(self):
+        self.assertEqual(connection.ops.explain_query_prefix(verbose=True, opt=True), 'EXPLAIN (OPT, VERBOSE)')
+        self.assertEqual(connection.ops.explain_query_prefix(analyze=True), 'EXPLAIN ANALYZE')
+        self.assertEqual(connection.ops.explain_query_prefix(analyze=True, debug=True), 'EXPLAIN ANALYZE (DEBUG)')
+
+    def test_debug_requires_analyze(self):
+        msg = 'The DEBUG option of EXPLAIN requires ANALYZE.'
+        with self.assertRaisesMessage(ValueError, msg):
+            connection.ops.explain_query_prefix(debug=True)
+        with self.assertRaisesMessage(ValueError, msg):
+            connection.ops.explain_query_prefix(analyze=False, debug=True)
+
+    def test_unknown_option(self):
+        with self.assertRaisesMessage(ValueError, 'Unknown options: COLOR'):
+            connection.ops.explain_query_prefix(color=True)
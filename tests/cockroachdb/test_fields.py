@@ -0,0 +1,54 @@
+import uuid
+
+from django.db import connection, models
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import isolate_apps
+
+from django_cockroachdb.fields import CockroachUUIDAutoField
+
+from .models import UUIDEvent
+
+
+class CockroachUUIDAutoFieldTests(TestCase):
+    def test_save(self):
+        event = UUIDEvent.objects.create(name='a')
+        self.assertIsInstance(event.pk, uuid.UUID)
+        self.assertEqual(UUIDEvent.objects.get(pk=str(event.pk)), event)
+
+    def test_bulk_create(self):
+        events = UUIDEvent.objects.bulk_create([UUIDEvent(name='a'), UUIDEvent(name='b')])
+        self.assertEqual(len({event.pk for event in events}), 2)
+        for event in events:
+            self.assertIsInstance(event.pk, uuid.UUID)
+        self.assertEqual(
+            set(UUIDEvent.objects.values_list('pk', 'name')),
+            {(event.pk, event.name) for event in events},
+        )
+
+    def test_bulk_create_with_and_without_pk(self):
+        pk = uuid.uuid4()
+        events = UUIDEvent.objects.bulk_create([UUIDEvent(pk=pk, name='a'), UUIDEvent(name='b')])
+        self.assertEqual(events[0].pk, pk)
+        self.assertIsInstance(events[1].pk, uuid.UUID)
+        self.assertEqual(UUIDEvent.objects.count(), 2)
+
+
+@isolate_apps('cockroachdb')
+class CockroachUUIDAutoFieldModelTests(SimpleTestCase):
+    @override_settings(DEFAULT_AUTO_FIELD='django_cockroachdb.fields.CockroachUUIDAutoField')
+    def test_default_auto_field(self):
+        class Event(models.Model):
+            pass
+
+        self.assertIsInstance(Event._meta.pk, CockroachUUIDAutoField)
+        self.assertEqual(Event.check(), [])
+
+    def test_foreign_key(self):
+        class Event(models.Model):
+            id = CockroachUUIDAutoField(primary_key=True)
+
+        class Attendee(models.Model):
+            event = models.ForeignKey(Event, models.CASCADE)
+
+        self.assertEqual(Attendee._meta.get_field('event').db_type(connection), 'uuid')
+        self.assertEqual(Event._meta.pk.validators, [])
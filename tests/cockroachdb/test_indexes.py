@@ -0,0 +1,105 @@
+from unittest import mock
+
+from django.core import checks
+from django.db import connection, models
+from django.test import SimpleTestCase
+from django.test.utils import isolate_apps
+
+from django_cockroachdb.indexes import HashShardedIndex
+
+
+@isolate_apps('cockroachdb')
+class HashShardedIndexTests(SimpleTestCase):
+    def test_primary_key_check(self):
+        class Event(models.Model):
+            created = models.DateTimeField()
+
+            class Meta:
+                indexes = [HashShardedIndex(fields=['id'], name='event_pk', primary_key=True)]
+
+        self.assertEqual(Event.check(databases=['default']), [])
+
+    def test_primary_key_other_fields_check(self):
+        class Event(models.Model):
+            created = models.DateTimeField()
+
+            class Meta:
+                indexes = [HashShardedIndex(fields=['created'], name='event_pk', primary_key=True)]
+
+        self.assertEqual(Event.check(databases=['default']), [
+            checks.Error(
+                "The primary key HashShardedIndex 'event_pk' must use the "
+                "primary key fields: id.",
+                obj=Event,
+                id='django_cockroachdb.E001',
+            ),
+        ])
+
+    def test_primary_key_other_fields_sql(self):
+        class Event(models.Model):
+            created = models.DateTimeField()
+
+        index = HashShardedIndex(fields=['created'], name='event_pk', primary_key=True)
+        editor = connection.schema_editor()
+        msg = "The primary key HashShardedIndex 'event_pk' must use the primary key fields of cockroachdb.Event."
+        with self.assertRaisesMessage(ValueError, msg):
+            index.create_sql(Event, editor)
+        with self.assertRaisesMessage(ValueError, msg):
+            index.remove_sql(Event, editor)
+
+    def test_primary_key_sql(self):
+        class Event(models.Model):
+            created = models.DateTimeField()
+
+        index = HashShardedIndex(fields=['id'], name='event_pk', primary_key=True, bucket_count=8)
+        editor = connection.schema_editor()
+        self.assertEqual(
+            str(index.create_sql(Event, editor)),
+            'ALTER TABLE "cockroachdb_event" ALTER PRIMARY KEY USING COLUMNS ("id") '
+            'USING HASH WITH (bucket_count = 8)',
+        )
+        self.assertEqual(
+            str(index.remove_sql(Event, editor)),
+            'ALTER TABLE "cockroachdb_event" ALTER PRIMARY KEY USING COLUMNS ("id")',
+        )
+
+
+@isolate_apps('cockroachdb')
+class IndexStoringTests(SimpleTestCase):
+    def setUp(self):
+        class Reading(models.Model):
+            sensor = models.CharField(max_length=10)
+            value = models.FloatField()
+            unit = models.CharField(max_length=10)
+
+        self.model = Reading
+        self.editor = connection.schema_editor()
+
+    def test_storing(self):
+        index = models.Index(fields=['sensor'], include=['value', 'unit'], name='reading_sensor_idx')
+        self.assertEqual(
+            str(index.create_sql(self.model, self.editor)),
+            'CREATE INDEX "reading_sensor_idx" ON "cockroachdb_reading" ("sensor") STORING ("value", "unit")',
+        )
+
+    def test_unique_constraint_storing(self):
+        constraint = models.UniqueConstraint(fields=['sensor'], include=['value'], name='reading_sensor_uniq')
+        self.assertEqual(
+            str(constraint.create_sql(self.model, self.editor)),
+            'CREATE UNIQUE INDEX "reading_sensor_uniq" ON "cockroachdb_reading" ("sensor") STORING ("value")',
+        )
+
+    def test_no_include(self):
+        index = models.Index(fields=['sensor'], name='reading_sensor_idx')
+        self.assertEqual(
+            str(index.create_sql(self.model, self.editor)),
+            'CREATE INDEX "reading_sensor_idx" ON "cockroachdb_reading" ("sensor")',
+        )
+
+    def test_covering_indexes_unsupported(self):
+        index = models.Index(fields=['sensor'], include=['value'], name='reading_sensor_idx')
+        with mock.patch.object(connection.features, 'supports_covering_indexes', False):
+            self.assertEqual(
+                str(index.create_sql(self.model, self.editor)),
+                'CREATE INDEX "reading_sensor_idx" ON "cockroachdb_reading" ("sensor")',
+            )
@@ -0,0 +1,140 @@
+from types import SimpleNamespace
+
+from django.db.utils import OperationalError
+from django.test import SimpleTestCase
+
+from django_cockroachdb.instrumentation import (
+    Histogram, Registry, StatementEvent, StatementRecorder, fingerprint,
+)
+
+
+class FingerprintTests(SimpleTestCase):
+    def test_placeholders_and_lists(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE a = %s AND b IN (%s, %s, %s)'),
+            'SELECT * FROM t WHERE a = _ AND b IN (_, __more__)',
+        )
+        # The number of values doesn't matter.
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE a = %s AND b IN (%s, %s)'),
+            fingerprint('SELECT * FROM t WHERE a = %(a)s AND b IN ($1, $2, $3, $4)'),
+        )
+
+    def test_values_rows(self):
+        self.assertEqual(
+            fingerprint('INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s), (%s, %s)'),
+            fingerprint('INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)'),
+        )
+
+    def test_constants_and_comments(self):
+        self.assertEqual(
+            fingerprint("SELECT 'it''s', 1.5, -3 FROM t /* view='x' */ WHERE c1 = $1"),
+            'SELECT _, _, _ FROM t WHERE c1 = _',
+        )
+        self.assertEqual(fingerprint('SELECT  a\n FROM "t2" -- c\nLIMIT 10'), 'SELECT a FROM "t2" LIMIT _')
+
+
+class HistogramTests(SimpleTestCase):
+    def test_observe(self):
+        histogram = Histogram((1, 10))
+        for value in (0, 1, 5, 50):
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        self.assertEqual(histogram.count, 4)
+        self.assertEqual(histogram.sum, 56)
+        self.assertEqual(histogram.cumulative_counts(), [(1, 2), (10, 3), (float('inf'), 4)])
+
+
+class RegistryTests(SimpleTestCase):
+    def event(self, **kwargs):
+        return StatementEvent(**{
+            'alias': 'default', 'application_name': 'myapp', 'fingerprint': 'SELECT _',
+            'duration': 0.002, 'rows': 1, 'retries': 0, 'error': None, **kwargs,
+        })
+
+    def test_record(self):
+        registry = Registry()
+        registry.record(self.event())
+        registry.record(self.event(rows=None, retries=2, error=OperationalError()))
+        registry.record(self.event(fingerprint='SELECT _ FROM t'))
+        stats = registry.stats()
+        self.assertEqual(len(stats), 2)
+        statement_stats = stats['default', 'myapp', 'SELECT _']
+        self.assertEqual(statement_stats.latency.count, 2)
+        self.assertEqual(statement_stats.rows.count, 1)
+        self.assertEqual(statement_stats.retries.sum, 2)
+        self.assertEqual(statement_stats.errors, 1)
+        self.assertEqual(statement_stats.serialization_failures, 0)
+        registry.reset()
+        self.assertEqual(registry.stats(), {})
+
+    def test_prometheus_text(self):
+        registry = Registry()
+        registry.record(self.event(application_name=None, fingerprint='SELECT "a\\b"'))
+        text = registry.prometheus_text(prefix='stmt')
+        labels = 'database="default",application_name="",fingerprint="SELECT \\"a\\\\b\\""'
+        self.assertTrue(text.endswith('\n'))
+        lines = text.splitlines()
+        for line in [
+            '# HELP stmt_latency_seconds The duration of statements.',
+            '# TYPE stmt_latency_seconds histogram',
+            'stmt_latency_seconds_bucket{%s,le="0.001"} 0' % labels,
+            'stmt_latency_seconds_bucket{%s,le="0.0025"} 1' % labels,
+            'stmt_latency_seconds_bucket{%s,le="+Inf"} 1' % labels,
+            'stmt_latency_seconds_sum{%s} 0.002' % labels,
+            'stmt_latency_seconds_count{%s} 1' % labels,
+            'stmt_rows_bucket{%s,le="0"} 0' % labels,
+            'stmt_rows_bucket{%s,le="1"} 1' % labels,
+            '# TYPE stmt_errors_total counter',
+            'stmt_errors_total{%s} 0' % labels,
+            'stmt_serialization_failures_total{%s} 0' % labels,
+        ]:
+            self.assertIn(line, lines)
+
+    def test_prometheus_text_empty(self):
+        text = Registry().prometheus_text()
+        self.assertIn('# TYPE django_cockroachdb_statement_retries histogram\n', text)
+        self.assertNotIn('{', text)
+
+
+class StatementRecorderTests(SimpleTestCase):
+    def setUp(self):
+        self.events = []
+        self.registry = Registry()
+        self.connection = SimpleNamespace(alias='default', transaction_retries=1)
+        self.context = {'cursor': SimpleNamespace(rowcount=3)}
+
+    def record(self, execute, callback=None):
+        recorder = StatementRecorder(self.connection, registry=self.registry, callback=callback)
+        return recorder(execute, 'SELECT 1', None, False, self.context)
+
+    def test_record(self):
+        self.assertEqual(self.record(lambda *args: 'result', callback=self.events.append), 'result')
+        [event] = self.events
+        self.assertEqual(event.fingerprint, 'SELECT _')
+        self.assertEqual((event.rows, event.retries, event.error), (3, 1, None))
+        self.assertEqual(list(self.registry.stats()), [('default', None, 'SELECT _')])
+
+    def test_error(self):
+        error = OperationalError('statement failed')
+
+        def execute(*args):
+            raise error
+        with self.assertRaises(OperationalError) as cm:
+            self.record(execute, callback=self.events.append)
+        self.assertIs(cm.exception, error)
+        self.assertIs(self.events[0].error, error)
+        self.assertIsNone(self.events[0].rows)
+
+    def test_callback_error(self):
+        def callback(event):
+            raise ValueError('callback failed')
+
+        def execute(*args):
+            raise OperationalError('statement failed')
+        with self.assertLogs('django.db.backends', 'ERROR') as cm:
+            with self.assertRaisesMessage(OperationalError, 'statement failed'):
+                self.record(execute, callback=callback)
+            self.assertEqual(self.record(lambda *args: 'result', callback=callback), 'result')
+        self.assertEqual(len(cm.records), 2)
+        self.assertEqual(cm.records[0].getMessage(), 'The instrumentation callback raised an exception.')
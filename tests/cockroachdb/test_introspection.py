@@ -0,0 +1,156 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from .models import Reading, Sensor
+from .utils import FakeConnection
+
+
+def introspect(cursor, table_name):
+    introspection = connection.introspection
+    return (
+        introspection.get_table_description(cursor, table_name),
+        introspection.get_constraints(cursor, table_name),
+        introspection.get_relations(cursor, table_name),
+    )
+
+
+class CachedIntrospectionTests(TestCase):
+    tables = [Sensor._meta.db_table, Reading._meta.db_table]
+
+    def test_cached_results_match(self):
+        with connection.cursor() as cursor:
+            uncached = {table: introspect(cursor, table) for table in self.tables}
+            with connection.introspection.cached():
+                cached = {table: introspect(cursor, table) for table in self.tables}
+                self.assertTrue(connection.introspection._cache)
+        self.assertEqual(cached, uncached)
+        self.assertEqual(connection.introspection._cache, {})
+
+    def test_constraints(self):
+        with connection.cursor() as cursor, connection.introspection.cached():
+            constraints = connection.introspection.get_constraints(cursor, Reading._meta.db_table)
+        self.assertEqual(constraints['reading_sensor_idx']['columns'], ['sensor_id', 'value'])
+        self.assertEqual(constraints['reading_sensor_idx']['include'], ['value'])
+        self.assertEqual(constraints['reading_taken_hash']['columns'], ['taken'])
+        self.assertEqual(constraints['reading_taken_hash']['type'], 'hash')
+
+
+class StoredColumnsTests(SimpleTestCase):
+    def add_stored_columns(self, table_name, constraints, rows):
+        cursor = FakeConnection(results=[rows]).cursor()
+        connection.introspection._add_stored_columns(cursor, table_name, constraints)
+        return cursor.connection.executed
+
+    def test_add_stored_columns(self):
+        constraints = {
+            'reading': {
+                'reading_pkey': {'columns': ['id'], 'primary_key': True},
+                'reading_sensor_idx': {'columns': ['sensor_id'], 'primary_key': False},
+                'reading_taken_idx': {'columns': ['taken'], 'primary_key': False},
+            },
+        }
+        executed = self.add_stored_columns('reading', constraints, [
+            ('reading', 'reading_sensor_idx', ['value']),
+            # A primary index stores every column.
+            ('reading', 'reading_pkey', ['sensor_id', 'taken', 'value']),
+            # Indexes that aren't among the constraints are ignored.
+            ('reading', 'reading_other_idx', ['value']),
+        ])
+        self.assertEqual(constraints, {
+            'reading': {
+                'reading_pkey': {'columns': ['id'], 'primary_key': True, 'include': []},
+                'reading_sensor_idx': {'columns': ['sensor_id', 'value'], 'primary_key': False, 'include': ['value']},
+                'reading_taken_idx': {'columns': ['taken'], 'primary_key': False, 'include': []},
+            },
+        })
+        [(sql, params)] = executed
+        self.assertIn('AND table_name = %s', sql)
+        self.assertEqual(params, ['reading'])
+
+    def test_all_tables(self):
+        constraints = {
+            'a': {'a_idx': {'columns': ['x'], 'primary_key': False}},
+            'b': {'b_idx': {'columns': ['y'], 'primary_key': False}},
+        }
+        [(sql, params)] = self.add_stored_columns(None, constraints, [('b', 'b_idx', ['z'])])
+        self.assertNotIn('table_name = %s', sql)
+        self.assertEqual(params, [])
+        self.assertEqual(constraints['a']['a_idx']['include'], [])
+        self.assertEqual(constraints['b']['b_idx'], {'columns': ['y', 'z'], 'primary_key': False, 'include': ['z']})
+
+
+class BulkConstraintsTests(SimpleTestCase):
+    def setUp(self):
+        self.addCleanup(connection.introspection.clear_cache)
+        connection.introspection._cache['descriptions'] = {'sensor': [], 'reading': [], 'empty': []}
+
+    def test_get_constraints(self):
+        cursor = FakeConnection(results=[
+            # The constraints of every table.
+            [
+                ('sensor', 'sensor_pkey', ['id'], 'p', None, None),
+                ('reading', 'reading_pkey', ['id'], 'p', None, None),
+                ('reading', 'reading_sensor_id_fk', ['sensor_id'], 'f', 'sensor.id', None),
+            ],
+            # The indexes of every table. The index names of different tables
+            # may be the same.
+            [
+                ('sensor', 'sensor_pkey', ['id'], True, True, ['ASC'], 'prefix', None, None),
+                ('sensor', 'value_idx', ['value'], False, False, ['DESC'], 'prefix', None, None),
+                ('reading', 'reading_pkey', ['id'], True, True, ['ASC'], 'prefix', None, None),
+                ('reading', 'value_idx', ['value'], False, False, ['ASC'], 'prefix', None, None),
+            ],
+            # STORING columns and hash-sharded indexes.
+            [],
+            [],
+        ]).cursor()
+        constraints = connection.introspection._get_constraints(cursor)
+        self.assertEqual(list(constraints), ['sensor', 'reading', 'empty'])
+        self.assertEqual(constraints['empty'], {})
+        self.assertEqual(list(constraints['reading']), ['reading_pkey', 'reading_sensor_id_fk', 'value_idx'])
+        self.assertEqual(constraints['reading']['reading_sensor_id_fk']['foreign_key'], ('sensor', 'id'))
+        self.assertEqual(constraints['sensor']['value_idx']['orders'], ['DESC'])
+        self.assertEqual(constraints['reading']['value_idx']['orders'], ['ASC'])
+        self.assertEqual(constraints['reading']['value_idx']['type'], 'idx')
+        self.assertEqual(constraints['reading']['value_idx']['include'], [])
+        # The queries of PostgresDatabaseIntrospection.get_constraints() run
+        # once for every table.
+        (constraints_sql, constraints_params), (indexes_sql, indexes_params) = cursor.connection.executed[:2]
+        for sql in [constraints_sql, indexes_sql]:
+            self.assertTrue(
+                sql.startswith('SELECT t.relname, q.* FROM unnest(%s::STRING[]) AS t(relname), LATERAL ('), sql,
+            )
+            self.assertTrue(sql.endswith(') AS q'), sql)
+        self.assertIn('WHERE cl.relname = t.relname AND', constraints_sql)
+        self.assertEqual(constraints_params, [['sensor', 'reading', 'empty']])
+        self.assertIn('CASE am.amname\n                        WHEN %s THEN', indexes_sql)
+        self.assertIn('WHERE c.relname = t.relname AND', indexes_sql)
+        self.assertNotIn(';', indexes_sql)
+        self.assertEqual(indexes_params, [['sensor', 'reading', 'empty'], 'prefix'])
+
+
+class CacheLifetimeTests(TransactionTestCase):
+    available_apps = ['cockroachdb']
+
+    def tearDown(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TABLE IF EXISTS introspection_new_table')
+
+    def test_table_created_after_caching(self):
+        with connection.cursor() as cursor, connection.introspection.cached():
+            connection.introspection.get_constraints(cursor, Sensor._meta.db_table)
+            cursor.execute('CREATE TABLE introspection_new_table (id INT PRIMARY KEY, name STRING)')
+            constraints = connection.introspection.get_constraints(cursor, 'introspection_new_table')
+            description = connection.introspection.get_table_description(cursor, 'introspection_new_table')
+        self.assertEqual([constraint['primary_key'] for constraint in constraints.values()], [True])
+        self.assertEqual([field.name for field in description], ['id', 'name'])
+
+    def test_option_cleared_on_close(self):
+        with mock.patch.dict(connection.settings_dict['OPTIONS'], cache_introspection=True):
+            with connection.cursor() as cursor:
+                connection.introspection.get_constraints(cursor, Sensor._meta.db_table)
+            self.assertTrue(connection.introspection._cache)
+            connection.close()
+            self.assertEqual(connection.introspection._cache, {})
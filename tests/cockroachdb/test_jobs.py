@@ -0,0 +1,29 @@
+from django.test import SimpleTestCase
+
+from django_cockroachdb.jobs import (
+    SCHEMA_CHANGE_JOB_TYPES, JobProgress, estimate_remaining,
+    running_schema_changes, server_now,
+)
+
+from .utils import FakeConnection
+
+
+class JobsTests(SimpleTestCase):
+    def test_estimate_remaining(self):
+        self.assertEqual(estimate_remaining(0.25, 30), 90)
+        self.assertEqual(estimate_remaining(1, 30), 0)
+        self.assertIsNone(estimate_remaining(0, 30))
+        self.assertIsNone(estimate_remaining(None, 30))
+
+    def test_server_now(self):
+        connection = FakeConnection([[('2026-01-01 00:00:00',)]])
+        self.assertEqual(server_now(connection.cursor()), '2026-01-01 00:00:00')
+        self.assertEqual(connection.executed, [("SELECT now() AT TIME ZONE 'UTC'", None)])
+
+    def test_running_schema_changes(self):
+        connection = FakeConnection([[(1, 'ALTER TABLE t ADD COLUMN a INT8', 0, 2)]])
+        jobs = running_schema_changes(connection.cursor(), 'since')
+        self.assertEqual(jobs, [JobProgress(1, 'ALTER TABLE t ADD COLUMN a INT8', 0.0, 2.0)])
+        [(sql, params)] = connection.executed
+        self.assertIn('FROM [SHOW JOBS]', sql)
+        self.assertEqual(params, [list(SCHEMA_CHANGE_JOB_TYPES), 'since'])
@@ -0,0 +1,71 @@
+from unittest import mock
+
+from django.db import connection, models
+from django.db.models import Value
+from django.test import SimpleTestCase
+from django.test.utils import isolate_apps
+
+from django_cockroachdb.fields import RegionField
+from django_cockroachdb.locality import Global, RegionalByRow, RegionalByTable
+
+
+@isolate_apps('cockroachdb')
+class LocalitySQLTests(SimpleTestCase):
+    def collect_sql(self, action):
+        editor = connection.schema_editor(collect_sql=True)
+        # Skip __enter__(), which connects to the database.
+        editor.deferred_sql = []
+        # Quote the parameters without connecting to the database.
+        with mock.patch.object(
+            connection.ops, 'compose_sql', lambda sql, params: sql % tuple("'%s'" % param for param in params),
+        ):
+            action(editor)
+        return editor.collected_sql + [str(sql) for sql in editor.deferred_sql]
+
+    def create_model(self, locality, model_name='Place', **fields):
+        model = type(model_name, (models.Model,), {
+            '__module__': __name__,
+            'name': models.CharField(max_length=10),
+            'Meta': type('Meta', (), {'app_label': 'cockroachdb', 'constraints': [locality]}),
+            **fields,
+        })
+        return model, self.collect_sql(lambda editor: editor.create_model(model))
+
+    def test_locality_sql(self):
+        tests = [
+            (Global(name='locality'), {}, 'GLOBAL'),
+            (RegionalByTable(name='locality'), {}, 'REGIONAL BY TABLE IN PRIMARY REGION'),
+            (RegionalByTable(name='locality', region='us-east1'), {}, 'REGIONAL BY TABLE IN "us-east1"'),
+            (RegionalByRow(name='locality'), {}, 'REGIONAL BY ROW'),
+            (
+                RegionalByRow(name='locality', field='region'),
+                {'region': RegionField(db_column='home_region')},
+                'REGIONAL BY ROW AS "home_region"',
+            ),
+        ]
+        for i, (locality, fields, locality_sql) in enumerate(tests):
+            with self.subTest(locality=locality):
+                model, sql = self.create_model(locality, 'Place%d' % i, **fields)
+                self.assertEqual(len(sql), 1)
+                self.assertTrue(sql[0].endswith(') LOCALITY %s;' % locality_sql), sql[0])
+
+    def test_table_sql_with_params(self):
+        # The LOCALITY clause isn't appended to CREATE TABLE when it has
+        # parameters. ALTER TABLE sets the locality instead.
+        model, sql = self.create_model(
+            Global(name='locality'), kind=models.CharField(max_length=10, db_default=Value('park')),
+        )
+        self.assertEqual(len(sql), 2)
+        self.assertIn("DEFAULT 'park'", sql[0])
+        self.assertNotIn('LOCALITY', sql[0])
+        self.assertEqual(sql[1], 'ALTER TABLE "cockroachdb_place" SET LOCALITY GLOBAL')
+
+    def test_add_remove_locality(self):
+        model, _ = self.create_model(Global(name='locality'))
+        locality = RegionalByTable(name='locality', region='us-east1')
+        self.assertEqual(self.collect_sql(lambda editor: editor.add_constraint(model, locality)), [
+            'ALTER TABLE "cockroachdb_place" SET LOCALITY REGIONAL BY TABLE IN "us-east1";',
+        ])
+        self.assertEqual(self.collect_sql(lambda editor: editor.remove_constraint(model, locality)), [
+            'ALTER TABLE "cockroachdb_place" SET LOCALITY REGIONAL BY TABLE IN PRIMARY REGION;',
+        ])
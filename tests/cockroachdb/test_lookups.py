@@ -0,0 +1,32 @@
+from django.db import connection
+from django.test import TestCase
+
+from .models import Document
+
+
+class KeyTransformTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.object_key = Document.objects.create(data={'a': {'0': 'x', 'b': 'y'}})
+        cls.array_index = Document.objects.create(data={'a': ['x', 'z']})
+
+    def as_sql(self, queryset):
+        return queryset.query.get_compiler(connection=connection).as_sql()[0]
+
+    def test_nested_keys_use_arrow_operators(self):
+        queryset = Document.objects.filter(data__a__b='y')
+        self.assertIn('-> %s) -> %s)', self.as_sql(queryset))
+        self.assertNotIn('#>', self.as_sql(queryset))
+        self.assertSequenceEqual(queryset, [self.object_key])
+
+    def test_numeric_key_of_object(self):
+        queryset = Document.objects.filter(data__a__0='x')
+        self.assertIn('#>', self.as_sql(queryset))
+        self.assertCountEqual(queryset, [self.object_key, self.array_index])
+
+    def test_numeric_intermediate_key(self):
+        Document.objects.create(data={'a': {'0': {'b': 'y'}}})
+        self.assertEqual(Document.objects.filter(data__a__0__b='y').count(), 1)
+
+    def test_array_index(self):
+        self.assertSequenceEqual(Document.objects.filter(data__a__1='z'), [self.array_index])
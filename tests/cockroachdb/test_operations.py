@@ -0,0 +1,114 @@
+from unittest import mock
+
+from django.core.management.color import no_style
+from django.db import connection
+from django.db.backends.postgresql.operations import (
+    DatabaseOperations as PostgresDatabaseOperations,
+)
+from django.test import SimpleTestCase
+
+from django_cockroachdb.operations import CLEAN_TABLES, DEFAULT_FLUSH_OPTIONS
+
+
+class PlanFlushTests(SimpleTestCase):
+    # child refers to parent; grandchild refers to child.
+    references = {'child': {'parent'}, 'grandchild': {'child'}}
+
+    def plan(self, tables, all_tables, references=None, counts=None, **options):
+        options = {**DEFAULT_FLUSH_OPTIONS, **options}
+        with (
+            mock.patch.object(
+                connection.ops, '_foreign_key_references', return_value=references or self.references,
+            ),
+            mock.patch.object(
+                connection.ops, '_count_rows', return_value={table: 0 for table in tables} | (counts or {}),
+            ),
+        ):
+            return connection.ops._plan_flush(tables, all_tables, options)
+
+    def test_delete_order(self):
+        truncate, delete = self.plan(['parent', 'child', 'grandchild'], ['parent', 'child', 'grandchild'])
+        self.assertEqual(truncate, [])
+        self.assertEqual(delete, ['grandchild', 'child', 'parent'])
+
+    def test_truncate_large_tables(self):
+        truncate, delete = self.plan(
+            ['other', 'grandchild'], ['other', 'grandchild'], counts={'other': 1001},
+        )
+        self.assertEqual(truncate, ['other'])
+        self.assertEqual(delete, ['grandchild'])
+
+    def test_truncate_referring_tables(self):
+        truncate, delete = self.plan(
+            ['parent', 'child', 'grandchild'], ['parent', 'child', 'grandchild'], counts={'child': 1001},
+        )
+        self.assertEqual(truncate, ['child', 'grandchild'])
+        self.assertEqual(delete, ['parent'])
+
+    def test_truncate_clean_referring_tables(self):
+        # Only parent has rows, but child and grandchild (which are empty)
+        # must be truncated along with it.
+        truncate, delete = self.plan(
+            ['parent'], ['other', 'grandchild', 'parent', 'child'], counts={'parent': 1001},
+        )
+        self.assertEqual(truncate, ['grandchild', 'parent', 'child'])
+        self.assertEqual(delete, [])
+
+    def test_cycle(self):
+        references = {'a': {'b'}, 'b': {'a'}, 'c': {'a'}}
+        truncate, delete = self.plan(['a', 'b', 'c'], ['a', 'b', 'c'], references=references)
+        self.assertEqual(truncate, ['a', 'b', 'c'])
+        self.assertEqual(delete, [])
+
+    def test_self_reference(self):
+        truncate, delete = self.plan(['a'], ['a'], references={'a': {'a'}})
+        self.assertEqual(truncate, [])
+        self.assertEqual(delete, ['a'])
+
+    def test_strategies(self):
+        tables = ['parent', 'child']
+        self.assertEqual(self.plan(tables, tables, strategy='truncate'), (['parent', 'child'], []))
+        self.assertEqual(
+            self.plan(tables, tables, counts={'parent': 5000}, strategy='delete'), ([], ['child', 'parent']),
+        )
+
+
+class FlushCleanTablesTests(SimpleTestCase):
+    def setUp(self):
+        patchers = [
+            mock.patch.dict(connection.settings_dict['OPTIONS'], {'flush': {'strategy': 'delete'}}),
+            mock.patch.dict(CLEAN_TABLES, clear=True),
+            mock.patch.object(connection.ops, '_foreign_key_references', return_value={}),
+            mock.patch.object(connection.ops, '_count_rows', side_effect=lambda tables: dict.fromkeys(tables, 1)),
+            mock.patch.object(PostgresDatabaseOperations, 'execute_sql_flush'),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_sql_flush_without_execute(self):
+        # sqlflush only prints the SQL; the tables aren't emptied.
+        connection.ops.sql_flush(no_style(), ['a', 'b'])
+        self.assertEqual(CLEAN_TABLES, {})
+
+    def test_execute_marks_tables_in_sql_list(self):
+        connection.ops.sql_flush(no_style(), ['a', 'b', 'c'])
+        connection.ops.execute_sql_flush(connection.ops.sql_flush(no_style(), ['a', 'a, b']))
+        self.assertEqual(CLEAN_TABLES, {connection.alias: {'a', 'a, b'}})
+        # Clean tables are skipped, and only the other tables are flushed.
+        sql_list = connection.ops.sql_flush(no_style(), ['a', 'b'])
+        self.assertEqual(sql_list, ['DELETE FROM "b";'])
+        connection.ops.execute_sql_flush(sql_list)
+        self.assertEqual(CLEAN_TABLES, {connection.alias: {'a', 'b', 'a, b'}})
+
+    def test_truncate(self):
+        with mock.patch.dict(connection.settings_dict['OPTIONS'], {'flush': {'strategy': 'truncate'}}):
+            sql_list = connection.ops.sql_flush(no_style(), ['a', 'b'], allow_cascade=True)
+            self.assertEqual(sql_list, ['TRUNCATE "a", "b" CASCADE;'])
+            connection.ops.execute_sql_flush(sql_list)
+        self.assertEqual(CLEAN_TABLES, {connection.alias: {'a', 'b'}})
+
+    def test_flush_option_unset(self):
+        with mock.patch.dict(connection.settings_dict['OPTIONS'], {'flush': None}):
+            connection.ops.execute_sql_flush(connection.ops.sql_flush(no_style(), ['a']))
+        self.assertEqual(CLEAN_TABLES, {})
@@ -0,0 +1,80 @@
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+
+from django_cockroachdb.pool import NodePool, parse_node
+
+
+class ParseNodeTests(SimpleTestCase):
+    def test_parse_node(self):
+        tests = [
+            ('node1', ('node1', '26257')),
+            ('node1:26258', ('node1', '26258')),
+            ('10.0.0.1:26258', ('10.0.0.1', '26258')),
+            ('[::1]', ('::1', '26257')),
+            ('[::1]:26258', ('::1', '26258')),
+            ('[2001:db8::1]:26258', ('2001:db8::1', '26258')),
+            ('::1', ('::1', '26257')),
+            ('2001:db8::1', ('2001:db8::1', '26257')),
+        ]
+        for node, expected in tests:
+            with self.subTest(node=node):
+                self.assertEqual(parse_node(node, '26257'), expected)
+
+    def test_invalid(self):
+        for node in ['[::1', '[::1]26258', '[::1]:port']:
+            with self.subTest(node=node), self.assertRaisesMessage(ImproperlyConfigured, 'Invalid node %r.' % node):
+                parse_node(node, '26257')
+
+
+class OrderedPoolsTests(SimpleTestCase):
+    def get_pool(self, **options):
+        return NodePool(['node1', 'node2', 'node3'], {'port': '26257'}, **options)
+
+    def names(self, pools):
+        return [pool.name for pool in pools]
+
+    def test_ports(self):
+        pool = NodePool(['node1:26258', '[::1]'], {'host': 'ignored', 'port': '26257'})
+        self.assertEqual(
+            [(node_pool.kwargs['host'], node_pool.kwargs['port']) for node_pool in pool.pools],
+            [('node1', '26258'), ('::1', '26257')],
+        )
+
+    def test_round_robin(self):
+        pool = self.get_pool()
+        self.assertEqual(
+            [self.names(pool._ordered_pools()) for _ in range(4)],
+            [
+                ['node1', 'node2', 'node3'],
+                ['node2', 'node3', 'node1'],
+                ['node3', 'node1', 'node2'],
+                ['node1', 'node2', 'node3'],
+            ],
+        )
+
+    def test_least_connections(self):
+        pool = self.get_pool(load_balancing='least_connections')
+        in_use = {'node1': 3, 'node2': 0, 'node3': 1}
+        for node_pool in pool.pools:
+            node_pool.get_stats = mock.Mock(
+                return_value={'pool_size': 5, 'pool_available': 5 - in_use[node_pool.name]},
+            )
+        self.assertEqual(self.names(pool._ordered_pools()), ['node2', 'node3', 'node1'])
+
+    @mock.patch('django_cockroachdb.pool.time.monotonic', return_value=150)
+    def test_unhealthy_pools_last(self, monotonic):
+        pool = self.get_pool()
+        node1, node2, node3 = pool.pools
+        # node3's unhealthy_until has elapsed.
+        pool._unhealthy_until = {node1: 200, node3: 150}
+        self.assertEqual(self.names(pool._ordered_pools()), ['node2', 'node3', 'node1'])
+        # Every pool is returned even if they're all unhealthy.
+        pool._unhealthy_until = {node1: 200, node2: 200, node3: 200}
+        self.assertEqual(self.names(pool._ordered_pools()), ['node2', 'node3', 'node1'])
+
+    def test_invalid_load_balancing(self):
+        msg = "Invalid load_balancing 'random'. Use one of round_robin, least_connections."
+        with self.assertRaisesMessage(ImproperlyConfigured, msg):
+            self.get_pool(load_balancing='random')
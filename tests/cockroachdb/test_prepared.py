@@ -0,0 +1,96 @@
+import unittest
+
+from django.db.backends.postgresql.psycopg_any import errors, is_psycopg3
+from django.test import SimpleTestCase
+
+from django_cockroachdb.prepared import (
+    RESULT_TYPE_CHANGED, PreparedStatementCache, is_preparable,
+)
+
+from .utils import FakeConnection
+
+if is_psycopg3:
+    from psycopg._preparing import Prepare, PrepareManager
+    from psycopg.pq import TransactionStatus
+
+
+@unittest.skipUnless(is_psycopg3, 'psycopg >= 3 required')
+class PreparedStatementCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.connection = FakeConnection()
+        self.connection.info.transaction_status = TransactionStatus.IDLE
+        self.connection._prepared = PrepareManager()
+        self.connection.prepared_max = 2
+        self.cursor = self.connection.cursor()
+        self.calls = []
+        self.error = None
+
+    def fake_execute(self, query, params, prepare):
+        self.calls.append((query, prepare))
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def execute(self, cache, query):
+        return cache.execute(self.cursor, self.fake_execute, query, None)
+
+    def test_preparable(self):
+        cache = PreparedStatementCache()
+        self.execute(cache, 'SELECT 1')
+        self.execute(cache, 'SET application_name = x')
+        # psycopg decides whether to prepare preparable statements.
+        self.assertEqual(self.calls, [('SELECT 1', None), ('SET application_name = x', False)])
+        self.assertIs(is_preparable('  with t AS (SELECT 1) SELECT * FROM t'), True)
+        self.assertIs(is_preparable('CREATE TABLE t (a INT)'), False)
+
+    def test_custom_prepare(self):
+        cache = PreparedStatementCache(prepare=lambda sql: 'nocache' not in sql)
+        self.execute(cache, 'SELECT 1 -- nocache')
+        self.assertEqual(self.calls, [('SELECT 1 -- nocache', False)])
+
+    def test_record(self):
+        cache = PreparedStatementCache()
+        cache.record(Prepare.NO, self.connection)
+        cache.record(Prepare.SHOULD, self.connection)
+        cache.record(Prepare.YES, self.connection)
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 2, 'evictions': 0, 'invalidations': 0})
+
+    def test_record_eviction(self):
+        cache = PreparedStatementCache()
+        # psycopg deallocates a statement when it prepares another beyond
+        # prepared_max.
+        self.connection._prepared._names.update({(b'SELECT 1', ()): b'_pg3_0', (b'SELECT 2', ()): b'_pg3_1'})
+        cache.record(Prepare.SHOULD, self.connection)
+        cache.record(Prepare.YES, self.connection)
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'evictions': 1, 'invalidations': 0})
+
+    def test_invalidation(self):
+        cache = PreparedStatementCache()
+        self.error = errors.FeatureNotSupported(RESULT_TYPE_CHANGED)
+        self.execute(cache, 'SELECT 1')
+        # The statement is prepared again after DEALLOCATE ALL.
+        self.assertEqual(self.connection.executed, [('DEALLOCATE ALL', None)])
+        self.assertEqual(self.calls, [('SELECT 1', None), ('SELECT 1', True)])
+        self.assertEqual(cache.stats()['invalidations'], 1)
+
+    def test_invalidation_in_failed_transaction(self):
+        cache = PreparedStatementCache()
+        self.connection.info.transaction_status = TransactionStatus.INERROR
+        self.error = errors.FeatureNotSupported(RESULT_TYPE_CHANGED)
+        with self.assertRaises(errors.FeatureNotSupported):
+            self.execute(cache, 'SELECT 1')
+        self.assertEqual(self.connection.executed, [])
+        # Prepared statements are deallocated after the rollback.
+        self.connection.info.transaction_status = TransactionStatus.IDLE
+        self.execute(cache, 'SELECT 1')
+        self.assertEqual(self.connection.executed, [('DEALLOCATE ALL', None)])
+        self.assertEqual(self.calls[-1], ('SELECT 1', None))
+        self.execute(cache, 'SELECT 1')
+        self.assertEqual(len(self.connection.executed), 1)
+
+    def test_other_error(self):
+        cache = PreparedStatementCache()
+        self.error = errors.FeatureNotSupported('unimplemented')
+        with self.assertRaises(errors.FeatureNotSupported):
+            self.execute(cache, 'SELECT 1')
+        self.assertEqual(cache.stats()['invalidations'], 0)
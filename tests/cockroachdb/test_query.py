@@ -0,0 +1,254 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, connections
+from django.db.models.constants import OnConflict
+from django.db.models.sql import InsertQuery
+from django.db.transaction import TransactionManagementError
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from django_cockroachdb.query import copy_insert
+
+from .models import Measurement, Sensor
+
+
+class AsOfSystemTimeTests(TestCase):
+    def as_sql(self, queryset):
+        return queryset.query.get_compiler(connection=connection).as_sql()[0]
+
+    def test_value(self):
+        sql = self.as_sql(Measurement.objects.as_of_system_time('-10s'))
+        self.assertIn("AS OF SYSTEM TIME '-10s'", sql)
+
+    def test_follower_read(self):
+        sql = self.as_sql(Measurement.objects.follower_read())
+        self.assertIn('AS OF SYSTEM TIME follower_read_timestamp()', sql)
+
+    def test_database_default_is_opt_in(self):
+        with mock.patch.dict(connection.settings_dict['OPTIONS'], as_of_system_time='-10s'):
+            self.assertNotIn('AS OF SYSTEM TIME', self.as_sql(Measurement.objects.all()))
+            sql = self.as_sql(Measurement.objects.as_of_system_time())
+        self.assertIn("AS OF SYSTEM TIME '-10s'", sql)
+
+    def test_no_database_default(self):
+        msg = "QuerySet.as_of_system_time() requires a value unless the 'default' database sets"
+        with self.assertRaisesMessage(ImproperlyConfigured, msg):
+            self.as_sql(Measurement.objects.as_of_system_time())
+
+    def test_none(self):
+        queryset = Measurement.objects.as_of_system_time('-10s').as_of_system_time(None)
+        self.assertNotIn('AS OF SYSTEM TIME', self.as_sql(queryset))
+
+    def test_subquery(self):
+        queryset = Measurement.objects.as_of_system_time('-10s').filter(
+            pk__in=Measurement.objects.as_of_system_time('-10s').values('pk'),
+        )
+        self.assertEqual(self.as_sql(queryset).count('AS OF SYSTEM TIME'), 1)
+
+    def test_combined_query(self):
+        queryset = Measurement.objects.as_of_system_time('-10s').filter(sensor='a').union(
+            Measurement.objects.filter(sensor='b'),
+        )
+        sql = self.as_sql(queryset)
+        self.assertEqual(sql.count('AS OF SYSTEM TIME'), 1)
+        self.assertTrue(sql.startswith('SELECT * FROM ('))
+        self.assertTrue(sql.endswith("AS OF SYSTEM TIME '-10s'"))
+
+
+class BatchesTests(TestCase):
+    def test_bulk_create_in_batches_empty(self):
+        self.assertEqual(Measurement.objects.bulk_create_in_batches([]), [])
+
+    def test_bulk_update_in_batches_empty(self):
+        self.assertEqual(Measurement.objects.bulk_update_in_batches([], ['value']), 0)
+
+    def test_bulk_create_in_batches(self):
+        objs = [Measurement(sensor='a', value=i) for i in range(5)]
+        self.assertEqual(len(Measurement.objects.bulk_create_in_batches(objs, batch_size=2)), 5)
+        self.assertEqual(Measurement.objects.count(), 5)
+
+
+class IterateByPkGuardTests(SimpleTestCase):
+    def test_batch_size(self):
+        for batch_size in [0, -1]:
+            with self.subTest(batch_size=batch_size):
+                with self.assertRaisesMessage(ValueError, 'Batch size must be strictly positive.'):
+                    next(Measurement.objects.iterate_by_pk(batch_size=batch_size))
+
+    def test_sliced(self):
+        msg = 'Cannot use iterate_by_pk() once a slice has been taken.'
+        with self.assertRaisesMessage(TypeError, msg):
+            next(Measurement.objects.all()[:10].iterate_by_pk())
+
+    def test_values(self):
+        msg = 'iterate_by_pk() requires a QuerySet of model instances.'
+        for queryset in [Measurement.objects.values(), Measurement.objects.values_list('pk')]:
+            with self.subTest(queryset=queryset.query), self.assertRaisesMessage(TypeError, msg):
+                next(queryset.iterate_by_pk())
+
+    def test_as_of_system_time_in_atomic_block(self):
+        msg = 'iterate_by_pk() with as_of_system_time cannot be used inside a transaction.'
+        with mock.patch.object(connections['default'], 'in_atomic_block', True):
+            for queryset, as_of_system_time in [
+                (Measurement.objects.all(), '-10s'),
+                (Measurement.objects.as_of_system_time('-10s'), None),
+            ]:
+                with self.subTest(as_of_system_time=as_of_system_time):
+                    with self.assertRaisesMessage(TransactionManagementError, msg):
+                        next(queryset.iterate_by_pk(as_of_system_time=as_of_system_time))
+
+
+class IterateByPkTests(TestCase):
+    def test_pagination(self):
+        for count in [5, 4]:
+            with self.subTest(count=count):
+                Measurement.objects.all().delete()
+                Measurement.objects.bulk_create(Measurement(sensor='a', value=i) for i in range(count))
+                pks = list(Measurement.objects.order_by('pk').values_list('pk', flat=True))
+                with CaptureQueriesContext(connection) as queries:
+                    objs = list(Measurement.objects.iterate_by_pk(batch_size=2))
+                self.assertEqual([obj.pk for obj in objs], pks)
+                selects = [query['sql'] for query in queries if query['sql'].startswith('SELECT')]
+                # A final query finds no more rows when the last batch is full.
+                self.assertEqual(len(selects), 3)
+                for sql in selects:
+                    self.assertTrue(sql.endswith('ORDER BY "cockroachdb_measurement"."id" ASC LIMIT 2'), sql)
+                self.assertNotIn('WHERE', selects[0])
+                self.assertIn('WHERE "cockroachdb_measurement"."id" > %s' % pks[1], selects[1])
+                self.assertIn('WHERE "cockroachdb_measurement"."id" > %s' % pks[3], selects[2])
+
+    def test_filter(self):
+        Measurement.objects.bulk_create(Measurement(sensor=sensor) for sensor in 'abab')
+        self.assertEqual(
+            [obj.sensor for obj in Measurement.objects.filter(sensor='b').iterate_by_pk(batch_size=1)],
+            ['b', 'b'],
+        )
+
+
+class UpsertSQLTests(SimpleTestCase):
+    def insert_sql(self, model, fields, update_fields, unique_fields, on_conflict=OnConflict.UPDATE):
+        opts = model._meta
+        query = InsertQuery(
+            model,
+            on_conflict=on_conflict,
+            update_fields=[opts.get_field(name) for name in update_fields],
+            unique_fields=[opts.get_field(name) for name in unique_fields],
+        )
+        query.insert_values([opts.get_field(name) for name in fields], [model(id=1)])
+        [(sql, params)] = query.get_compiler(connection=connection).as_sql()
+        return sql
+
+    def test_upsert(self):
+        sql = self.insert_sql(Measurement, ['id', 'sensor', 'value'], ['sensor', 'value'], ['id'])
+        self.assertEqual(
+            sql, 'UPSERT INTO "cockroachdb_measurement" ("id", "sensor", "value") VALUES (%s, %s, %s)',
+        )
+
+    def test_upsert_inserted_columns(self):
+        # Every inserted column is updated even though value isn't inserted.
+        sql = self.insert_sql(Measurement, ['id', 'sensor'], ['sensor'], ['id'])
+        self.assertEqual(sql, 'UPSERT INTO "cockroachdb_measurement" ("id", "sensor") VALUES (%s, %s)')
+
+    def test_on_conflict(self):
+        tests = [
+            # A column isn't updated.
+            (Measurement, ['id', 'sensor', 'value'], ['value'], ['id'], 'ON CONFLICT("id") DO UPDATE SET '
+             '"value" = EXCLUDED."value"'),
+            # The conflict target isn't the primary key.
+            (Sensor, ['id', 'name', 'calibration'], ['calibration'], ['name'], 'ON CONFLICT("name") DO UPDATE SET '
+             '"calibration" = EXCLUDED."calibration"'),
+        ]
+        for model, fields, update_fields, unique_fields, suffix in tests:
+            with self.subTest(model=model, update_fields=update_fields, unique_fields=unique_fields):
+                sql = self.insert_sql(model, fields, update_fields, unique_fields)
+                self.assertTrue(sql.startswith('INSERT INTO '), sql)
+                self.assertTrue(sql.endswith(suffix), sql)
+
+    def test_ignore_conflicts(self):
+        sql = self.insert_sql(Measurement, ['id', 'sensor', 'value'], [], [], on_conflict=OnConflict.IGNORE)
+        self.assertTrue(sql.startswith('INSERT INTO '), sql)
+        self.assertTrue(sql.endswith('ON CONFLICT DO NOTHING'), sql)
+
+    def test_bulk_upsert(self):
+        objs = [Measurement(sensor='a')]
+        with mock.patch.object(Measurement.objects.get_queryset().__class__, 'bulk_create') as bulk_create:
+            Measurement.objects.bulk_upsert(objs, batch_size=10)
+        bulk_create.assert_called_once_with(
+            objs, batch_size=10, update_conflicts=True, unique_fields=['id'], update_fields=['sensor', 'value'],
+        )
+        # Those arguments compile to UPSERT.
+        sql = self.insert_sql(Measurement, ['id', 'sensor', 'value'], ['sensor', 'value'], ['id'])
+        self.assertTrue(sql.startswith('UPSERT INTO '), sql)
+
+
+class CopyInsertTests(SimpleTestCase):
+    def copy_insert(self, rows, fields=None, batch_size=10000):
+        copies = []
+
+        class FakeCopy(list):
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc_info):
+                pass
+
+            write_row = list.append
+
+        class FakeCursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc_info):
+                pass
+
+            def copy(self, sql):
+                copies.append((sql, FakeCopy()))
+                return copies[-1][1]
+
+        fake_connection = SimpleNamespace(ops=connection.ops, features=connection.features, cursor=FakeCursor)
+        with (
+            mock.patch('django_cockroachdb.query.connections', {'default': fake_connection}),
+            mock.patch('django_cockroachdb.query.run_transaction', lambda func, using: func()),
+        ):
+            count = copy_insert(Measurement, rows, fields, batch_size, using='default')
+        return count, copies
+
+    def test_instances(self):
+        count, copies = self.copy_insert([Measurement(sensor='a', value=1), Measurement(sensor='b')])
+        self.assertEqual(count, 2)
+        self.assertEqual(copies, [
+            ('COPY "cockroachdb_measurement" ("sensor", "value") FROM STDIN', [['a', 1], ['b', 0]]),
+        ])
+
+    def test_instances_with_pk(self):
+        count, copies = self.copy_insert((Measurement(id=i, sensor='a') for i in [1, 2]))
+        self.assertEqual(count, 2)
+        self.assertEqual(copies, [
+            ('COPY "cockroachdb_measurement" ("id", "sensor", "value") FROM STDIN', [[1, 'a', 0], [2, 'a', 0]]),
+        ])
+
+    def test_mixed_pks(self):
+        msg = 'copy_insert() requires either every instance or no instance to set id.'
+        for rows in [
+            [Measurement(id=1, sensor='a'), Measurement(sensor='b')],
+            [Measurement(sensor='a'), Measurement(id=2, sensor='b')],
+        ]:
+            with self.subTest(rows=rows), self.assertRaisesMessage(ValueError, msg):
+                self.copy_insert(rows)
+
+    def test_sequences(self):
+        count, copies = self.copy_insert([('a', 1), ('b', 2), ('c', 3)], batch_size=2)
+        self.assertEqual(count, 3)
+        self.assertEqual(copies, [
+            ('COPY "cockroachdb_measurement" ("sensor", "value") FROM STDIN', [['a', 1], ['b', 2]]),
+            ('COPY "cockroachdb_measurement" ("sensor", "value") FROM STDIN', [['c', 3]]),
+        ])
+
+    def test_fields(self):
+        count, copies = self.copy_insert([(5, 'a')], fields=['id', 'sensor'])
+        self.assertEqual(copies, [('COPY "cockroachdb_measurement" ("id", "sensor") FROM STDIN', [[5, 'a']])])
+
+    def test_empty(self):
+        self.assertEqual(self.copy_insert(iter([])), (0, []))
@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase
+
+from django_cockroachdb.routers import StalenessRouter, read_your_writes
+
+from .models import Measurement
+
+
+@mock.patch('django_cockroachdb.routers.time.monotonic')
+class StalenessRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = StalenessRouter('stale', pin_seconds=5)
+
+    def test_reads_go_to_stale(self, monotonic):
+        with read_your_writes():
+            self.assertEqual(self.router.db_for_read(Measurement), 'stale')
+
+    def test_pinned_after_write(self, monotonic):
+        with read_your_writes():
+            monotonic.return_value = 100
+            self.assertEqual(self.router.db_for_write(Measurement), 'default')
+            monotonic.return_value = 104.9
+            self.assertEqual(self.router.db_for_read(Measurement), 'default')
+            monotonic.return_value = 105
+            self.assertEqual(self.router.db_for_read(Measurement), 'stale')
+
+    def test_pinning_scoped(self, monotonic):
+        monotonic.return_value = 100
+        with read_your_writes():
+            self.router.db_for_write(Measurement)
+            with read_your_writes():
+                # A new scope (e.g. another request) isn't pinned...
+                self.assertEqual(self.router.db_for_read(Measurement), 'stale')
+            # ... and doesn't affect the enclosing one.
+            self.assertEqual(self.router.db_for_read(Measurement), 'default')
+        with read_your_writes():
+            self.assertEqual(self.router.db_for_read(Measurement), 'stale')
+
+    def test_in_transaction(self, monotonic):
+        with read_your_writes(), mock.patch.object(connection, 'in_atomic_block', True):
+            self.assertEqual(self.router.db_for_read(Measurement), 'default')
+
+    def test_allow_relation(self, monotonic):
+        def obj(db):
+            return SimpleNamespace(_state=SimpleNamespace(db=db))
+        self.assertIs(self.router.allow_relation(obj('stale'), obj('default')), True)
+        self.assertIsNone(self.router.allow_relation(obj('stale'), obj('other')))
+
+    def test_allow_migrate(self, monotonic):
+        self.assertIs(self.router.allow_migrate('stale', 'cockroachdb'), False)
+        self.assertIsNone(self.router.allow_migrate('default', 'cockroachdb'))
@@ -0,0 +1,280 @@
+from contextlib import contextmanager
+from unittest import mock
+
+from django.db import connection, models
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+from django.test import SimpleTestCase, TransactionTestCase
+from django.test.utils import isolate_apps
+
+from django_cockroachdb.schema import (
+    DEFAULT_BATCH_OPTIONS, DatabaseSchemaEditor, SchemaChangeBatch,
+    coalesce_alter_table,
+)
+
+from .utils import FakeConnection
+
+
+class CoalesceAlterTableTests(SimpleTestCase):
+    def test_same_table(self):
+        self.assertEqual(coalesce_alter_table([
+            ('ALTER TABLE "t" ADD COLUMN "a" int', None),
+            ('ALTER TABLE "t" ADD CONSTRAINT "c" CHECK ("a" > 0)', None),
+            ('ALTER TABLE "u" ADD COLUMN "a" int', None),
+            ('ALTER TABLE "u" ALTER COLUMN "a" SET NOT NULL', None),
+        ]), [
+            ('ALTER TABLE "t" ADD COLUMN "a" int, ADD CONSTRAINT "c" CHECK ("a" > 0)', None),
+            ('ALTER TABLE "u" ADD COLUMN "a" int, ALTER COLUMN "a" SET NOT NULL', None),
+        ])
+
+    def test_quoted_identifiers(self):
+        self.assertEqual(coalesce_alter_table([
+            ('ALTER TABLE "my table (old)" ADD COLUMN "a (b)" int', None),
+            ('ALTER TABLE "my table (old)" ADD COLUMN "c d" int', None),
+            ('ALTER TABLE "my table" ADD COLUMN "e" int', None),
+            ('ALTER TABLE my_schema."my table" ADD COLUMN "f" int', None),
+        ]), [
+            ('ALTER TABLE "my table (old)" ADD COLUMN "a (b)" int, ADD COLUMN "c d" int', None),
+            ('ALTER TABLE "my table" ADD COLUMN "e" int', None),
+            ('ALTER TABLE my_schema."my table" ADD COLUMN "f" int', None),
+        ])
+
+    def test_params(self):
+        self.assertEqual(coalesce_alter_table([
+            ('ALTER TABLE "t" ADD COLUMN "a" int DEFAULT %s', [1]),
+            ('ALTER TABLE "t" ADD COLUMN "b" int DEFAULT %s', [2]),
+        ]), [
+            ('ALTER TABLE "t" ADD COLUMN "a" int DEFAULT %s, ADD COLUMN "b" int DEFAULT %s', [1, 2]),
+        ])
+
+    def test_params_and_none(self):
+        # % is escaped in the statements without params.
+        self.assertEqual(coalesce_alter_table([
+            ('ALTER TABLE "t" ADD CONSTRAINT "c" CHECK ("a" % 2 = 0)', None),
+            ('ALTER TABLE "t" ADD COLUMN "b" varchar(5) DEFAULT %s', ['50%']),
+            ('ALTER TABLE "t" ADD CONSTRAINT "d" CHECK ("b" LIKE \'%x\')', None),
+        ]), [
+            (
+                'ALTER TABLE "t" ADD CONSTRAINT "c" CHECK ("a" %% 2 = 0), '
+                'ADD COLUMN "b" varchar(5) DEFAULT %s, '
+                'ADD CONSTRAINT "d" CHECK ("b" LIKE \'%%x\')',
+                ['50%'],
+            ),
+        ])
+
+    def test_literal_percent_without_params(self):
+        self.assertEqual(coalesce_alter_table([
+            ('ALTER TABLE "t" ADD COLUMN "a" varchar(5) DEFAULT \'%\'', None),
+            ('ALTER TABLE "t" ADD COLUMN "b" varchar(5) DEFAULT \'%%\'', None),
+        ]), [
+            (
+                'ALTER TABLE "t" ADD COLUMN "a" varchar(5) DEFAULT \'%\', '
+                'ADD COLUMN "b" varchar(5) DEFAULT \'%%\'',
+                None,
+            ),
+        ])
+
+    def test_other_statements_unchanged(self):
+        statements = [
+            ('ALTER TABLE "t" ADD COLUMN "a" int', None),
+            ('CREATE INDEX "t_a_idx" ON "t" ("a")', None),
+            ('ALTER TABLE "t" ADD COLUMN "b" int', None),
+            ('UPDATE "t" SET "b" = %s', [1]),
+            ('DROP INDEX "t_a_idx"', None),
+        ]
+        self.assertEqual(coalesce_alter_table(statements), statements)
+        self.assertEqual(coalesce_alter_table([]), [])
+
+
+class BatchSchemaChangesTests(SimpleTestCase):
+    add_column = 'ALTER TABLE "t" ADD COLUMN "a" integer DEFAULT 1 NOT NULL'
+    drop_default = 'ALTER TABLE "t" ALTER COLUMN "a" DROP DEFAULT'
+    create_index = 'CREATE INDEX "t_a_idx" ON "t" ("a")'
+
+    def setUp(self):
+        self.editor = DatabaseSchemaEditor(connection)
+        self.editor.batch_options = {**DEFAULT_BATCH_OPTIONS, 'poll_interval': 0.01}
+        self.editor.pending_schema_changes = {}
+
+    def add(self, sql):
+        return self.editor._add_pending_schema_change(sql)
+
+    def test_params_merged_before_buffering(self):
+        def compose_sql(sql, params):
+            return sql % tuple("'%s'" % param for param in params)
+        with mock.patch.object(connection.ops, 'compose_sql', side_effect=compose_sql):
+            self.editor.execute('ALTER TABLE "t" ADD COLUMN "b" varchar(10) DEFAULT %s NOT NULL', ['x'])
+        sql = 'ALTER TABLE "t" ADD COLUMN "b" varchar(10) DEFAULT \'x\' NOT NULL'
+        self.assertEqual(self.editor.pending_schema_changes, {'"t"': SchemaChangeBatch([(sql, None)], [])})
+
+    def test_other_statement_flushes(self):
+        with (
+            mock.patch.object(self.editor, 'flush_schema_changes') as flush_schema_changes,
+            mock.patch.object(BaseDatabaseSchemaEditor, 'execute') as execute,
+        ):
+            self.editor.execute(self.add_column, None)
+            flush_schema_changes.assert_not_called()
+            self.editor.execute('DROP TABLE "u"', None)
+        flush_schema_changes.assert_called_once_with()
+        execute.assert_called_once_with('DROP TABLE "u"', None)
+
+    def test_add_pending_schema_change(self):
+        self.assertIs(self.add(self.add_column), True)
+        self.assertIs(self.add(self.create_index), True)
+        self.assertIs(self.add('ALTER TABLE "t" ADD CONSTRAINT "t_a_check" CHECK ("a" >= 0)'), True)
+        # The default used to populate the new column is dropped afterward.
+        self.assertIs(self.add(self.drop_default), True)
+        self.assertEqual(self.editor.pending_schema_changes, {'"t"': SchemaChangeBatch(
+            [
+                (self.add_column, None),
+                (self.create_index, None),
+                ('ALTER TABLE "t" ADD CONSTRAINT "t_a_check" CHECK ("a" >= 0)', None),
+            ],
+            [(self.drop_default, None)],
+        )})
+        # A change that must not run before the dropped default isn't added.
+        self.assertIs(self.add('ALTER TABLE "t" ALTER COLUMN "a" DROP NOT NULL'), False)
+
+    def test_drop_default_without_pending_changes(self):
+        self.assertIs(self.add(self.drop_default), True)
+        self.assertEqual(
+            self.editor.pending_schema_changes, {'"t"': SchemaChangeBatch([(self.drop_default, None)], [])},
+        )
+
+    def test_not_added(self):
+        for sql in [
+            'ALTER TABLE "t" ADD CONSTRAINT "t_u_fk" FOREIGN KEY ("u_id") REFERENCES "u" ("id")',
+            'ALTER TABLE "t" ADD COLUMN "u_id" bigint NULL REFERENCES "u" ("id")',
+            'ALTER TABLE "t" ALTER COLUMN "a" TYPE bigint',
+            'ALTER TABLE "t" DROP COLUMN "a"',
+            'DROP INDEX "t_a_idx"',
+        ]:
+            with self.subTest(sql=sql):
+                self.assertIs(self.add(sql), False)
+        self.assertEqual(self.editor.pending_schema_changes, {})
+
+    def test_flush_before_query(self):
+        calls = []
+        with mock.patch.object(self.editor, 'flush_schema_changes', lambda: calls.append('flush')):
+            result = self.editor._flush_before_query(
+                lambda *args: calls.append(args) or 'result', 'SELECT 1', None, False, {},
+            )
+        self.assertEqual(result, 'result')
+        self.assertEqual(calls, ['flush', ('SELECT 1', None, False, {})])
+
+    def test_run_schema_change_batch(self):
+        fake = FakeConnection()
+
+        @contextmanager
+        def atomic(using):
+            fake.execute('BEGIN')
+            yield
+            fake.execute('COMMIT')
+        batch = SchemaChangeBatch(
+            [(self.create_index, None), (self.add_column, None), ('ALTER TABLE "t" ADD COLUMN "b" int', None)],
+            [(self.drop_default, None)],
+        )
+        with (
+            mock.patch('django_cockroachdb.schema.connections', {connection.alias: fake}),
+            mock.patch('django_cockroachdb.schema.transaction.atomic', atomic),
+        ):
+            self.editor._run_schema_change_batch(batch)
+        # The ALTER TABLE statements are combined and run with the CREATE
+        # INDEX in one transaction, followed by the dropped default.
+        self.assertEqual([sql for sql, params in fake.executed], [
+            'BEGIN',
+            '%s, ADD COLUMN "b" int' % self.add_column,
+            self.create_index,
+            'COMMIT',
+            self.drop_default,
+        ])
+        self.assertIs(fake.closed, True)
+
+    def test_run_schema_change_batch_single_statement(self):
+        fake = FakeConnection()
+        with mock.patch('django_cockroachdb.schema.connections', {connection.alias: fake}):
+            self.editor._run_schema_change_batch(SchemaChangeBatch([(self.add_column, None)], []))
+        self.assertEqual(fake.executed, [(self.add_column, None)])
+
+    def test_flush_schema_changes(self):
+        ran = []
+        self.editor.pending_schema_changes = {
+            '"t"': SchemaChangeBatch([(self.add_column, None)], []),
+            '"u"': SchemaChangeBatch([('CREATE INDEX "u_idx" ON "u" ("a")', None)], []),
+        }
+        with (
+            mock.patch.object(self.editor, 'connection', FakeConnection([[('now',)]])),
+            mock.patch.object(self.editor, '_run_schema_change_batch', ran.append),
+            mock.patch.object(self.editor, '_report_schema_change_progress'),
+        ):
+            self.editor.flush_schema_changes()
+        self.assertCountEqual([batch.statements[0][0] for batch in ran], [
+            self.add_column, 'CREATE INDEX "u_idx" ON "u" ("a")',
+        ])
+        self.assertEqual(self.editor.pending_schema_changes, {})
+
+    def test_flush_schema_changes_error(self):
+        self.editor.pending_schema_changes = {'"t"': SchemaChangeBatch([(self.add_column, None)], [])}
+        with (
+            mock.patch.object(self.editor, 'connection', FakeConnection([[('now',)]])),
+            mock.patch.object(self.editor, '_run_schema_change_batch', side_effect=ValueError('failed')),
+            self.assertRaisesMessage(ValueError, 'failed'),
+        ):
+            self.editor.flush_schema_changes()
+
+    def test_report_progress(self):
+        callback = mock.Mock()
+        self.editor.batch_options['progress_callback'] = callback
+        rows = [(1, 'ALTER TABLE t ADD COLUMN a INT8', 0.25, 30.0), (2, 'CREATE INDEX', 0, 1.0)]
+        with (
+            mock.patch.object(self.editor, 'connection', FakeConnection([rows])),
+            self.assertLogs('django.db.backends.schema', 'INFO') as logs,
+        ):
+            self.editor._report_schema_change_progress('since')
+        self.assertEqual(logs.output, [
+            'INFO:django.db.backends.schema:Schema change job 1 is 25% complete (90s remaining): '
+            'ALTER TABLE t ADD COLUMN a INT8',
+            'INFO:django.db.backends.schema:Schema change job 2 is 0% complete (unknown time remaining): '
+            'CREATE INDEX',
+        ])
+        [jobs] = callback.call_args.args
+        self.assertEqual([job.job_id for job in jobs], [1, 2])
+
+
+@isolate_apps('cockroachdb')
+class BatchSchemaChangesDatabaseTests(TransactionTestCase):
+    available_apps = ['cockroachdb']
+
+    def setUp(self):
+        class Item(models.Model):
+            name = models.CharField(max_length=10)
+
+        self.Item = Item
+        with connection.schema_editor() as editor:
+            editor.create_model(Item)
+
+    def tearDown(self):
+        with connection.schema_editor() as editor:
+            editor.delete_model(self.Item)
+
+    def test_batch(self):
+        fields = [models.IntegerField(default=1), models.CharField(max_length=10, default='%x')]
+        for name, field in zip(['a', 'b'], fields):
+            field.set_attributes_from_name(name)
+        index = models.Index(fields=['name'], name='item_name_idx')
+        with mock.patch.dict(connection.settings_dict['OPTIONS'], batch_schema_changes=True):
+            with connection.schema_editor() as editor:
+                for field in fields:
+                    editor.add_field(self.Item, field)
+                editor.add_index(self.Item, index)
+                self.assertIn(self.Item._meta.db_table, str(editor.pending_schema_changes))
+        table = self.Item._meta.db_table
+        with connection.cursor() as cursor:
+            columns = {
+                column.name: column.default
+                for column in connection.introspection.get_table_description(cursor, table)
+            }
+            constraints = connection.introspection.get_constraints(cursor, table)
+            cursor.execute('SELECT a, b FROM %s' % connection.ops.quote_name(table))
+        # The defaults that populated the columns were dropped.
+        self.assertEqual(columns, {'id': columns['id'], 'name': None, 'a': None, 'b': None})
+        self.assertIn('item_name_idx', constraints)
@@ -0,0 +1,73 @@
+from contextlib import nullcontext
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from django_cockroachdb.tagging import StatementTagger, statement_tags
+
+from .utils import FakeConnection
+
+
+@mock.patch('django_cockroachdb.tagging.mogrify', lambda sql, params, connection: sql % tuple(
+    "'%s'" % param for param in params
+))
+class StatementTaggerTests(SimpleTestCase):
+    def setUp(self):
+        self.wrapper = SimpleNamespace(
+            settings_dict={'OPTIONS': {'application_name': 'myapp'}},
+            statement_recorder=None,
+            connection=None,
+            pool=None,
+            in_atomic_block=False,
+            wrap_database_errors=nullcontext(),
+        )
+        self.tagger = StatementTagger(self.wrapper)
+
+    def open(self, pool=None):
+        self.wrapper.connection = FakeConnection()
+        self.wrapper.pool = pool
+        self.tagger.connection_opened()
+
+    @property
+    def executed(self):
+        return [sql for sql, params in self.wrapper.connection.executed]
+
+    def execute(self, **tags):
+        with statement_tags(**tags):
+            self.tagger(lambda *args: None, 'SELECT 1', None, False, {})
+
+    def test_new_connection(self):
+        self.open()
+        self.execute()
+        self.assertEqual(self.executed, [])
+        self.execute(task='a')
+        self.execute(task='a')
+        self.execute()
+        self.assertEqual(self.executed, [
+            "SET application_name = 'myapp task=a'",
+            "SET application_name = 'myapp'",
+        ])
+
+    def test_pooled_connection(self):
+        self.open(pool=object())
+        connection = self.wrapper.connection
+        self.execute(task='a')
+        # The connection is returned to the pool still tagged, then checked
+        # out again.
+        self.tagger.connection_opened()
+        self.execute()
+        self.execute()
+        self.assertEqual(self.wrapper.connection, connection)
+        self.assertEqual(self.executed, [
+            "SET application_name = 'myapp task=a'",
+            "SET application_name = 'myapp'",
+        ])
+
+    def test_set_in_rolled_back_transaction(self):
+        self.open()
+        self.wrapper.in_atomic_block = True
+        self.execute(task='a')
+        self.wrapper.in_atomic_block = False
+        self.execute(task='a')
+        self.assertEqual(self.executed, ["SET application_name = 'myapp task=a'"] * 2)
@@ -0,0 +1,83 @@
+from unittest import mock
+
+from django.db import connection, transaction
+from django.db.backends.postgresql.psycopg_any import errors
+from django.db.utils import OperationalError
+from django.test import SimpleTestCase, TransactionTestCase
+
+from django_cockroachdb.transaction import (
+    retry_atomic, retry_delays, run_transaction,
+)
+
+from .models import Measurement
+
+
+def serialization_failure():
+    exc = OperationalError('restart transaction')
+    exc.__cause__ = errors.SerializationFailure()
+    return exc
+
+
+@mock.patch('django_cockroachdb.transaction.time.sleep')
+class RunTransactionTests(TransactionTestCase):
+    available_apps = ['cockroachdb']
+
+    def failing(self, failures, exc_factory=serialization_failure):
+        """Return a function that fails `failures` times before succeeding."""
+        attempts = []
+
+        def func():
+            attempts.append(connection.transaction_retries)
+            Measurement.objects.create(sensor='a', value=len(attempts))
+            if len(attempts) <= failures:
+                raise exc_factory()
+            return len(attempts)
+        return func, attempts
+
+    def test_retry(self, sleep):
+        func, attempts = self.failing(2)
+        self.assertEqual(run_transaction(func, max_attempts=3), 3)
+        # The retries are counted for OPTIONS['instrumentation'] and reset
+        # afterward.
+        self.assertEqual(attempts, [0, 1, 2])
+        self.assertEqual(connection.transaction_retries, 0)
+        self.assertEqual(sleep.call_count, 2)
+        # The failed attempts were rolled back.
+        self.assertEqual(list(Measurement.objects.values_list('value', flat=True)), [3])
+
+    def test_max_attempts(self, sleep):
+        func, attempts = self.failing(3)
+        with self.assertRaises(OperationalError):
+            run_transaction(func, max_attempts=3)
+        self.assertEqual(len(attempts), 3)
+        self.assertEqual(connection.transaction_retries, 0)
+        self.assertIs(Measurement.objects.exists(), False)
+
+    def test_other_error_not_retried(self, sleep):
+        func, attempts = self.failing(1, exc_factory=lambda: OperationalError('other'))
+        with self.assertRaisesMessage(OperationalError, 'other'):
+            run_transaction(func)
+        self.assertEqual(len(attempts), 1)
+        sleep.assert_not_called()
+
+    def test_nested_not_retried(self, sleep):
+        func, attempts = self.failing(1)
+        with self.assertRaises(OperationalError), transaction.atomic():
+            run_transaction(func)
+        self.assertEqual(len(attempts), 1)
+
+    def test_retry_atomic(self, sleep):
+        func, attempts = self.failing(1)
+        self.assertEqual(retry_atomic(max_attempts=2)(func)(), 2)
+        self.assertEqual(retry_atomic(self.failing(1)[0])(), 2)
+
+
+class RetryDelaysTests(SimpleTestCase):
+    def test_delays(self):
+        delays = retry_delays(max_attempts=5, initial_delay=1, multiplier=3, max_delay=5, jitter=False)
+        self.assertEqual(list(delays), [1, 3, 5, 5])
+
+    def test_jitter(self):
+        delays = list(retry_delays(max_attempts=50, initial_delay=1, multiplier=1, max_delay=1))
+        self.assertEqual(len(delays), 49)
+        self.assertTrue(all(0 <= delay <= 1 for delay in delays))
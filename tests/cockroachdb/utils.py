@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+
+class FakeCursor:
+    """A cursor of a FakeConnection."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def execute(self, sql, params=None, **kwargs):
+        self.connection.execute(sql, params)
+
+    def fetchone(self):
+        rows = self.connection.results.pop(0)
+        return rows[0] if rows else None
+
+    def fetchall(self):
+        return self.connection.results.pop(0)
+
+
+class FakeConnection:
+    """
+    A connection (e.g. a psycopg connection) that records the statements it
+    executes as (sql, params) and whose cursors fetch `results`, a list of
+    each query's rows.
+    """
+
+    def __init__(self, results=()):
+        self.executed = []
+        self.results = list(results)
+        self.info = SimpleNamespace(transaction_status=None)
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def execute(self, sql, params=None, **kwargs):
+        self.executed.append((sql, params))
+
+    def close(self):
+        self.closed = True